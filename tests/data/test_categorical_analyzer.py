@@ -0,0 +1,38 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+# Copyright 2019 SAP SE or an SAP affiliate company. All rights reserved
+# ============================================================================
+
+import unittest
+
+import numpy as np
+
+from xai.data.exceptions import ItemDataTypeNotSupported
+from xai.data.explorer.categorical.categorical_analyzer import CategoricalDataAnalyzer
+
+
+class TestCategoricalDataAnalyzer(unittest.TestCase):
+
+    def test_feed_all_array(self):
+        """
+        Test that counting an array in bulk gives the same frequencies as feeding its values one by one
+        """
+        values = np.random.RandomState(0).choice(['a', 'b', 'c'], 100).astype(object)
+        bulk = CategoricalDataAnalyzer()
+        bulk.feed_all(values)
+        bulk.feed_all(np.array([1, 1, 2]))
+        single = CategoricalDataAnalyzer()
+        for value in values.tolist() + [1, 1, 2]:
+            single.feed(value)
+        self.assertEqual(dict(bulk.get_statistics().frequency_count), dict(single.get_statistics().frequency_count))
+
+    def test_feed_all_unsupported_type(self):
+        """
+        Test that the distinct values of an array are type checked
+        """
+        with self.assertRaises(ItemDataTypeNotSupported):
+            CategoricalDataAnalyzer().feed_all(np.array([0.5, 1.5]))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,190 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+# Copyright 2019 SAP SE or an SAP affiliate company. All rights reserved
+# ============================================================================
+
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from xai.data.exceptions import ColumnNotFound
+from xai.data.validator.dataframe_validator import DataframeValidator
+from xai.data.validator.relational_index import RelationalIndex
+
+
+class TestDataframeValidator(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.local = pd.DataFrame({'key': [1, 2, 3, np.nan, 2, 5], 'value': [10, 20, 30, 40, 50, 60]},
+                                  index=[10, 11, 12, 13, 14, 15])
+        self.foreign = pd.DataFrame({'id': [1, 2, 2, np.nan, 4]})
+        self.rows = pd.DataFrame({'a': [1, 2, 1, 3, 2, 1, np.nan, np.nan], 'b': list('xyxzyqww')},
+                                 index=list('pqrstuvw'))
+
+    def test_row_hashes(self):
+        """
+        Test that equal rows on the key columns have equal hashes
+        """
+        hashes = DataframeValidator.row_hashes(self.rows)
+        self.assertEqual(hashes.dtype, np.uint64)
+        self.assertEqual(hashes[0], hashes[2])
+        self.assertNotEqual(hashes[0], hashes[5])
+        hashes = DataframeValidator.row_hashes(self.rows, ['a'])
+        self.assertEqual(hashes[0], hashes[5])
+        with self.assertRaises(ColumnNotFound):
+            DataframeValidator.row_hashes(self.rows, ['missing'])
+
+    def test_duplicated_group_ids(self):
+        """
+        Test that only the duplicated rows are returned, with group ids numbered by first appearance
+        """
+        positions, group_ids = DataframeValidator.duplicated_group_ids(self.rows)
+        self.assertEqual(positions.tolist(), [0, 1, 2, 4, 6, 7])
+        self.assertEqual(group_ids.tolist(), [0, 1, 0, 1, 2, 2])
+        positions, group_ids = DataframeValidator.duplicated_group_ids(self.rows, ['a'])
+        self.assertEqual(positions.tolist(), [0, 1, 2, 4, 5, 6, 7])
+        self.assertEqual(group_ids.tolist(), [0, 1, 0, 1, 0, 2, 2])
+
+    def test_duplication_drop_mask(self):
+        """
+        Test that the first seen row of each duplicated group is kept, like pandas drop_duplicates
+        """
+        drop_mask = DataframeValidator.duplication_drop_mask(self.rows, ['b'])
+        self.assertEqual(drop_mask.tolist(), self.rows.duplicated(subset=['b'], keep='first').tolist())
+
+    def test_hash_collision(self):
+        """
+        Test that the rows with equal hashes are compared, 1 and '1' have the same hash in an object column
+        """
+        df = pd.DataFrame({'a': [1, '1', 1.0, 'x', '1', 2]}, dtype=object)
+        self.assertEqual(DataframeValidator.row_hashes(df)[0], DataframeValidator.row_hashes(df)[1])
+        positions, group_ids = DataframeValidator.duplicated_group_ids(df)
+        self.assertEqual(positions.tolist(), [0, 1, 2, 4])
+        self.assertEqual(group_ids.tolist(), [0, 1, 0, 1])
+        self.assertEqual(DataframeValidator.duplication_drop_mask(df).tolist(),
+                         df.duplicated(keep='first').tolist())
+        self.assertEqual(DataframeValidator.duplication_check(df.iloc[[0, 1, 3, 5]]), [])
+
+    def test_duplication_check(self):
+        """
+        Test that the duplicated index labels are returned in groups
+        """
+        self.assertEqual(DataframeValidator.duplication_check(self.rows), [['p', 'r'], ['q', 't'], ['v', 'w']])
+        self.assertEqual(DataframeValidator.duplication_check(self.rows.iloc[[0, 1, 3]]), [])
+
+    @staticmethod
+    def reference_complete_matches(df: pd.DataFrame, col_a: str, col_b: str):
+        """
+        Find the complete matches by expanding the neighbours of each value until the component is closed
+        """
+        edges = set(map(tuple, df[[col_a, col_b]].dropna().drop_duplicates().values.tolist()))
+        matches, visited = [], set()
+        for a, _ in sorted(edges):
+            if a in visited:
+                continue
+            a_set, b_set = {a}, set()
+            while True:
+                new_b = {b for x, b in edges if x in a_set}
+                new_a = {x for x, b in edges if b in new_b}
+                if new_a == a_set and new_b == b_set:
+                    break
+                a_set, b_set = new_a, new_b
+            visited |= a_set
+            if sum(1 for x, b in edges if x in a_set) == len(a_set) * len(b_set):
+                matches.append((frozenset(a_set), frozenset(b_set)))
+        return set(matches)
+
+    def test_bipartite_components(self):
+        """
+        Test that the values connected by the (a, b) pairs share a component, and the edges are counted once
+        """
+        df = pd.DataFrame({'a': [1, 1, 2, 3, 3, 4, np.nan], 'b': ['x', 'y', 'y', 'z', 'z', np.nan, 'w']})
+        a_components, b_components, edge_count = DataframeValidator.bipartite_components(df, 'a', 'b')
+        self.assertEqual(sorted(a_components.index.tolist()), [1, 2, 3])
+        self.assertEqual(sorted(b_components.index.tolist()), ['x', 'y', 'z'])
+        self.assertEqual(a_components[1], a_components[2])
+        self.assertEqual(a_components[1], b_components['x'])
+        self.assertNotEqual(a_components[1], a_components[3])
+        self.assertEqual(edge_count[a_components[1]], 3)
+        self.assertEqual(edge_count[a_components[3]], 1)
+        with self.assertRaises(ColumnNotFound):
+            DataframeValidator.bipartite_components(df, 'a', 'missing')
+
+    def test_find_m_to_n_complete_matches(self):
+        """
+        Test that the complete matches are the components with all m x n pairs, on random graphs
+        """
+        random_state = np.random.RandomState(0)
+        for _ in range(20):
+            df = pd.DataFrame({'a': random_state.randint(0, 30, 40), 'b': random_state.randint(100, 130, 40)})
+            matches = DataframeValidator.find_m_to_n_complete_matches(df, 'a', 'b')
+            self.assertEqual({(frozenset(a), frozenset(b)) for a, b in matches},
+                             self.reference_complete_matches(df, 'a', 'b'))
+
+        df = pd.DataFrame({'a': [1, 1, 2, 2, 3, 3, 4], 'b': ['x', 'y', 'x', 'y', 'z', 'w', 'w']})
+        matches = DataframeValidator.find_m_to_n_complete_matches(df, 'a', 'b')
+        self.assertEqual([[sorted(a), sorted(b)] for a, b in matches], [[[1, 2], ['x', 'y']]])
+        self.assertEqual(DataframeValidator.find_m_to_n_complete_matches(df.iloc[[0, 1, 2]], 'a', 'b'), [])
+
+    def test_complete_match_shapes(self):
+        """
+        Test that the entities of the complete matches are assigned to the (m, n) shape of their match
+        """
+        df = pd.DataFrame({'a': [1, 1, 2, 2, 3, 4, 5, 5, 6], 'b': ['x', 'y', 'x', 'y', 'z', 'v', 'u', 'w', 'w']})
+        a_shapes, b_shapes, shape_count = DataframeValidator.complete_match_shapes(df, 'a', 'b')
+        self.assertEqual(shape_count, {(2, 2): 1, (1, 1): 2})
+        self.assertEqual(a_shapes.sort_index().values.tolist(), [[2, 2], [2, 2], [1, 1], [1, 1]])
+        self.assertEqual(a_shapes.sort_index().index.tolist(), [1, 2, 3, 4])
+        self.assertEqual(b_shapes.loc[['x', 'y', 'z', 'v'], 'm'].tolist(), [2, 2, 1, 1])
+        self.assertNotIn('w', b_shapes.index)
+        matches = DataframeValidator.find_m_to_n_complete_matches(df, 'a', 'b')
+        self.assertEqual(sum(shape_count.values()), len(matches))
+
+    def test_orphaned_relation_check(self):
+        """
+        Test that the indices of the orphaned rows are returned
+        """
+        self.assertEqual(DataframeValidator.orphaned_relation_check(self.local, self.foreign, 'key', 'id'),
+                         [12, 15])
+
+    def test_unidirectional_matches(self):
+        """
+        Test that the number of occurrences in the foreign column is returned for each row
+        """
+        self.assertEqual(DataframeValidator.unidirectional_matches(self.local, self.foreign, 'key', 'id'),
+                         [1, 2, 0, 1, 2, 0])
+
+    def test_relational_filter(self):
+        """
+        Test that the indices of the rows which satisfy the query are returned
+        """
+        self.assertEqual(DataframeValidator.relational_filter(self.local, 'value > 25 and key < 5'),
+                         self.local.query('value > 25 and key < 5').index.tolist())
+
+    def test_shared_relational_index(self):
+        """
+        Test that the relational rules reuse the foreign key index of a file
+        """
+        index = RelationalIndex(loader=lambda path: self.foreign)
+        DataframeValidator.orphaned_relation_check(self.local, 'foreign.csv', 'key', 'id', relational_index=index)
+        key_counts = index.key_counts('foreign.csv', 'id')
+        self.assertEqual(DataframeValidator.unidirectional_matches(self.local, 'foreign.csv', 'key', 'id',
+                                                                   relational_index=index),
+                         [1, 2, 0, 1, 2, 0])
+        self.assertIs(index.key_counts('foreign.csv', 'id'), key_counts)
+
+    def test_modified_dataframes(self):
+        """
+        Test that the relational rules see the dataframes modified in place between calls
+        """
+        index = RelationalIndex()
+        DataframeValidator.orphaned_relation_check(self.local, self.foreign, 'key', 'id', relational_index=index)
+        self.local.loc[12, 'key'] = 4
+        self.foreign.loc[0, 'id'] = 5
+        self.assertEqual(DataframeValidator.orphaned_relation_check(self.local, self.foreign, 'key', 'id',
+                                                                    relational_index=index),
+                         [10])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,42 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+# Copyright 2019 SAP SE or an SAP affiliate company. All rights reserved
+# ============================================================================
+
+import unittest
+
+import numpy as np
+
+from xai.data.explorer.numerical.numerical_analyzer import NumericDataAnalyzer
+
+
+class TestNumericDataAnalyzer(unittest.TestCase):
+
+    def test_feed_all_array(self):
+        """
+        Test that feeding a numerical array in bulk gives the same statistics as feeding its values one by one
+        """
+        values = np.random.RandomState(0).normal(size=200)
+        values[[3, 50, 120]] = np.nan
+        for array in [values, np.arange(100)]:
+            bulk = NumericDataAnalyzer()
+            bulk.feed_all(array)
+            single = NumericDataAnalyzer()
+            for value in array.tolist():
+                single.feed(value)
+            self.assertEqual(bulk.get_statistics().to_json(), single.get_statistics().to_json())
+        self.assertEqual(bulk.get_statistics().nan_count, 0)
+
+    def test_feed_all_list(self):
+        """
+        Test that a list is fed value by value
+        """
+        analyzer = NumericDataAnalyzer()
+        analyzer.feed_all([1, 2.5, float('nan')])
+        stats = analyzer.get_statistics()
+        self.assertEqual(stats.total_count, 2)
+        self.assertEqual(stats.nan_count, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,108 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+# Copyright 2019 SAP SE or an SAP affiliate company. All rights reserved
+# ============================================================================
+
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from xai.data.validator.dataframe_validator import DataframeValidator
+from xai.data.validator.partitioned_validator import PartitionedValidator
+
+
+class TestPartitionedValidator(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.tmp_dir = tempfile.mkdtemp()
+        self.data_path = os.path.join(self.tmp_dir, 'data.csv')
+        self.foreign_path = os.path.join(self.tmp_dir, 'foreign.csv')
+        # the key column is int in the first chunks, and float in the chunk with a missing key
+        rows = ['id,key,value'] + ['%d,%d,%d' % (idx % 4, idx % 5, idx % 3) for idx in range(8)] + \
+               ['1,1,1', '2,,2', '1,1.0,1', '3,7,0', '0,3,0', '2,,2']
+        with open(self.data_path, 'w') as fp:
+            fp.write('\n'.join(rows) + '\n')
+        with open(self.foreign_path, 'w') as fp:
+            fp.write('fk\n1\n2\n3.0\n\n')
+
+    def in_memory_flags(self, df: pd.DataFrame, foreign: pd.DataFrame, key_col=None):
+        """
+        Return the duplicated and orphaned row positions of the in-memory checks
+        """
+        drop_mask = DataframeValidator.duplication_drop_mask(df, key_col)
+        kept = df.reset_index(drop=True)[~drop_mask]
+        orphaned = DataframeValidator().orphaned_relation_check(kept, foreign, 'key', 'fk')
+        return np.flatnonzero(drop_mask).tolist(), orphaned
+
+    def test_parity_with_dtype_drift(self):
+        """
+        Test that the duplicates and orphans of csv files read in small chunks match the in-memory checks,
+        when the dtypes of the columns differ between the chunks
+        """
+        df = pd.read_csv(self.data_path)
+        foreign = pd.read_csv(self.foreign_path)
+        for key_col in [None, ['id', 'key']]:
+            duplicated, orphaned = self.in_memory_flags(df, foreign, key_col)
+            self.assertGreater(len(duplicated), 0)
+            self.assertGreater(len(orphaned), 0)
+            with PartitionedValidator(self.data_path, num_partitions=3, chunk_size=4) as validator:
+                self.assertEqual(validator.duplication_check(key_col), len(duplicated))
+                self.assertEqual(validator.orphaned_relation_check('key', self.foreign_path, 'fk'), len(orphaned))
+                self.assertEqual(validator.num_rows, len(df))
+
+                output_path = os.path.join(self.tmp_dir, 'output.csv')
+                validator.write(output_path, drop_orphans=False)
+                self.assertEqual(pd.read_csv(output_path, index_col=0).index.tolist(),
+                                 [idx for idx in range(len(df)) if idx not in duplicated])
+                validator.write(output_path, drop_orphans=True)
+                self.assertEqual(pd.read_csv(output_path, index_col=0).index.tolist(),
+                                 [idx for idx in range(len(df)) if idx not in duplicated and idx not in orphaned])
+
+    def test_parity_dataframe(self):
+        """
+        Test that the checks of a dataframe match the in-memory checks for various partitions and chunks
+        """
+        random_state = np.random.RandomState(0)
+        df = pd.DataFrame({'key': random_state.randint(0, 60, 500),
+                           'value': random_state.randint(0, 3, 500),
+                           'name': random_state.choice(['a', 'b', 'c'], 500)})
+        foreign = pd.DataFrame({'fk': np.arange(0, 60, 2)})
+        duplicated, orphaned = self.in_memory_flags(df, foreign, ['key', 'name'])
+        for num_partitions, chunk_size in [(1, 1000), (4, 37), (16, 7)]:
+            with PartitionedValidator(df, num_partitions=num_partitions, chunk_size=chunk_size) as validator:
+                self.assertEqual(validator.duplication_check(['key', 'name']), len(duplicated))
+                self.assertEqual(validator.orphaned_relation_check('key', foreign, 'fk'), len(orphaned))
+
+    def test_large_integers(self):
+        """
+        Test that int64 keys above 2^53 are hashed in their own dtype, so that they are not merged
+        """
+        path = os.path.join(self.tmp_dir, 'large.csv')
+        df = pd.DataFrame({'key': [2 ** 53, 2 ** 53 + 1, 2 ** 53 + 2, 2 ** 53 + 1], 'value': [1, 1, 1, 1]})
+        df.to_csv(path, index=False)
+        foreign = pd.DataFrame({'fk': [2 ** 53, 2 ** 53 + 2]})
+        duplicated, orphaned = self.in_memory_flags(df, foreign)
+        self.assertEqual(duplicated, [3])
+        for data in [df, path]:
+            with PartitionedValidator(data, num_partitions=2, chunk_size=2) as validator:
+                self.assertEqual(validator.duplication_check(), len(duplicated))
+                self.assertEqual(validator.orphaned_relation_check('key', foreign, 'fk'), len(orphaned))
+
+    def test_orphans_without_duplication_check(self):
+        """
+        Test that all rows are checked for orphans when the duplication check is not run
+        """
+        df = pd.DataFrame({'key': [1, 2, 2, 5]})
+        with PartitionedValidator(df, num_partitions=2, chunk_size=3) as validator:
+            self.assertEqual(validator.orphaned_relation_check('key', pd.DataFrame({'fk': [2]}), 'fk'), 2)
+
+    def tearDown(self) -> None:
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    unittest.main()
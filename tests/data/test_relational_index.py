@@ -0,0 +1,98 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+# Copyright 2019 SAP SE or an SAP affiliate company. All rights reserved
+# ============================================================================
+
+import os
+import tempfile
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from xai.data.exceptions import ColumnNotFound
+from xai.data.validator.relational_index import RelationalIndex
+
+
+class TestRelationalIndex(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.local = pd.DataFrame({'key': [1, 2, 3, np.nan, 2, 5], 'value': [10, 20, 30, 40, 50, 60]})
+        self.foreign = pd.DataFrame({'id': [1, 2, 2, np.nan, 4], 'flag': [0, 1, 1, 0, 1]})
+
+    def test_occurrence_counts(self):
+        """
+        Test that each local row gets the number of occurrences of its key in the foreign column, NaN included
+        """
+        counts = RelationalIndex().occurrence_counts(self.local, 'key', self.foreign, 'id')
+        self.assertEqual(counts.tolist(), [1, 2, 0, 1, 2, 0])
+
+    def test_orphan_mask(self):
+        """
+        Test that the rows whose key is missing in the foreign column are orphaned
+        """
+        orphaned = RelationalIndex().orphan_mask(self.local, 'key', self.foreign, 'id')
+        self.assertEqual(orphaned.tolist(), [False, False, True, False, False, True])
+
+    def test_filter_mask(self):
+        """
+        Test that the filter mask matches the rows selected by the query
+        """
+        index = RelationalIndex()
+        mask = index.filter_mask(self.local, 'value > 25 and key < 5')
+        self.assertEqual(mask.tolist(), self.local.eval('value > 25 and key < 5').tolist())
+
+    def test_orphan_rules_mask(self):
+        """
+        Test that the rows orphaned by any rule are dropped and the orphans are counted per rule
+        """
+        other = pd.DataFrame({'value': [10, 30, 60]})
+        rules = [{'local_key': 'key', 'foreign_data': self.foreign, 'foreign_key': 'id'},
+                 {'local_key': 'value', 'foreign_data': other, 'foreign_key': 'value'}]
+        all_orphaned, orphan_count = RelationalIndex().orphan_rules_mask(self.local, rules)
+        self.assertEqual(all_orphaned.tolist(), [False, True, True, True, True, True])
+        self.assertEqual(orphan_count, {0: 2, 1: 3})
+
+    def test_shared_builds(self):
+        """
+        Test that a foreign file is loaded once and its key index is built once for several rules
+        """
+        loaded = []
+
+        def loader(path):
+            loaded.append(path)
+            return pd.read_csv(path)
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, 'foreign.csv')
+            self.foreign.to_csv(path, index=False)
+            index = RelationalIndex(loader=loader)
+            first = index.orphan_mask(self.local, 'key', path, 'id')
+            second = index.occurrence_counts(self.local, 'key', path, 'id')
+            self.assertEqual(loaded, [path])
+            self.assertIs(index.key_counts(path, 'id'), index.key_counts(path, 'id'))
+            self.assertEqual(first.tolist(), (second == 0).tolist())
+
+    def test_dataframes_not_cached(self):
+        """
+        Test that dataframe sources are not kept by the index across calls
+        """
+        index = RelationalIndex()
+        index.orphan_rules_mask(self.local, [{'local_key': 'key', 'foreign_data': self.foreign, 'foreign_key': 'id'}])
+        self.assertEqual(index._tables, {})
+        self.assertEqual(index._key_counts, {})
+        self.assertIsNot(index.key_counts(self.foreign, 'id'), index.key_counts(self.foreign, 'id'))
+
+    def test_column_not_found(self):
+        """
+        Test that missing local and foreign columns raise ColumnNotFound
+        """
+        index = RelationalIndex()
+        with self.assertRaises(ColumnNotFound):
+            index.orphan_mask(self.local, 'missing', self.foreign, 'id')
+        with self.assertRaises(ColumnNotFound):
+            index.orphan_mask(self.local, 'key', self.foreign, 'missing')
+
+
+if __name__ == '__main__':
+    unittest.main()
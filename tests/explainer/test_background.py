@@ -0,0 +1,77 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+# Copyright 2019 SAP SE or an SAP affiliate company. All rights reserved
+# ============================================================================
+
+import unittest
+
+import numpy as np
+
+from xai.explainer.background import summarize_background, background_error
+from xai.explainer.constants import BACKGROUND
+
+
+class TestBackground(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.data = np.random.RandomState(0).rand(200, 3)
+        self.labels = np.array([0] * 190 + [1] * 10)
+
+    def test_summarize_background(self):
+        """
+        Test the size and weights of the summarized background
+        """
+        for method in [BACKGROUND.KMEANS, BACKGROUND.STRATIFIED, BACKGROUND.SAMPLE]:
+            data, weights = summarize_background(self.data, size=20, method=method,
+                                                 training_labels=self.labels, random_state=0)
+            self.assertEqual(data.shape[1], 3)
+            self.assertEqual(len(data), len(weights))
+            self.assertAlmostEqual(weights.sum(), 1)
+
+    def test_summarize_background_stratified(self):
+        """
+        Test that the stratified sample keeps the label frequencies in the weights
+        """
+        data, weights = summarize_background(self.data, size=20, method=BACKGROUND.STRATIFIED,
+                                             training_labels=self.labels, random_state=0)
+        minority = np.isin(data[:, 0], self.data[self.labels == 1, 0])
+        self.assertEqual(minority.sum(), 1)
+        self.assertAlmostEqual(weights[minority].sum(), 0.05)
+
+    def test_summarize_background_unsupported_method(self):
+        """
+        Test exception check when unsupported method is provided
+        """
+        with self.assertRaises(ValueError):
+            summarize_background(self.data, size=20, method='unsupported_method')
+
+    def test_background_error(self):
+        """
+        Test the error of the expected model output over the background
+        """
+        def predict_fn(x):
+            return x[:, 0]
+
+        background = np.array([[0.], [1.]])
+        error = background_error(predict_fn, self.data[:, :1], background, np.array([0.5, 0.5]))
+        self.assertAlmostEqual(error, abs(self.data[:, 0].mean() - 0.5))
+
+    def test_background_error_sample(self):
+        """
+        Test that the error is estimated on a bounded sample of the training data
+        """
+        sizes = []
+
+        def predict_fn(x):
+            sizes.append(len(x))
+            return x[:, 0]
+
+        background = np.array([[0.], [1.]])
+        error = background_error(predict_fn, self.data[:, :1], background, np.array([0.5, 0.5]),
+                                 sample_size=50, random_state=0)
+        self.assertEqual(sum(sizes), 50 + len(background))
+        self.assertLess(error, 0.2)
+
+
+if __name__ == '__main__':
+    unittest.main()
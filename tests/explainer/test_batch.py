@@ -0,0 +1,76 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+# Copyright 2019 SAP SE or an SAP affiliate company. All rights reserved
+# ============================================================================
+
+import unittest
+
+import numpy as np
+
+from xai.explainer.batch import predict_in_batches, explain_in_batches
+
+
+class TestBatch(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.calls = []
+
+    def predict_fn(self, x):
+        self.calls.append(len(x))
+        return np.asarray(x).sum(axis=1)
+
+    def test_predict_in_batches(self):
+        """
+        Test that inputs are predicted in bounded calls and split back in order
+        """
+        inputs = [np.ones((3, 2)), 2 * np.ones((4, 2)), 3 * np.ones((1, 2))]
+        outputs = predict_in_batches(self.predict_fn, inputs, batch_size=5)
+        self.assertEqual(self.calls, [5, 3])
+        self.assertEqual([list(output) for output in outputs], [[2.0] * 3, [4.0] * 4, [6.0]])
+
+    def test_explain_in_batches(self):
+        """
+        Test that explanations with several model calls and random perturbations match the unbatched ones
+        """
+
+        def explain_fn(instance, predict_fn):
+            noise = random_state.rand(5, 2)
+            first = predict_fn(instance + noise)
+            second = predict_fn(first.reshape(-1, 1) + noise[:, :1])
+            return float(second.sum())
+
+        instances = [np.zeros(2), np.ones(2), 2 * np.ones(2)]
+        random_state = np.random.RandomState(0)
+        expected = [explain_fn(instance, self.predict_fn) for instance in instances]
+
+        self.calls = []
+        random_state = np.random.RandomState(0)
+        explanations = explain_in_batches(explain_fn, instances, self.predict_fn, batch_size=100,
+                                          random_state=random_state)
+        self.assertEqual(self.calls, [15, 15])
+        self.assertEqual(explanations, expected)
+
+    def test_seed_each(self):
+        """
+        Test that the instances seeded each do not depend on the batching, when the model is called first
+        """
+
+        def explain_fn(instance, predict_fn):
+            first = predict_fn(instance.reshape(1, -1))
+            noise = random_state.rand(5, 2)
+            return float(predict_fn(first + noise).sum())
+
+        instances = [np.zeros(2), np.ones(2), 2 * np.ones(2)]
+        random_state = np.random.RandomState(0)
+        explanations = explain_in_batches(explain_fn, instances, self.predict_fn, random_state=random_state,
+                                          seed_each=True)
+        for idx, instance in enumerate(instances):
+            random_state = np.random.RandomState(0)
+            self.assertEqual(explain_in_batches(explain_fn, instances[:idx + 1], self.predict_fn,
+                                                random_state=random_state, seed_each=True)[idx],
+                             explanations[idx])
+        self.assertEqual(len(set(explanations)), 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,81 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+# Copyright 2019 SAP SE or an SAP affiliate company. All rights reserved
+# ============================================================================
+
+import json
+import pickle
+import unittest
+
+from xai.explainer.constants import MODE, OUTPUT
+from xai.explainer.explanation import CompactExplanation, FeatureTable
+
+
+class TestExplanation(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.feature_table = FeatureTable(['a', 'b'])
+        self.explanation = CompactExplanation.from_lists(
+            self.feature_table,
+            {0: (0.3, [('a', -0.5), ('c', 0.25)]),
+             1: (0.7, [('a', 0.5), ('b', 0.75)])})
+
+    def test_feature_table(self):
+        """
+        Test that the feature names are shared and only added once
+        """
+        self.assertEqual(self.feature_table.names, ['a', 'b', 'c'])
+        self.assertEqual(self.feature_table.index('b'), 1)
+        self.assertEqual(len(self.feature_table), 3)
+
+    def test_json(self):
+        """
+        Test the conversion to the schema of `explanation_to_json`, with the features sorted by score
+        """
+        expected = {0: {OUTPUT.PREDICTION: 0.3,
+                        OUTPUT.EXPLANATION: [{OUTPUT.FEATURE: 'c', OUTPUT.SCORE: 0.25},
+                                             {OUTPUT.FEATURE: 'a', OUTPUT.SCORE: -0.5}]},
+                    1: {OUTPUT.PREDICTION: 0.7,
+                        OUTPUT.EXPLANATION: [{OUTPUT.FEATURE: 'b', OUTPUT.SCORE: 0.75},
+                                             {OUTPUT.FEATURE: 'a', OUTPUT.SCORE: 0.5}]}}
+        self.assertEqual(list(self.explanation.keys()), [0, 1])
+        self.assertEqual(self.explanation[1], expected[1])
+        self.assertEqual(self.explanation.to_json(), expected)
+        self.assertEqual(self.explanation, expected)
+        with self.assertRaises(KeyError):
+            _ = self.explanation[2]
+
+    def test_dict(self):
+        """
+        Test that the explanation is a JSON serializable and mutable dict, with the arrays kept as they were built
+        """
+        self.assertIsInstance(self.explanation, dict)
+        self.assertEqual(json.loads(json.dumps(self.explanation))['1'][OUTPUT.PREDICTION], 0.7)
+        self.explanation[1][OUTPUT.PREDICTION] = 1.0
+        self.explanation.add_info({OUTPUT.NUM_SAMPLES: 10})
+        self.assertEqual(self.explanation[0][OUTPUT.NUM_SAMPLES], 10)
+        self.assertEqual(self.explanation.predictions, [0.3, 0.7])
+
+    def test_regression(self):
+        """
+        Test the regression schema with additional entries
+        """
+        explanation = CompactExplanation(self.feature_table, None, [1.5], [[1]], [[0.5]], mode=MODE.REGRESSION,
+                                         info={OUTPUT.NUM_SAMPLES: 100})
+        self.assertEqual(explanation.to_json(), {OUTPUT.PREDICTION: 1.5,
+                                                 OUTPUT.EXPLANATION: [{OUTPUT.FEATURE: 'b', OUTPUT.SCORE: 0.5}],
+                                                 OUTPUT.NUM_SAMPLES: 100})
+
+    def test_pickle(self):
+        """
+        Test that a pickled explanation only keeps the feature names it uses
+        """
+        self.feature_table.index('d')
+        explanation = CompactExplanation.from_lists(self.feature_table, {0: (1.0, [('c', 1.0), ('a', 0.5)])})
+        loaded = pickle.loads(pickle.dumps(explanation))
+        self.assertEqual(sorted(loaded.feature_table.names), ['a', 'c'])
+        self.assertEqual(loaded, explanation)
+
+
+if __name__ == '__main__':
+    unittest.main()
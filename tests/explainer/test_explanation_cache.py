@@ -0,0 +1,118 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+# Copyright 2019 SAP SE or an SAP affiliate company. All rights reserved
+# ============================================================================
+
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+from sklearn.datasets import load_breast_cancer
+from sklearn.linear_model import LogisticRegression
+
+from xai.explainer.explanation_cache import ExplanationCache, STORE_FILE, model_fingerprint
+from xai.model.interpreter.model_interpreter import ModelInterpreter
+
+_data = np.random.RandomState(1).rand(40, 3)
+_model = LogisticRegression().fit(_data, (_data[:, 0] > 0.5).astype(int))
+
+
+def _predict_fn(x):
+    return _model.predict_proba(x)
+
+
+class TestExplanationCache(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.cache_dir = tempfile.mkdtemp()
+        self.data = np.random.RandomState(0).rand(6, 3)
+        self.calls = []
+
+    def tearDown(self) -> None:
+        shutil.rmtree(self.cache_dir)
+
+    def explain_fn(self, instances):
+        self.calls.append(len(instances))
+        return [{0: {'prediction': float(row[0]), 'explanation': []}} for row in instances]
+
+    def test_explain(self):
+        """
+        Test that only the cache misses are explained, also after reopening the cache
+        """
+        context = ExplanationCache.context('lime', None, num_samples=100)
+        cache = ExplanationCache(self.cache_dir)
+        cache.explain(context, self.data[:4], self.explain_fn)
+        explanations = ExplanationCache(self.cache_dir).explain(context, self.data, self.explain_fn)
+        self.assertEqual(self.calls, [4, 2])
+        self.assertEqual([exp[0]['prediction'] for exp in explanations], list(self.data[:, 0]))
+
+        other_context = ExplanationCache.context('lime', None, num_samples=200)
+        ExplanationCache(self.cache_dir).explain(other_context, self.data[:1], self.explain_fn)
+        self.assertEqual(self.calls, [4, 2, 1])
+
+    def test_truncated_record(self):
+        """
+        Test that a partly written record at the end of the file is dropped
+        """
+        context = ExplanationCache.context('lime', None)
+        ExplanationCache(self.cache_dir).put(context, self.data[:2], self.explain_fn(self.data[:2]))
+        path = os.path.join(self.cache_dir, STORE_FILE)
+        with open(path, 'r+b') as fp:
+            fp.truncate(os.path.getsize(path) - 1)
+        cache = ExplanationCache(self.cache_dir)
+        self.assertEqual(cache.stats()['entries'], 1)
+        self.assertIsNone(cache.get(context, self.data[1:2])[0])
+
+    def test_eviction(self):
+        """
+        Test that the cache file is compacted to the most recent explanations
+        """
+        context = ExplanationCache.context('lime', None)
+        cache = ExplanationCache(self.cache_dir)
+        cache.put(context, self.data[:1], self.explain_fn(self.data[:1]))
+        record_size = cache.stats()['bytes']
+        cache.max_bytes = record_size * 4
+        cache.put(context, self.data[1:], self.explain_fn(self.data[1:]))
+        self.assertEqual(cache.stats()['entries'], 2)
+        self.assertEqual(os.path.getsize(cache.path), 2 * record_size)
+        results = ExplanationCache(self.cache_dir).get(context, self.data)
+        self.assertEqual([exp is not None for exp in results], [False] * 4 + [True] * 2)
+
+    def test_model_fingerprint(self):
+        """
+        Test that a module-level predict function is hashed with the model it refers to
+        """
+        global _model
+        fingerprint = model_fingerprint(_predict_fn)
+        self.assertEqual(model_fingerprint(_predict_fn), fingerprint)
+        self.assertEqual(model_fingerprint(_model.predict_proba), model_fingerprint(_model))
+        model = _model
+        try:
+            _model = LogisticRegression(C=0.1).fit(_data, (_data[:, 1] > 0.5).astype(int))
+            self.assertNotEqual(model_fingerprint(_predict_fn), fingerprint)
+            self.assertNotEqual(model_fingerprint(_model), model_fingerprint(model))
+        finally:
+            _model = model
+        self.assertEqual(model_fingerprint(_predict_fn), fingerprint)
+
+    def test_model_interpreter(self):
+        """
+        Test that a rerun of the model interpreter reuses the cached explanations
+        """
+        data = load_breast_cancer()
+        clf = LogisticRegression(max_iter=5000).fit(data.data, data.target)
+        results = []
+        for _ in range(2):
+            interpreter = ModelInterpreter(domain='tabular', algorithm='linear', cache_dir=self.cache_dir)
+            interpreter.build_interpreter(training_data=data.data, predict_fn=clf.predict_proba,
+                                          feature_names=list(data.feature_names))
+            results.append(interpreter.interpret_model(samples=data.data[:20], k=3))
+        self.assertEqual(results[0], results[1])
+        self.assertEqual(interpreter.get_cache_stats()['hits'], 20)
+        self.assertEqual(interpreter.get_cache_stats()['misses'], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,100 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+# Copyright 2019 SAP SE or an SAP affiliate company. All rights reserved
+# ============================================================================
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from sklearn.datasets import load_breast_cancer
+from sklearn.linear_model import LogisticRegression
+
+from xai.explainer.explanation_store import ExplanationStore, CHECKPOINT_FILE
+from xai.model.interpreter.explanation_aggregator import ExplanationAggregator
+from xai.model.interpreter.model_interpreter import ModelInterpreter
+
+
+class TestExplanationStore(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.store_dir = tempfile.mkdtemp()
+        self.explanations = [
+            {0: {'prediction': 0.9, 'explanation': [{'feature': 'a', 'score': 0.5}, {'feature': 'b', 'score': 0.25}]},
+             1: {'prediction': 0.1, 'explanation': [{'feature': 'c', 'score': -0.5}]}},
+            {1: {'prediction': 0.85, 'explanation': [{'feature': 'b', 'score': 1.0}], 'num_samples': 500}},
+            {0: {'prediction': 0.95, 'explanation': []}}
+        ]
+
+    def tearDown(self) -> None:
+        shutil.rmtree(self.store_dir)
+
+    def test_shards(self):
+        """
+        Test that the explanations are written in complete shards and read back in order
+        """
+        store = ExplanationStore(self.store_dir, run_key='run', shard_size=2)
+        for explanation in self.explanations:
+            store.append(explanation, weight=3)
+        self.assertEqual(store.num_stored, 2)
+        store.flush()
+
+        store = ExplanationStore(self.store_dir, run_key='run', shard_size=2)
+        self.assertEqual(store.num_stored, 3)
+        loaded = list(store.iter_explanations())
+        self.assertEqual([explanation.to_json() for explanation, _ in loaded], self.explanations)
+        self.assertEqual([weight for _, weight in loaded], [3, 3, 3])
+
+        with self.assertRaises(ValueError):
+            ExplanationStore(self.store_dir, run_key='other run')
+
+    def test_feature_names(self):
+        """
+        Test that the feature names keep their type, e.g. the integer feature indices of shap
+        """
+        explanations = [{0: {'prediction': 0.9, 'explanation': [{'feature': 0, 'score': 0.5},
+                                                                {'feature': '0', 'score': 0.25}]}}]
+        store = ExplanationStore(self.store_dir)
+        store.append(explanations[0])
+        store.flush()
+        loaded = [explanation.to_json() for explanation, _ in store.iter_explanations()]
+        self.assertEqual(loaded, explanations)
+        self.assertIsInstance(loaded[0][0]['explanation'][0]['feature'], int)
+
+    def test_load_into(self):
+        """
+        Test that the stored explanations give the statistics of the weighted explanations
+        """
+        store = ExplanationStore(self.store_dir, shard_size=2)
+        aggregator = ExplanationAggregator()
+        for explanation in self.explanations:
+            store.append(explanation, weight=2)
+            aggregator.feed(explanation, weight=2)
+        store.flush()
+        loaded = store.load_into(ExplanationAggregator())
+        for stats_type in ['top_k', 'average_score', 'average_ranking']:
+            self.assertEqual(loaded.get_statistics(stats_type), aggregator.get_statistics(stats_type))
+
+    def test_model_interpreter(self):
+        """
+        Test that a rerun of the model interpreter resumes from the stored explanations
+        """
+        data = load_breast_cancer()
+        clf = LogisticRegression(max_iter=5000).fit(data.data, data.target)
+        interpreter = ModelInterpreter(domain='tabular', algorithm='linear')
+        interpreter.build_interpreter(training_data=data.data, predict_fn=clf.predict_proba,
+                                      feature_names=list(data.feature_names))
+        expected = interpreter.interpret_model(samples=data.data[:20], k=3)
+        self.assertEqual(interpreter.interpret_model(samples=data.data[:20], k=3, checkpoint_dir=self.store_dir),
+                         expected)
+
+        # without the checkpoint, the statistics are rebuilt from the shards without explaining any sample
+        os.remove(os.path.join(self.store_dir, 'interpret_model', CHECKPOINT_FILE))
+        interpreter._explainer.explain_instance = None
+        self.assertEqual(interpreter.interpret_model(samples=data.data[:20], k=3, checkpoint_dir=self.store_dir),
+                         expected)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,64 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+# Copyright 2019 SAP SE or an SAP affiliate company. All rights reserved
+# ============================================================================
+
+import unittest
+
+import numpy as np
+
+from xai.explainer.feature_groups import FeatureGroups
+from xai.explainer.helper import parse_feature_groups
+
+
+class TestFeatureGroups(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.feature_names = ['age', 'red', 'green', 'e0', 'e1']
+        self.training_data = np.array([[30, 1, 0, 0.5, 0.1],
+                                       [40, 0, 1, 0.2, 0.3],
+                                       [50, 1, 0, 0.5, 0.1]], dtype=float)
+        self.groups = FeatureGroups({'embedding': [4, 3], 'color': [1, 2]}, 5, self.feature_names)
+
+    def test_groups(self):
+        """
+        Test that the groups partition the columns in the order of their first column
+        """
+        self.assertEqual(self.groups.names, ['age', 'color', 'embedding'])
+        self.assertEqual([group.tolist() for group in self.groups.columns], [[0], [1, 2], [3, 4]])
+        self.assertEqual(self.groups.group_index([0, 2]), [0])
+        self.assertEqual(self.groups.labels(self.training_data[1]), ['age = 40.0', 'color = green', 'embedding'])
+
+        with self.assertRaises(ValueError):
+            FeatureGroups({'a': [0, 1], 'b': [1]}, 5)
+        with self.assertRaises(ValueError):
+            FeatureGroups({'a': [5]}, 5)
+
+    def test_encode(self):
+        """
+        Test the codes of the distinct values of the groups, and the decoding of perturbations
+        """
+        encoded = self.groups.fit_encode(self.training_data)
+        self.assertEqual(encoded.tolist(), [[30, 1, 1], [40, 0, 0], [50, 1, 1]])
+        self.assertEqual(self.groups.categorical_features(), [1, 2])
+        self.assertEqual(self.groups.categorical_names(), {1: ['green', 'red'], 2: ['0', '1']})
+
+        # values which are not in the training data take the closest code, and are restored by the decoding
+        instance = np.array([35, 0, 1, 0.25, 0.3])
+        self.assertEqual(self.groups.encode(instance).tolist(), [35, 0, 0])
+        decoded = self.groups.decode(np.array([[35, 0, 0], [60, 1, 1]]), instance)
+        self.assertEqual(decoded.tolist(), [instance.tolist(), [60, 1, 0, 0.5, 0.1]])
+
+    def test_parse_feature_groups(self):
+        """
+        Test parsing the groups of the feature meta data, by name or index
+        """
+        metadata = {'feature_groups': {'color': ['red', 'green'], 'embedding': [3, 4]}}
+        self.assertEqual(parse_feature_groups(metadata, self.feature_names), {'color': [1, 2], 'embedding': [3, 4]})
+        self.assertEqual(parse_feature_groups({}), {})
+        with self.assertRaises(ValueError):
+            parse_feature_groups({'feature_groups': {'color': ['blue']}}, self.feature_names)
+
+
+if __name__ == '__main__':
+    unittest.main()
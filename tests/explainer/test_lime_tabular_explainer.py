@@ -71,6 +71,50 @@ class TestLimeTabularExplainer(unittest.TestCase):
         new_explainer.load_explainer(self.save_path)
         self.assertIsNotNone(new_explainer.explainer_object)
 
+    def test_explain_instances(self):
+        """
+        Test that batched explanations are the same as explaining one instance at a time
+        """
+        data = np.random.RandomState(0).rand(50, 3)
+
+        def predict_fn(x):
+            score = 1 / (1 + np.exp(-(x[:, 0] - x[:, 1])))
+            return np.vstack([1 - score, score]).T
+
+        explainer = LimeTabularExplainer()
+        explainer.build_explainer(data, mode=xai.MODE.CLASSIFICATION, predict_fn=predict_fn,
+                                  random_state=0)
+        expected = [explainer.explain_instance(data[i], num_samples=200) for i in range(3)]
+
+        explainer = LimeTabularExplainer()
+        explainer.build_explainer(data, mode=xai.MODE.CLASSIFICATION, predict_fn=predict_fn,
+                                  random_state=0)
+        explanations = explainer.explain_instances([data[i] for i in range(3)], num_samples=200,
+                                                   batch_size=250)
+        self.assertEqual(explanations, expected)
+
+    def test_feature_groups(self):
+        """
+        Test that a group of one-hot columns is perturbed and explained as a single feature
+        """
+        rng = np.random.RandomState(0)
+        data = np.hstack([rng.rand(50, 1), np.eye(3)[rng.randint(3, size=50)]])
+
+        def predict_fn(x):
+            # the one-hot columns are always perturbed together
+            self.assertTrue(np.all(x[:, 1:].sum(axis=1) == 1))
+            score = 1 / (1 + np.exp(-(x[:, 0] + x[:, 2])))
+            return np.vstack([1 - score, score]).T
+
+        explainer = LimeTabularExplainer()
+        explainer.build_explainer(data, mode=xai.MODE.CLASSIFICATION, predict_fn=predict_fn,
+                                  feature_names=['x', 'red', 'green', 'blue'], feature_groups={'color': [1, 2, 3]},
+                                  random_state=0)
+        explanation = explainer.explain_instance(data[0], num_samples=200)
+        features = {item['feature'] for item in explanation[1]['explanation']}
+        self.assertEqual(len(features), 2)
+        self.assertIn('color=%s' % ['red', 'green', 'blue'][int(np.argmax(data[0, 1:]))], features)
+
     def tearDown(self) -> None:
         if os.path.exists(self.save_path):
             os.remove(self.save_path)
@@ -6,6 +6,7 @@
 import os
 import unittest
 
+import numpy as np
 from lime.lime_text import LimeTextExplainer as OriginalLimeTextExplainer
 
 from xai.explainer.explainer_exceptions import ExplainerUninitializedError
@@ -56,6 +57,32 @@ class TestLimeTextExplainer(unittest.TestCase):
         new_explainer.load_explainer(self.save_path)
         self.assertIsNotNone(new_explainer.explainer_object)
 
+    def test_hierarchical(self):
+        """
+        Test that the words of the top segments are explained with a bounded number of model calls
+        """
+        sentences = ['The weather is nice today.', 'We walked in the park.', 'Dinner was at eight.',
+                     'Then we went home.']
+        document = ' '.join(sentences * 2 + ['The movie was terrible.'] + sentences * 2)
+        texts = []
+
+        def predict_fn(x):
+            texts.extend(x)
+            score = np.array([0.9 if 'terrible' in text else 0.2 for text in x])
+            return np.vstack([1 - score, score]).T
+
+        explainer = LimeTextExplainer()
+        explainer.build_explainer(predict_fn=predict_fn, hierarchical=True, max_segments=10)
+        explainer.set_random_state(0)
+        explanation = explainer.explain_instance(document, num_samples=200, num_top_segments=2,
+                                                 num_segment_samples=100)
+        self.assertLessEqual(len(texts), 300)
+        self.assertEqual(explanation[1]['explanation'][0]['feature'], 'terrible')
+        self.assertEqual(len(explanation[1]['segments']), 2)
+        self.assertIn('The movie was terrible.', explanation[1]['segments'][0] + explanation[1]['segments'][1])
+        # the split function of the document is not left on the shared explainer
+        self.assertEqual(explainer.segment_explainer.split_expression, r'\W+')
+
     def tearDown(self) -> None:
         if os.path.exists(self.save_path):
             os.remove(self.save_path)
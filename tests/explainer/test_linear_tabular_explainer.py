@@ -0,0 +1,96 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+# Copyright 2019 SAP SE or an SAP affiliate company. All rights reserved
+# ============================================================================
+
+import os
+import unittest
+
+import numpy as np
+from sklearn.linear_model import LinearRegression, LogisticRegression
+
+import xai
+from xai.explainer.constants import OUTPUT
+from xai.explainer.explainer_exceptions import ExplainerUninitializedError
+from xai.explainer.helper import get_model_specific_algorithm
+from xai.explainer.tabular.linear_tabular_explainer import LinearTabularExplainer
+
+
+class TestLinearTabularExplainer(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.save_path = 'linear_tabular_explainer.pkl'
+        self.data = np.random.RandomState(0).rand(100, 3)
+        self.model = LinearRegression().fit(self.data, self.data.dot([3., -2., 0.5]))
+
+    def test_build_explainer_uninitialized_explainer(self):
+        """
+        Test exception check when explain_instance is called for un-built explainer
+        """
+        with self.assertRaises(ExplainerUninitializedError, msg='Algorithm should raise '
+                                                                'uninitialized error if exlpainers'
+                                                                'build method is not called'):
+            explainer = LinearTabularExplainer()
+            explainer.explain_instance(np.array([0]))
+
+    def test_explain_instance_regression(self):
+        """
+        Test that the attributions add up to the difference from the average prediction
+        """
+        explainer = LinearTabularExplainer()
+        explainer.build_explainer(training_data=self.data, predict_fn=self.model.predict,
+                                  feature_names=['a', 'b', 'c'])
+        self.assertEqual(explainer.mode, xai.MODE.REGRESSION)
+        self.assertEqual(get_model_specific_algorithm(xai.DOMAIN.TABULAR, self.model.predict), xai.ALG.LINEAR)
+
+        explanation = explainer.explain_instance(self.data[0], num_features=None)
+        prediction = self.model.predict(self.data[:1])[0]
+        self.assertAlmostEqual(explanation[OUTPUT.PREDICTION], prediction)
+        self.assertAlmostEqual(sum(exp[OUTPUT.SCORE] for exp in explanation[OUTPUT.EXPLANATION]),
+                               prediction - self.model.predict(self.data).mean())
+
+    def test_explain_instance_classification(self):
+        """
+        Test the explanation of the top class of a binary classifier
+        """
+        model = LogisticRegression().fit(self.data, (self.data[:, 0] > 0.5).astype(int))
+        explainer = LinearTabularExplainer()
+        explainer.build_explainer(training_data=self.data, predict_fn=model.predict_proba)
+        explanation = explainer.explain_instance(self.data[0], num_features=1, top_labels=1)
+        label = int(np.argmax(model.predict_proba(self.data[:1])[0]))
+        self.assertEqual(list(explanation.keys()), [label])
+        self.assertTrue(explanation[label][OUTPUT.EXPLANATION][0][OUTPUT.FEATURE].startswith('0 = '))
+        self.assertGreater(explanation[label][OUTPUT.EXPLANATION][0][OUTPUT.SCORE], 0)
+
+    def test_feature_table_per_batch(self):
+        """
+        Test that the feature names with values are not accumulated across batches of explanations
+        """
+        explainer = LinearTabularExplainer()
+        explainer.build_explainer(training_data=self.data, predict_fn=self.model.predict)
+        explanations = explainer.explain_instances(list(self.data[:10]), batch_size=4, num_features=None)
+        self.assertIsNot(explanations[0].feature_table, explanations[4].feature_table)
+        self.assertIs(explanations[0].feature_table, explanations[3].feature_table)
+        self.assertEqual(len(explanations[0].feature_table), 4 * 3)
+        self.assertIsNot(explainer.explain_instance(self.data[0]).feature_table, explanations[0].feature_table)
+
+    def test_load_explainer(self):
+        """
+        Test saving and loading the explainer
+        """
+        explainer = LinearTabularExplainer()
+        explainer.build_explainer(training_data=self.data, predict_fn=self.model.predict)
+        explainer.save_explainer(self.save_path)
+        self.assertTrue(os.path.exists(self.save_path))
+
+        new_explainer = LinearTabularExplainer()
+        new_explainer.load_explainer(self.save_path)
+        self.assertIsNotNone(new_explainer.explainer_object)
+
+    def tearDown(self) -> None:
+        if os.path.exists(self.save_path):
+            os.remove(self.save_path)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,130 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+# Copyright 2019 SAP SE or an SAP affiliate company. All rights reserved
+# ============================================================================
+
+import os
+import unittest
+
+import numpy as np
+
+import xai
+from xai.explainer.constants import OUTPUT
+from xai.explainer.explainer_exceptions import UnsupportedModeError, ExplainerUninitializedError
+from xai.explainer.tabular.native_lime_tabular_explainer import NativeLimeTabularExplainer
+
+
+def predict_fn(x):
+    score = 1 / (1 + np.exp(-(4 * x[:, 0] - 4 * x[:, 1])))
+    return np.vstack([1 - score, score]).T
+
+
+class TestNativeLimeTabularExplainer(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.save_path = 'native_lime_tabular_explainer.pkl'
+        self.data = np.random.RandomState(0).rand(200, 4)
+
+    def test_build_explainer_unsupported_mode(self):
+        """
+        Test exception check when unsupported mode is provided
+        """
+        with self.assertRaises(UnsupportedModeError, msg='Algorithm should raise unsupported mode'
+                                                         'error'):
+            explainer = NativeLimeTabularExplainer()
+            explainer.build_explainer(self.data, mode='unsupported_mode', predict_fn=None)
+
+    def test_build_explainer_uninitialized_explainer(self):
+        """
+        Test exception check when explain_instance is called for un-built explainer
+        """
+        with self.assertRaises(ExplainerUninitializedError, msg='Algorithm should raise '
+                                                                'uninitialized error if exlpainers'
+                                                                'build method is not called'):
+            explainer = NativeLimeTabularExplainer()
+            explainer.explain_instance(self.data[0])
+
+    def test_explain_instance(self):
+        """
+        Test the output schema and that the most important features are found
+        """
+        explainer = NativeLimeTabularExplainer()
+        explainer.build_explainer(self.data, mode=xai.MODE.CLASSIFICATION, predict_fn=predict_fn,
+                                  feature_names=['a', 'b', 'c', 'd'], random_state=0)
+        explanation = explainer.explain_instance(self.data[0], num_samples=1000, num_features=2, top_labels=1)
+
+        label = int(np.argmax(predict_fn(self.data[:1])[0]))
+        self.assertEqual(list(explanation.keys()), [label])
+        self.assertAlmostEqual(explanation[label][OUTPUT.PREDICTION], predict_fn(self.data[:1])[0, label])
+        features = [exp[OUTPUT.FEATURE] for exp in explanation[label][OUTPUT.EXPLANATION]]
+        self.assertEqual(len(features), 2)
+        self.assertTrue(any(' a ' in feature or feature.startswith('a ') for feature in features))
+        self.assertTrue(any(' b ' in feature or feature.startswith('b ') for feature in features))
+
+    def test_explain_instances(self):
+        """
+        Test that a batch shares the perturbation design regardless of the batch size
+        """
+        explanations = []
+        for batch_size in [500, 100000]:
+            explainer = NativeLimeTabularExplainer()
+            explainer.build_explainer(self.data, mode=xai.MODE.CLASSIFICATION, predict_fn=predict_fn,
+                                      random_state=0)
+            explanations.append(explainer.explain_instances(list(self.data[:5]), num_samples=500,
+                                                            batch_size=batch_size))
+        self.assertEqual(len(explanations[0]), 5)
+        for explanation, expected in zip(*explanations):
+            self.assertEqual(explanation.keys(), expected.keys())
+            for label in expected:
+                np.testing.assert_allclose(
+                    [exp[OUTPUT.SCORE] for exp in explanation[label][OUTPUT.EXPLANATION]],
+                    [exp[OUTPUT.SCORE] for exp in expected[label][OUTPUT.EXPLANATION]])
+
+    def test_explain_instance_adaptive(self):
+        """
+        Test that the adaptive mode stops before the maximum number of samples and reports it
+        """
+        explainer = NativeLimeTabularExplainer()
+        explainer.build_explainer(self.data, mode=xai.MODE.CLASSIFICATION, predict_fn=predict_fn,
+                                  feature_names=['a', 'b', 'c', 'd'], random_state=0)
+        explanation = explainer.explain_instance(self.data[0], num_samples=20000, num_features=2, top_labels=1,
+                                                 adaptive=True, round_size=500)
+        label = list(explanation.keys())[0]
+        self.assertLess(explanation[label][OUTPUT.NUM_SAMPLES], 20000)
+        self.assertEqual(explanation[label][OUTPUT.NUM_SAMPLES] % 500, 0)
+        features = [exp[OUTPUT.FEATURE] for exp in explanation[label][OUTPUT.EXPLANATION]]
+        self.assertTrue(any(' a ' in feature or feature.startswith('a ') for feature in features))
+        self.assertTrue(any(' b ' in feature or feature.startswith('b ') for feature in features))
+
+    def test_explain_instance_regression(self):
+        """
+        Test the output schema for a regression model
+        """
+        explainer = NativeLimeTabularExplainer()
+        explainer.build_explainer(self.data, mode=xai.MODE.REGRESSION, predict_fn=lambda x: 3 * x[:, 2],
+                                  random_state=0)
+        explanation = explainer.explain_instance(self.data[0], num_samples=500, num_features=1)
+        self.assertAlmostEqual(explanation[OUTPUT.PREDICTION], 3 * self.data[0, 2])
+        self.assertEqual(len(explanation[OUTPUT.EXPLANATION]), 1)
+        self.assertIn(' 2 ', ' %s ' % explanation[OUTPUT.EXPLANATION][0][OUTPUT.FEATURE])
+
+    def test_load_explainer(self):
+        """
+        Test saving and loading the explainer
+        """
+        explainer = NativeLimeTabularExplainer()
+        explainer.build_explainer(self.data, mode=xai.MODE.CLASSIFICATION, predict_fn=predict_fn)
+        explainer.save_explainer(self.save_path)
+        self.assertTrue(os.path.exists(self.save_path))
+
+        new_explainer = NativeLimeTabularExplainer()
+        new_explainer.load_explainer(self.save_path)
+        self.assertIsNotNone(new_explainer.explainer_object)
+
+    def tearDown(self) -> None:
+        if os.path.exists(self.save_path):
+            os.remove(self.save_path)
+
+
+if __name__ == '__main__':
+    unittest.main()
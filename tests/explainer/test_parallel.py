@@ -0,0 +1,81 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+# Copyright 2019 SAP SE or an SAP affiliate company. All rights reserved
+# ============================================================================
+
+import unittest
+
+import numpy as np
+from sklearn.datasets import load_breast_cancer
+from sklearn.linear_model import LogisticRegression
+
+from xai.explainer.abstract_explainer import AbstractExplainer
+from xai.explainer.explainer_factory import ExplainerFactory
+from xai.explainer.parallel import explain_in_parallel, sample_seeds
+
+
+class GlobalRandomExplainer(AbstractExplainer):
+    """
+    Explainer which draws from the global numpy random generator, with the default `set_random_state`
+    """
+
+    def build_explainer(self, **kwargs):
+        self.explainer_object = True
+
+    def explain_instance(self, instance, **kwargs):
+        return {0: {'prediction': float(np.random.rand()), 'explanation': []}}
+
+    def save_explainer(self, path, compact=False):
+        pass
+
+    def load_explainer(self, path):
+        self.explainer_object = True
+
+
+class TestParallel(unittest.TestCase):
+
+    def setUp(self) -> None:
+        data = load_breast_cancer()
+        self.X = data.data
+        clf = LogisticRegression(max_iter=5000).fit(data.data, data.target)
+        self.explainer = ExplainerFactory.get_explainer(domain='tabular', algorithm='native_lime')
+        self.explainer.build_explainer(training_data=data.data, predict_fn=clf.predict_proba,
+                                       feature_names=list(data.feature_names))
+
+    def test_sample_seeds(self):
+        """
+        Test that the seed of an instance depends on its content and the base seed only
+        """
+        seeds = sample_seeds(self.X[:10], random_state=1)
+        self.assertEqual(sample_seeds(list(self.X[5:10]), random_state=1), seeds[5:])
+        self.assertEqual(len(set(seeds)), 10)
+        self.assertNotEqual(sample_seeds(self.X[:10], random_state=2), seeds)
+
+    def test_global_random_state(self):
+        """
+        Test that seeding the global numpy random generator for the explanations does not change it for the caller
+        """
+        explainer = GlobalRandomExplainer()
+        explainer.build_explainer()
+        np.random.seed(7)
+        expected = np.random.rand(3)
+        np.random.seed(7)
+        explanations = list(explain_in_parallel(explainer, self.X[:4], n_jobs=1, random_state=3))
+        self.assertEqual(np.random.rand(3).tolist(), expected.tolist())
+        self.assertEqual(explanations, list(explain_in_parallel(explainer, self.X[:4], n_jobs=1, random_state=3)))
+
+    def test_explain_in_parallel(self):
+        """
+        Test that the explanations do not depend on the number of workers
+        """
+        kwargs = dict(num_samples=300, num_features=5, top_labels=1)
+        serial = list(explain_in_parallel(self.explainer, self.X[:12], n_jobs=1, random_state=3, **kwargs))
+        parallel = list(explain_in_parallel(self.explainer, self.X[:12], n_jobs=2, random_state=3,
+                                            chunk_size=5, **kwargs))
+        self.assertEqual(serial, parallel)
+        self.assertEqual(serial[3], list(explain_in_parallel(self.explainer, self.X[3:4], random_state=3,
+                                                             **kwargs))[0])
+
+
+if __name__ == '__main__':
+    unittest.main()
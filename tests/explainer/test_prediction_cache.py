@@ -0,0 +1,80 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+# Copyright 2019 SAP SE or an SAP affiliate company. All rights reserved
+# ============================================================================
+
+import unittest
+
+import dill
+import numpy as np
+
+from xai.explainer.helper import get_model
+from xai.explainer.prediction_cache import PredictionCache
+
+
+class DummyModel(object):
+
+    def __init__(self):
+        self.calls = []
+
+    def predict_proba(self, x):
+        self.calls.append(len(x))
+        score = np.asarray([len(row) % 2 if isinstance(row, str) else row[0] for row in x], dtype=np.float64)
+        return np.vstack([1 - score, score]).T
+
+
+class TestPredictionCache(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.model = DummyModel()
+        self.data = np.random.RandomState(0).rand(10, 3)
+
+    def test_predict(self):
+        """
+        Test that only the distinct missing rows are forwarded to the predict function
+        """
+        predict_fn = PredictionCache(self.model.predict_proba)
+        np.testing.assert_array_equal(predict_fn(self.data[[0, 1, 0]]), self.model.predict_proba(self.data[[0, 1, 0]]))
+        np.testing.assert_array_equal(predict_fn(self.data[:4]), self.model.predict_proba(self.data[:4]))
+        self.assertEqual(self.model.calls, [2, 3, 2, 4])
+        self.assertEqual(predict_fn.stats()['hits'], 3)
+        self.assertEqual(predict_fn.stats()['misses'], 4)
+        self.assertAlmostEqual(predict_fn.hit_rate, 3 / 7)
+
+    def test_predict_text(self):
+        """
+        Test caching the predictions of strings
+        """
+        predict_fn = PredictionCache(self.model.predict_proba)
+        predict_fn(['a', 'bb', 'a'])
+        output = predict_fn(['bb', 'ccc'])
+        np.testing.assert_array_equal(output, [[1, 0], [0, 1]])
+        self.assertEqual(predict_fn.stats()['misses'], 3)
+
+    def test_eviction(self):
+        """
+        Test that the least recently used rows are evicted
+        """
+        predict_fn = PredictionCache(self.model.predict_proba, max_entries=2)
+        predict_fn(self.data[:2])
+        predict_fn(self.data[:1])
+        predict_fn(self.data[2:3])
+        self.assertEqual(predict_fn.stats()['entries'], 2)
+        predict_fn(self.data[:1])
+        self.assertEqual(predict_fn.stats()['hits'], 2)
+        predict_fn(self.data[1:2])
+        self.assertEqual(predict_fn.stats()['misses'], 4)
+
+    def test_pickle(self):
+        """
+        Test that the cached rows are not pickled and the model can still be found
+        """
+        predict_fn = PredictionCache(self.model.predict_proba)
+        predict_fn(self.data)
+        loaded = dill.loads(dill.dumps(predict_fn))
+        self.assertEqual(loaded.stats()['entries'], 0)
+        self.assertIs(get_model(predict_fn), self.model)
+
+
+if __name__ == '__main__':
+    unittest.main()
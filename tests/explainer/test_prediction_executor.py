@@ -0,0 +1,117 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+# Copyright 2019 SAP SE or an SAP affiliate company. All rights reserved
+# ============================================================================
+
+import asyncio
+import json
+import threading
+import time
+import unittest
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from socketserver import ThreadingMixIn
+from urllib.request import urlopen
+
+import numpy as np
+
+from xai.explainer.prediction_executor import PredictionExecutor, as_executor
+from xai.explainer.tabular.lime_tabular_explainer import LimeTabularExplainer
+
+
+class _ModelHandler(BaseHTTPRequestHandler):
+    """
+    Stand-in model server, predicts the rows of a JSON request with a logistic model
+    """
+
+    def do_POST(self):
+        server = self.server
+        with server.lock:
+            server.active += 1
+            server.max_active = max(server.max_active, server.active)
+        rows = np.array(json.loads(self.rfile.read(int(self.headers['Content-Length']))))
+        server.sizes.append(len(rows))
+        time.sleep(0.05)
+        score = 1 / (1 + np.exp(-(rows[:, 0] - rows[:, 1])))
+        body = json.dumps(np.vstack([1 - score, score]).T.tolist()).encode()
+        with server.lock:
+            server.active -= 1
+        self.send_response(200)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class _ModelServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+
+class TestPredictionExecutor(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.server = _ModelServer(('127.0.0.1', 0), _ModelHandler)
+        self.server.lock = threading.Lock()
+        self.server.active, self.server.max_active, self.server.sizes = 0, 0, []
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.url = 'http://127.0.0.1:%d/' % self.server.server_address[1]
+        self.data = np.random.RandomState(0).rand(50, 2)
+
+    def tearDown(self) -> None:
+        self.server.shutdown()
+        self.server.server_close()
+
+    def predict_fn(self, x):
+        with urlopen(self.url, data=json.dumps(np.asarray(x).tolist()).encode()) as response:
+            return np.array(json.loads(response.read()))
+
+    async def async_predict_fn(self, x):
+        return await asyncio.get_event_loop().run_in_executor(None, self.predict_fn, x)
+
+    def test_thread_pool(self):
+        """
+        Test that the chunks are predicted concurrently and reassembled in order
+        """
+        executor = PredictionExecutor(self.predict_fn, chunk_size=8, max_workers=4)
+        np.testing.assert_allclose(executor(self.data), self.predict_fn(self.data))
+        self.assertEqual(sorted(self.server.sizes[:-1]), [2, 8, 8, 8, 8, 8, 8])
+        self.assertGreater(self.server.max_active, 1)
+
+    def test_async(self):
+        """
+        Test that an async predict function is awaited with bounded concurrency
+        """
+        executor = as_executor(self.async_predict_fn)
+        self.assertIsInstance(executor, PredictionExecutor)
+        executor.chunk_size, executor.max_concurrency = 10, 2
+        np.testing.assert_allclose(executor(self.data), self.predict_fn(self.data))
+        self.assertEqual(self.server.max_active, 2)
+
+        # from a running event loop, the explanation has to be awaited in a thread
+        async def run():
+            return executor(self.data[:5])
+        loop = asyncio.new_event_loop()
+        try:
+            with self.assertRaises(RuntimeError):
+                loop.run_until_complete(run())
+            np.testing.assert_allclose(loop.run_until_complete(loop.run_in_executor(None, executor, self.data[:5])),
+                                       self.predict_fn(self.data[:5]))
+        finally:
+            loop.close()
+
+    def test_explainer(self):
+        """
+        Test that an explainer predicts in chunks with the executor
+        """
+        explainer = LimeTabularExplainer()
+        explainer.build_explainer(self.data, predict_fn=PredictionExecutor(self.async_predict_fn, chunk_size=100,
+                                                                           max_concurrency=4),
+                                  random_state=0)
+        explanation = explainer.explain_instance(self.data[0], num_samples=500)
+        self.assertEqual(max(self.server.sizes), 100)
+        self.assertEqual(len(explanation), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
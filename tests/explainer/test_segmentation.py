@@ -0,0 +1,38 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+# Copyright 2019 SAP SE or an SAP affiliate company. All rights reserved
+# ============================================================================
+
+import unittest
+
+from xai.explainer.text.segmentation import split_segments, word_splitter, SEGMENT_SEPARATOR
+
+
+class TestSegmentation(unittest.TestCase):
+
+    def test_split_segments(self):
+        """
+        Test splitting a text into sentences with the bundled Punkt tokenizer, and merging them into segments
+        """
+        text = 'Mr. Smith went home. It was late! Was it? Yes.'
+        spans = split_segments(text, max_segments=10)
+        self.assertEqual([text[start:end] for start, end in spans],
+                         ['Mr. Smith went home.', 'It was late!', 'Was it?', 'Yes.'])
+
+        spans = split_segments(text, max_segments=2)
+        self.assertEqual([text[start:end] for start, end in spans],
+                         ['Mr. Smith went home. It was late!', 'Was it? Yes.'])
+
+        with self.assertRaises(ValueError):
+            split_segments(text, max_segments=2, language='klingon')
+
+    def test_word_splitter(self):
+        """
+        Test that the words of the segments are split, and the separator is never a word
+        """
+        split = word_splitter(r'\W+')
+        self.assertEqual(split('Good movie.' + SEGMENT_SEPARATOR + 'Bad end'), ['Good', 'movie', 'Bad', 'end'])
+
+
+if __name__ == '__main__':
+    unittest.main()
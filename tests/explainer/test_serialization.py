@@ -0,0 +1,88 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+# Copyright 2019 SAP SE or an SAP affiliate company. All rights reserved
+# ============================================================================
+
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+from sklearn.datasets import load_breast_cancer
+from sklearn.ensemble import RandomForestClassifier
+
+from xai.explainer.explainer_factory import ExplainerFactory
+from xai.explainer.serialization import (
+    save_compact,
+    load_compact,
+    load_metadata,
+    is_compact,
+    build_explainer_cached
+)
+
+
+class TestSerialization(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.save_dir = tempfile.mkdtemp()
+        data = load_breast_cancer()
+        self.X = data.data
+        self.feature_names = list(data.feature_names)
+        self.clf = RandomForestClassifier(n_estimators=10, random_state=0).fit(data.data, data.target)
+
+    def tearDown(self) -> None:
+        shutil.rmtree(self.save_dir)
+
+    def test_save_load_compact(self):
+        """
+        Test that the arrays are stored outside of the pickle and loaded memory-mapped
+        """
+        path = os.path.join(self.save_dir, 'state')
+        state = {'data': np.asfortranarray(self.X), 'small': np.arange(3), 'names': self.feature_names}
+        save_compact(path, state, metadata={'explainer': 'test'})
+        self.assertTrue(is_compact(path))
+        self.assertEqual(load_metadata(path), {'explainer': 'test'})
+        self.assertLess(os.path.getsize(os.path.join(path, 'state.pkl')), 4096)
+
+        loaded = load_compact(path)
+        np.testing.assert_array_equal(loaded['data'], self.X)
+        self.assertTrue(loaded['data'].flags.f_contiguous)
+        self.assertFalse(loaded['data'].flags.writeable)
+        np.testing.assert_array_equal(loaded['small'], np.arange(3))
+        self.assertEqual(loaded['names'], self.feature_names)
+        self.assertTrue(load_compact(path, mmap=False)['data'].flags.writeable)
+
+    def test_save_load_explainer(self):
+        """
+        Test that an explainer loaded from the compact format gives the same explanations
+        """
+        path = os.path.join(self.save_dir, 'explainer')
+        explainer = ExplainerFactory.get_explainer(domain='tabular', algorithm='tree_shap')
+        explainer.build_explainer(predict_fn=self.clf.predict_proba, feature_names=self.feature_names)
+        explainer.save_explainer(path, compact=True)
+
+        loaded = ExplainerFactory.get_explainer(domain='tabular', algorithm='tree_shap')
+        loaded.load_explainer(path)
+        self.assertEqual(loaded.explain_instance(self.X[0]), explainer.explain_instance(self.X[0]))
+
+    def test_build_explainer_cached(self):
+        """
+        Test that the build cache reuses the explainer only for the same training data and parameters
+        """
+        kwargs = dict(training_data=self.X, predict_fn=self.clf.predict_proba, feature_names=self.feature_names)
+        explainer = ExplainerFactory.get_explainer(domain='tabular', algorithm='native_lime')
+        self.assertFalse(build_explainer_cached(explainer, self.save_dir, **kwargs))
+
+        loaded = ExplainerFactory.get_explainer(domain='tabular', algorithm='native_lime')
+        self.assertTrue(build_explainer_cached(loaded, self.save_dir, **kwargs))
+        self.assertEqual(loaded.explain_instance(self.X[0], num_samples=500),
+                         explainer.explain_instance(self.X[0], num_samples=500))
+
+        kwargs['training_data'] = self.X[:100]
+        other = ExplainerFactory.get_explainer(domain='tabular', algorithm='native_lime')
+        self.assertFalse(build_explainer_cached(other, self.save_dir, **kwargs))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,97 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+# Copyright 2019 SAP SE or an SAP affiliate company. All rights reserved
+# ============================================================================
+
+import json
+import os
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from urllib.error import HTTPError
+from urllib.request import urlopen
+
+import numpy as np
+from sklearn.linear_model import LogisticRegression
+
+import xai
+from xai.explainer.explainer_exceptions import ExplainerNotFound
+from xai.explainer.server import ExplanationServer, load_explainer
+from xai.explainer.tabular.lime_tabular_explainer import LimeTabularExplainer
+
+
+class TestExplanationServer(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.save_path = 'server_lime_tabular_explainer.pkl'
+        self.data = np.random.RandomState(0).rand(50, 3)
+        self.model = LogisticRegression().fit(self.data, self.data[:, 0] > 0.5)
+        self.calls = []
+
+        explainer = LimeTabularExplainer()
+        explainer.build_explainer(self.data, predict_fn=self.model.predict_proba, mode=xai.MODE.CLASSIFICATION,
+                                  feature_names=['a', 'b', 'c'], random_state=0)
+        explainer.save_explainer(self.save_path)
+        explainer = load_explainer('tabular', 'lime', self.save_path)
+        predict_fn = explainer.predict_fn
+
+        def counting_predict_fn(x):
+            self.calls.append(len(x))
+            return predict_fn(x)
+
+        explainer.predict_fn = counting_predict_fn
+        self.server = ExplanationServer({'lime': explainer}, max_batch_size=8, max_wait=0.2)
+
+    def tearDown(self) -> None:
+        self.server.shutdown()
+        if os.path.exists(self.save_path):
+            os.remove(self.save_path)
+
+    def _post(self, url, body):
+        with urlopen(url, data=json.dumps(body).encode()) as response:
+            return json.loads(response.read())
+
+    def test_micro_batches(self):
+        """
+        Test that concurrent requests over HTTP are explained in micro-batches
+        """
+        host, port = self.server.start()
+        url = 'http://%s:%d' % (host, port)
+        params = {'num_samples': 100, 'num_features': 2}
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            explanations = list(pool.map(lambda row: self._post(url + '/explain/lime',
+                                                                {'instance': row.tolist(), 'params': params}),
+                                         self.data[:8]))
+
+        self.assertEqual(len(explanations), 8)
+        self.assertTrue(all(len(explanation['1']['explanation']) == 2 for explanation in explanations))
+        # the perturbations of the batched instances are predicted together
+        self.assertLess(len(self.calls), 8)
+
+        with urlopen(url + '/stats') as response:
+            stats = json.loads(response.read())
+        self.assertEqual(stats['requests'], 8)
+        self.assertEqual(stats['errors'], 0)
+        self.assertGreater(stats['average_batch_size'], 1)
+        self.assertGreater(stats['latency_p95'], 0)
+        self.assertGreater(stats['throughput'], 0)
+
+        with self.assertRaises(HTTPError) as context:
+            self._post(url + '/explain/unknown', {'instance': [0, 0, 0]})
+        self.assertEqual(context.exception.code, 404)
+
+    def test_explain(self):
+        """
+        Test explaining in process, and that an error fails the requests of its batch only
+        """
+        explanation = self.server.explain('lime', self.data[0], num_samples=100)
+        self.assertIn(1, explanation)
+        with self.assertRaises(ExplainerNotFound):
+            self.server.explain('unknown', self.data[0])
+        with self.assertRaises(Exception):
+            self.server.explain('lime', np.zeros(5), num_samples=100)
+        self.assertEqual(self.server.stats()['errors'], 1)
+        self.assertIn(1, self.server.explain('lime', self.data[1], num_samples=100))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -52,6 +52,55 @@ class TestSHAPTabularExplainer(unittest.TestCase):
         explainer.save_explainer(self.save_path)
         self.assertTrue(os.path.exists(self.save_path))
 
+    def test_build_explainer_background_summary(self):
+        """
+        Test summarizing the training data into the background dataset
+        """
+        explainer = SHAPTabularExplainer()
+        data = np.random.RandomState(0).rand(50, 3)
+        explainer.build_explainer(predict_fn=self.dummy_predict_fn, training_data=data,
+                                  background_size=5, background_method='sample', random_state=0)
+        self.assertEqual(explainer.explainer_object.data.data.shape, (5, 3))
+        self.assertAlmostEqual(explainer.background_error, 0)
+
+    def test_explain_instances(self):
+        """
+        Test that the batched estimates do not depend on the batching, and the model of the explainer is kept
+        """
+        data = np.random.RandomState(0).rand(20, 8)
+
+        def predict_fn(x):
+            output = np.tanh(x.dot(np.arange(8.0)) - x[:, 0] * x[:, 1])
+            return np.vstack([output, -output]).T
+
+        explainer = SHAPTabularExplainer()
+        explainer.build_explainer(predict_fn=predict_fn, training_data=data[:5])
+        np.random.seed(0)
+        explanations = explainer.explain_instances(list(data[:3]), num_samples=50, batch_size=40)
+        np.random.seed(0)
+        self.assertEqual(explainer.explain_instances(list(data[:2]), num_samples=50)[1], explanations[1])
+        self.assertIs(explainer.explainer_object.model.f, explainer.predict_fn)
+
+    def test_feature_groups(self):
+        """
+        Test that the attributions of a group of columns sum up the attributions of its columns
+        """
+        data = np.random.RandomState(0).rand(20, 4)
+
+        def predict_fn(x):
+            output = x.dot([1.0, 2.0, 3.0, 4.0])
+            return np.vstack([output, -output]).T
+
+        explainer = SHAPTabularExplainer()
+        explainer.build_explainer(predict_fn=predict_fn, training_data=data, feature_names=['a', 'b', 'c', 'd'],
+                                  feature_groups={'group': [1, 2]})
+        self.assertEqual(explainer.feature_groups.names, ['a', 'group', 'd'])
+        explanation = explainer.explain_instance(data[0], num_samples=100)
+        scores = {item['feature']: item['score'] for item in explanation[0]['explanation']}
+        expected = (data[0] - data.mean(axis=0)) * [1.0, 2.0, 3.0, 4.0]
+        self.assertEqual(set(scores), {'a = {}'.format(data[0, 0]), 'group', 'd = {}'.format(data[0, 3])})
+        self.assertAlmostEqual(scores['group'], expected[1] + expected[2])
+
     def tearDown(self) -> None:
         if os.path.exists(self.save_path):
             os.remove(self.save_path)
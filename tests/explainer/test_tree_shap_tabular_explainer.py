@@ -0,0 +1,93 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+# Copyright 2019 SAP SE or an SAP affiliate company. All rights reserved
+# ============================================================================
+
+import os
+import unittest
+
+import numpy as np
+from shap import TreeExplainer
+from sklearn.ensemble import RandomForestClassifier, GradientBoostingRegressor
+
+import xai
+from xai.explainer.constants import OUTPUT
+from xai.explainer.explainer_exceptions import ExplainerUninitializedError
+from xai.explainer.helper import get_model_specific_algorithm
+from xai.explainer.tabular.tree_shap_tabular_explainer import TreeSHAPTabularExplainer
+
+
+class TestTreeSHAPTabularExplainer(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.save_path = 'tree_shap_tabular_explainer.pkl'
+        self.data = np.random.RandomState(0).rand(100, 4)
+        self.labels = (self.data[:, 0] > self.data[:, 1]).astype(int)
+        self.model = RandomForestClassifier(n_estimators=10, random_state=0).fit(self.data, self.labels)
+
+    def test_build_explainer_uninitialized_explainer(self):
+        """
+        Test exception check when explain_instance is called for un-built explainer
+        """
+        with self.assertRaises(ExplainerUninitializedError, msg='Algorithm should raise '
+                                                                'uninitialized error if exlpainers'
+                                                                'build method is not called'):
+            explainer = TreeSHAPTabularExplainer()
+            explainer.explain_instance(np.array([0]))
+
+    def test_build_explainer(self):
+        """
+        Test building the explainer from the predict function of a tree model
+        """
+        explainer = TreeSHAPTabularExplainer()
+        explainer.build_explainer(training_data=self.data, predict_fn=self.model.predict_proba)
+        self.assertIsInstance(explainer.explainer_object, TreeExplainer)
+        self.assertEqual(explainer.mode, xai.MODE.CLASSIFICATION)
+        self.assertEqual(get_model_specific_algorithm(xai.DOMAIN.TABULAR, self.model.predict_proba),
+                         xai.ALG.TREE_SHAP)
+
+    def test_explain_instance(self):
+        """
+        Test that the SHAP values add up to the predicted confidence
+        """
+        explainer = TreeSHAPTabularExplainer()
+        explainer.build_explainer(predict_fn=self.model.predict_proba, feature_names=['a', 'b', 'c', 'd'])
+        explanation = explainer.explain_instance(self.data[0], num_features=None)
+        expected_value = explainer.explainer_object.expected_value
+        for label, confidence in enumerate(self.model.predict_proba(self.data[:1])[0]):
+            self.assertAlmostEqual(explanation[label][OUTPUT.PREDICTION], confidence)
+            self.assertAlmostEqual(sum(exp[OUTPUT.SCORE] for exp in explanation[label][OUTPUT.EXPLANATION]),
+                                   confidence - expected_value[label])
+
+    def test_explain_instances(self):
+        """
+        Test that batched explanations are the same as explaining one instance at a time
+        """
+        model = GradientBoostingRegressor(n_estimators=10).fit(self.data, self.data[:, 2])
+        explainer = TreeSHAPTabularExplainer()
+        explainer.build_explainer(predict_fn=model.predict)
+        self.assertEqual(explainer.mode, xai.MODE.REGRESSION)
+        explanations = explainer.explain_instances(list(self.data[:5]), batch_size=2, num_features=2)
+        self.assertEqual(explanations, [explainer.explain_instance(self.data[i], num_features=2) for i in range(5)])
+        self.assertTrue(explanations[0][OUTPUT.EXPLANATION][0][OUTPUT.FEATURE].startswith('2 = '))
+
+    def test_load_explainer(self):
+        """
+        Test saving and loading the explainer
+        """
+        explainer = TreeSHAPTabularExplainer()
+        explainer.build_explainer(predict_fn=self.model.predict_proba)
+        explainer.save_explainer(self.save_path)
+        self.assertTrue(os.path.exists(self.save_path))
+
+        new_explainer = TreeSHAPTabularExplainer()
+        new_explainer.load_explainer(self.save_path)
+        self.assertIsNotNone(new_explainer.explainer_object)
+
+    def tearDown(self) -> None:
+        if os.path.exists(self.save_path):
+            os.remove(self.save_path)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,188 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+# Copyright 2019 SAP SE or an SAP affiliate company. All rights reserved
+# ============================================================================
+
+import math
+import operator
+import unittest
+from collections import Counter, defaultdict
+
+import numpy as np
+from scipy.stats import norm
+
+from xai.explainer.constants import OUTPUT
+from xai.explainer.explanation import FeatureTable
+from xai.explainer.explanation_store import to_compact
+from xai.model.interpreter.exceptions import InvalidArgumentError
+from xai.model.interpreter.explanation_aggregator import ExplanationAggregator, STATS_TYPES
+
+
+def reference_statistics(explanations, confidence_threshold, stats_type, k):
+    """
+    The statistics of the explanations computed like the aggregator which keeps all explanations
+    """
+    explanation_lists, class_counter = defaultdict(list), defaultdict(int)
+    for explanation in explanations:
+        for label, label_exp in explanation.items():
+            if label_exp[OUTPUT.PREDICTION] > confidence_threshold:
+                explanation_lists[label].append({item[OUTPUT.FEATURE]: item[OUTPUT.SCORE]
+                                                 for item in label_exp[OUTPUT.EXPLANATION]})
+                class_counter[label] += 1
+
+    stats = dict()
+    for label, explanation_list in explanation_lists.items():
+        counter = Counter()
+        for explanation in explanation_list:
+            top_k_list = sorted(explanation.items(), key=operator.itemgetter(1), reverse=True)[:k]
+            if stats_type == 'top_k':
+                counter.update({name: 1 for name, _ in top_k_list})
+            elif stats_type == 'average_score':
+                counter.update(explanation)
+            else:
+                counter.update({name: k - idx for idx, (name, _) in enumerate(top_k_list)})
+        stats[label] = {name: value / class_counter[label] for name, value in counter.items()}
+    return stats
+
+
+class TestExplanationAggregator(unittest.TestCase):
+
+    def setUp(self) -> None:
+        random_state = np.random.RandomState(0)
+        features = ['f%d' % idx for idx in range(30)]
+        self.explanations = []
+        for _ in range(300):
+            explanation = dict()
+            for label in range(3):
+                names = random_state.choice(features, random_state.randint(3, 12), replace=False)
+                explanation[label] = {
+                    OUTPUT.PREDICTION: float(random_state.rand()),
+                    OUTPUT.EXPLANATION: [{OUTPUT.FEATURE: str(name), OUTPUT.SCORE: float(random_state.normal())}
+                                         for name in names]}
+            self.explanations.append(explanation)
+
+    def assertStatisticsEqual(self, stats, expected):
+        self.assertEqual(set(stats), set(expected))
+        for label in expected:
+            # features with the same value may be in another order
+            self.assertEqual(set(stats[label]), set(expected[label]))
+            for name, value in expected[label].items():
+                self.assertAlmostEqual(stats[label][name], value, places=9)
+            values = list(stats[label].values())
+            self.assertEqual(values, sorted(values, reverse=True))
+
+    def test_parity_with_reference(self):
+        """
+        Test that all statistics types match the aggregator which keeps all explanations
+        """
+        for confidence_threshold in [0, 0.5]:
+            aggregator = ExplanationAggregator(confidence_threshold=confidence_threshold)
+            for explanation in self.explanations:
+                aggregator.feed(explanation)
+            for stats_type in STATS_TYPES:
+                for k in [1, 3, 5, 8]:
+                    stats, count = aggregator.get_statistics(stats_type=stats_type, k=k)
+                    self.assertEqual(count, len(self.explanations))
+                    self.assertStatisticsEqual(stats, reference_statistics(self.explanations, confidence_threshold,
+                                                                           stats_type, k))
+
+    def test_compact_explanations(self):
+        """
+        Test that compact explanations give the same statistics as their dict format
+        """
+        aggregator = ExplanationAggregator(confidence_threshold=0.5)
+        compact_aggregator = ExplanationAggregator(confidence_threshold=0.5)
+        feature_table = FeatureTable()
+        for explanation in self.explanations:
+            aggregator.feed(explanation)
+            compact_aggregator.feed(to_compact(explanation, feature_table))
+        for stats_type in STATS_TYPES:
+            self.assertStatisticsEqual(compact_aggregator.get_statistics(stats_type=stats_type)[0],
+                                       aggregator.get_statistics(stats_type=stats_type)[0])
+
+    def test_weighted_feed(self):
+        """
+        Test that an explanation with a weight counts as many times as its weight
+        """
+        weights = [1, 3, 2] * (len(self.explanations) // 3)
+        weighted = ExplanationAggregator(confidence_threshold=0.5)
+        repeated = ExplanationAggregator(confidence_threshold=0.5)
+        for explanation, weight in zip(self.explanations, weights):
+            weighted.feed(explanation, weight=weight)
+            for _ in range(weight):
+                repeated.feed(explanation)
+        for stats_type in STATS_TYPES:
+            stats, count = weighted.get_statistics(stats_type=stats_type, k=3)
+            expected, expected_count = repeated.get_statistics(stats_type=stats_type, k=3)
+            self.assertEqual(count, expected_count)
+            self.assertStatisticsEqual(stats, expected)
+            intervals = weighted.get_confidence_intervals(stats_type=stats_type, k=3)
+            expected_intervals = repeated.get_confidence_intervals(stats_type=stats_type, k=3)
+            for label in expected_intervals:
+                for name, value in expected_intervals[label].items():
+                    self.assertTrue(math.isclose(intervals[label][name], value, rel_tol=1e-7, abs_tol=1e-9))
+
+    def test_get_confidence_intervals(self):
+        """
+        Test the half-widths of the confidence intervals against the standard error of the per-explanation values
+        """
+        aggregator = ExplanationAggregator(confidence_threshold=0)
+        for explanation in self.explanations:
+            aggregator.feed(explanation)
+        intervals = aggregator.get_confidence_intervals(stats_type='average_score', confidence=0.9)
+        scores = [{item[OUTPUT.FEATURE]: item[OUTPUT.SCORE] for item in explanation[0][OUTPUT.EXPLANATION]}
+                  for explanation in self.explanations]
+        values = np.array([explanation.get('f0', 0.0) for explanation in scores])
+        expected = norm.ppf(0.95) * values.std(ddof=1) / np.sqrt(len(values))
+        self.assertAlmostEqual(intervals[0]['f0'], expected, places=9)
+
+        # the intervals shrink with the finite population correction, down to zero for the whole population
+        corrected = aggregator.get_confidence_intervals(stats_type='top_k', k=3, population_size=600)
+        uncorrected = aggregator.get_confidence_intervals(stats_type='top_k', k=3)
+        self.assertAlmostEqual(corrected[0]['f0'], uncorrected[0]['f0'] * np.sqrt(300 / 599), places=9)
+        exhaustive = aggregator.get_confidence_intervals(stats_type='top_k', k=3, population_size=300)
+        self.assertEqual(set(exhaustive[0].values()), {0.0})
+
+    def test_long_explanations(self):
+        """
+        Test that by default all ranks of explanations with many features are counted
+        """
+        random_state = np.random.RandomState(1)
+        explanations = [{0: {OUTPUT.PREDICTION: 1.0,
+                             OUTPUT.EXPLANATION: [{OUTPUT.FEATURE: 'f%d' % idx, OUTPUT.SCORE: float(score)}
+                                                  for idx, score in enumerate(random_state.normal(size=30))]}}
+                        for _ in range(50)]
+        aggregator = ExplanationAggregator(confidence_threshold=0)
+        for explanation in explanations:
+            aggregator.feed(explanation)
+        for stats_type in ['top_k', 'average_ranking']:
+            self.assertStatisticsEqual(aggregator.get_statistics(stats_type=stats_type, k=25)[0],
+                                       reference_statistics(explanations, 0, stats_type, 25))
+
+    def test_max_k(self):
+        """
+        Test that k is limited to max_k only when an explanation had more than max_k features
+        """
+        aggregator = ExplanationAggregator(confidence_threshold=0, max_k=12)
+        for explanation in self.explanations:
+            aggregator.feed(explanation)
+        stats, _ = aggregator.get_statistics(stats_type='top_k', k=20)
+        self.assertStatisticsEqual(stats, reference_statistics(self.explanations, 0, 'top_k', 20))
+
+        aggregator = ExplanationAggregator(confidence_threshold=0, max_k=4)
+        for explanation in self.explanations:
+            aggregator.feed(explanation)
+        for stats_type in ['top_k', 'average_ranking']:
+            self.assertStatisticsEqual(aggregator.get_statistics(stats_type=stats_type, k=4)[0],
+                                       reference_statistics(self.explanations, 0, stats_type, 4))
+            with self.assertRaises(InvalidArgumentError):
+                aggregator.get_statistics(stats_type=stats_type, k=5)
+            with self.assertRaises(InvalidArgumentError):
+                aggregator.get_confidence_intervals(stats_type=stats_type, k=5)
+        # the scores of all features are kept
+        self.assertStatisticsEqual(aggregator.get_statistics(stats_type='average_score', k=5)[0],
+                                   reference_statistics(self.explanations, 0, 'average_score', 5))
+
+
+if __name__ == '__main__':
+    unittest.main()
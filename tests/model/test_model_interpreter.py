@@ -0,0 +1,36 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+# Copyright 2019 SAP SE or an SAP affiliate company. All rights reserved
+# ============================================================================
+
+import unittest
+
+import numpy as np
+
+from xai.explainer.constants import DOMAIN
+from xai.model.interpreter.exceptions import InterpreterUninitializedError
+from xai.model.interpreter.model_interpreter import ModelInterpreter
+
+
+class TestModelInterpreter(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.samples = list(np.random.RandomState(0).rand(5, 3))
+
+    def test_uninitialized_interpreter(self):
+        """
+        Test that the interpretations raise an uninitialized error before build_interpreter is called
+        """
+        interpreter = ModelInterpreter(domain=DOMAIN.TABULAR)
+        with self.assertRaises(InterpreterUninitializedError):
+            interpreter.interpret_model(samples=self.samples)
+        with self.assertRaises(InterpreterUninitializedError):
+            interpreter.interpret_model_global(samples=np.array(self.samples))
+        with self.assertRaises(InterpreterUninitializedError):
+            interpreter.error_analysis(class_num=2, valid_x=self.samples, valid_y=[0, 1, 0, 1, 0])
+        with self.assertRaises(InterpreterUninitializedError):
+            interpreter.get_confidence_intervals()
+
+
+if __name__ == '__main__':
+    unittest.main()
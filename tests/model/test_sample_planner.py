@@ -0,0 +1,121 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+# Copyright 2019 SAP SE or an SAP affiliate company. All rights reserved
+# ============================================================================
+
+import unittest
+
+import numpy as np
+
+from xai.model.interpreter.sample_planner import split_budget, plan_samples, stratified_selection, \
+    cluster_samples, predicted_strata
+
+
+class TestSamplePlanner(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.samples = np.random.RandomState(0).rand(200, 3)
+        self.calls = []
+
+    def predict_fn(self, x):
+        self.calls.append(len(x))
+        x = np.asarray(x)
+        scores = np.stack([x[:, 0], 0.5 * np.ones(len(x)), x[:, 1]], axis=1)
+        return scores / scores.sum(axis=1, keepdims=True)
+
+    def test_split_budget(self):
+        """
+        Test that the budget is split between the instances and the perturbed samples within the budget
+        """
+        num_instances, num_samples = split_budget(100000, 1000)
+        self.assertEqual(num_samples, 316)
+        self.assertEqual(num_instances, 316)
+        self.assertLessEqual(num_instances * num_samples, 100000)
+
+        # the rest of the budget goes to the samples when the budget covers all instances
+        self.assertEqual(split_budget(100000, 50), (50, 2000))
+        self.assertEqual(split_budget(10 ** 9, 50), (50, 5000))
+
+        # the cost of an explanation besides the model evaluations
+        num_instances, num_samples = split_budget(10.0, 1000, fixed_cost=0.05, sample_cost=0.001)
+        self.assertLessEqual(num_instances * (0.05 + 0.001 * num_samples), 10.0)
+
+    def test_split_budget_below_min_samples(self):
+        """
+        Test that a budget below the minimum number of perturbed samples explains a single instance within it
+        """
+        self.assertEqual(split_budget(40, 1000), (1, 40))
+        self.assertEqual(split_budget(0, 1000), (1, 1))
+        num_instances, num_samples = split_budget(2.75, 1000, fixed_cost=0.25, sample_cost=0.125)
+        self.assertEqual((num_instances, num_samples), (1, 20))
+
+    def test_plan_samples(self):
+        """
+        Test that the plan stays within the budget, besides one prediction of each sample for the strata
+        """
+        plan = plan_samples(self.predict_fn, self.samples, budget=5000, random_state=0)
+        self.assertLessEqual(plan.num_evaluations, 5000)
+        self.assertEqual(sum(self.calls), len(self.samples))
+        self.assertEqual(len(plan.indices), sum(plan.strata.values()))
+        self.assertEqual(plan.indices, sorted(set(plan.indices)))
+        strata = predicted_strata(self.predict_fn, self.samples)
+        self.assertEqual(set(plan.strata), set(strata))
+        self.assertEqual(plan.total_count, len(self.samples))
+
+        with self.assertRaises(ValueError):
+            plan_samples(self.predict_fn, self.samples)
+
+    def test_plan_samples_time_limit(self):
+        """
+        Test that the time limit is planned from the measured cost of the explain function
+        """
+        sizes = []
+        plan = plan_samples(self.predict_fn, self.samples, time_limit=0.5,
+                            explain_fn=lambda instance, size: sizes.append(size), random_state=0)
+        self.assertEqual(sizes, [100, 100, 400, 400])
+        self.assertGreater(len(plan.indices), 0)
+        with self.assertRaises(ValueError):
+            plan_samples(self.predict_fn, self.samples, time_limit=0.5)
+
+    def test_stratified_selection(self):
+        """
+        Test the allocation of the samples to the strata
+        """
+        strata = {'a': list(range(0, 80)), 'b': list(range(80, 98)), 'c': [98, 99]}
+        self.assertEqual(stratified_selection(strata), strata)
+
+        selected = stratified_selection(strata, max_per_stratum=10, random_state=0)
+        self.assertEqual({stratum: len(indices) for stratum, indices in selected.items()}, {'a': 10, 'b': 10, 'c': 2})
+
+        selected = stratified_selection(strata, max_samples=10, random_state=0)
+        self.assertEqual({stratum: len(indices) for stratum, indices in selected.items()}, {'a': 8, 'b': 2})
+        for stratum, indices in selected.items():
+            self.assertTrue(set(indices) <= set(strata[stratum]))
+            self.assertEqual(indices, sorted(indices))
+        self.assertEqual(stratified_selection(strata, max_samples=10, random_state=0), selected)
+
+        # more strata than samples
+        strata = {stratum: [stratum] * (1 + stratum % 3) for stratum in range(30)}
+        selected = stratified_selection(strata, max_samples=10, random_state=0)
+        self.assertEqual(sum(len(indices) for indices in selected.values()), 10)
+
+    def test_cluster_samples(self):
+        """
+        Test that each sample is represented by a sample of the same stratum, and the representatives
+        represent themselves
+        """
+        strata = predicted_strata(self.predict_fn, self.samples)
+        indices, representatives = cluster_samples(self.samples, 20, strata=strata, random_state=0)
+        self.assertEqual(indices, sorted(set(representatives.tolist())))
+        self.assertLessEqual(abs(len(indices) - 20), len(strata))
+        stratum_of = {idx: stratum for stratum, stratum_indices in strata.items() for idx in stratum_indices}
+        for idx, representative in enumerate(representatives.tolist()):
+            self.assertEqual(stratum_of[idx], stratum_of[representative])
+            self.assertEqual(representatives[representative], representative)
+
+        indices, representatives = cluster_samples(self.samples[:5], 10)
+        self.assertEqual(indices, list(range(5)))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1 +1 @@
-from xai.explainer.constants import DOMAIN, ALG, MODE
+from xai.explainer.constants import DOMAIN, ALG, MODE, BACKGROUND
@@ -11,11 +11,17 @@ from __future__ import print_function
 
 import json
 
+import numpy as np
+
 import xai
 from xai.compiler.base import Dict2Obj
 from xai.explainer import ExplainerFactory
 from xai.explainer.constants import OUTPUT
-from xai.explainer.helper import parse_feature_meta_tabular
+from xai.explainer.explanation_cache import ExplanationCache
+from xai.explainer.helper import parse_feature_meta_tabular, parse_feature_groups, get_model_specific_algorithm
+from xai.explainer.prediction_cache import PredictionCache
+from xai.explainer.prediction_executor import PredictionExecutor
+from xai.explainer.serialization import build_explainer_cached
 from xai.formatter import Report
 
 
@@ -34,9 +40,29 @@ class ModelAgnosticExplainer(Dict2Obj):
     Attr:
         predict_func (str): path to predict function call pickle
         train_data (str): path to training sample data
-        feature_meta (str): path to a meta json file
-        method: (str, Optional) interpreter method, default = 'lime'
+        feature_meta (str): path to a meta json file. Its optional "feature_groups" maps the name of a group to
+                the names or indices of its columns, e.g. of a one-hot encoded category, which 'lime' and 'shap'
+                perturb and explain as a single feature
+        method: (str, Optional) interpreter method, default is 'tree_shap' for a tree model,
+                'linear' for a linear model and 'lime' for other models
         num_features (integer, Optional): number of features to show in the explanation, default 10
+        background_size (integer, Optional): number of rows to summarize the training data into as
+                the background of 'shap', default is to use the full training data
+        background_method (str, Optional): background summarization method, 'kmeans', 'stratified' or
+                'sample', default 'kmeans'
+        train_label (str, Optional): path to the labels of the training sample data, required by the
+                'stratified' background method
+        cache_predictions (bool, Optional): cache the model predictions of identical inputs, default False
+        prediction_chunk_size (integer, Optional): maximum number of rows in a single call of the predict
+                function, default is None to predict all rows in one call
+        prediction_workers (integer, Optional): number of threads calling the predict function concurrently,
+                e.g. for a model served by a local process, default 1
+        explanation_cache_dir (str, Optional): directory of a persistent cache of the sample explanations,
+                default is None for no cache
+        explainer_cache_dir (str, Optional): directory of a build cache, a saved explainer is reused when the
+                model, training data and build parameters match. Default is None for no cache
+        compact (bool, Optional): save the explainer in the compact format as the directory `explainer`,
+                with memory-mapped arrays on load, instead of `explainer.pkl`. Default False
 
     Example:
         "component": {
@@ -57,18 +83,29 @@ class ModelAgnosticExplainer(Dict2Obj):
         "properties": {
             "predict_func": {"type": ["string", "object"]},
             "train_data": {" type": ["string", "object"]},
+            "train_label": {"type": ["string", "object"]},
             "feature_meta": {"type": "string"},
             "domain": {
                 "enum": ["tabular", "text"]
             },
             "method": {
-                "enum": ["lime", "shap"],
-                "default": "lime"
+                "enum": ["lime", "shap", "native_lime", "tree_shap", "linear"]
             },
             "num_features": {
                 "type": "integer",
                 "default": 5
-            }
+            },
+            "background_size": {"type": "integer"},
+            "background_method": {
+                "enum": ["kmeans", "stratified", "sample"],
+                "default": "kmeans"
+            },
+            "cache_predictions": {"type": "boolean", "default": False},
+            "prediction_chunk_size": {"type": "number"},
+            "prediction_workers": {"type": "number", "default": 1},
+            "explanation_cache_dir": {"type": "string"},
+            "explainer_cache_dir": {"type": "string"},
+            "compact": {"type": "boolean", "default": False}
         },
         "required": ["predict_func", "train_data", "domain", "feature_meta"]
     }
@@ -95,12 +132,19 @@ class ModelAgnosticExplainer(Dict2Obj):
                                                      level=level)
         # -- Load Parameters --
         num_features = self.assert_attr(key='num_features', default=10)
-        method = self.assert_attr(key='method', default='lime')
+        method = self.assert_attr(key='method', optional=True)
         domain = self.assert_attr(key='domain')
 
         # -- Load Predict Function --
         predict_fn_var = self.assert_attr(key='predict_func')
         predict_fn = self.load_data(predict_fn_var)
+        chunk_size = self.assert_attr(key='prediction_chunk_size', optional=True)
+        workers = self.assert_attr(key='prediction_workers', default=1)
+        if chunk_size is not None or workers > 1:
+            predict_fn = PredictionExecutor(predict_fn, chunk_size=chunk_size and int(chunk_size),
+                                            max_workers=int(workers))
+        if self.assert_attr(key='cache_predictions', default=False):
+            predict_fn = PredictionCache(predict_fn)
 
         # -- Load Feature Meta--
         feature_meta_path = self.assert_attr(key='feature_meta', optional=True)
@@ -121,53 +165,89 @@ class ModelAgnosticExplainer(Dict2Obj):
 
         kwargs = dict()
 
-        algorithm = xai.ALG.LIME
-        if method == 'shap':
-            algorithm = xai.ALG.SHAP
+        if method is not None:
+            algorithm = method
+        else:
+            algorithm = get_model_specific_algorithm(domain, predict_fn) or xai.ALG.LIME
 
         if domain == 'tabular':
             _domain = xai.DOMAIN.TABULAR
-            if algorithm == xai.ALG.LIME:
-                feature_names, categorical_index, categorical_mapping = parse_feature_meta_tabular(
-                    meta_data)
+            feature_names, categorical_index, categorical_mapping = parse_feature_meta_tabular(
+                meta_data)
+            feature_groups = parse_feature_groups(meta_data, feature_names)
+            if algorithm in [xai.ALG.LIME, xai.ALG.NATIVE_LIME]:
                 kwargs.update({"class_names": class_names,
                                "categorical_features": categorical_index,
                                "dict_categorical_mapping": categorical_mapping})
+            elif algorithm == xai.ALG.SHAP:
+                kwargs.update({"background_size": self.assert_attr(key='background_size', optional=True),
+                               "background_method": self.assert_attr(key='background_method',
+                                                                     default=xai.BACKGROUND.KMEANS)})
+                label_var = self.assert_attr(key='train_label', optional=True)
+                if label_var is not None:
+                    kwargs.update({"training_labels": np.asarray(self.load_data(label_var, header=True)).ravel()})
+            if feature_groups and algorithm in [xai.ALG.LIME, xai.ALG.SHAP]:
+                kwargs.update({"feature_groups": feature_groups})
         elif domain == 'text':
             _domain = xai.DOMAIN.TEXT
 
         explainer_factory = ExplainerFactory.get_explainer(domain=_domain, algorithm=algorithm)
 
         if _domain == xai.DOMAIN.TABULAR:
-            explainer_factory.build_explainer(
-                training_data=train_data,
-                predict_fn=predict_fn,
-                feature_names=feature_names,
-                **kwargs
-            )
+            build_kwargs = dict(training_data=train_data, predict_fn=predict_fn, feature_names=feature_names,
+                                **kwargs)
         elif _domain == xai.DOMAIN.TEXT:
-            explainer_factory.build_explainer(predict_fn=predict_fn, class_names=class_names)
+            build_kwargs = dict(predict_fn=predict_fn, class_names=class_names)
 
-        explainer_factory.save_explainer('explainer.pkl')
+        explainer_cache_dir = self.assert_attr(key='explainer_cache_dir', optional=True)
+        if explainer_cache_dir is not None:
+            build_explainer_cached(explainer_factory, explainer_cache_dir, **build_kwargs)
+        else:
+            explainer_factory.build_explainer(**build_kwargs)
+
+        if self.assert_attr(key='compact', default=False):
+            explainer_path = 'explainer'
+            explainer_factory.save_explainer(explainer_path, compact=True)
+        else:
+            explainer_path = 'explainer.pkl'
+            explainer_factory.save_explainer(explainer_path)
 
         # -- Add Explainer Information in Report --
-        report.detail.add_paragraph('The local explainer is generated as `explainer.pkl`')
+        report.detail.add_paragraph('The local explainer is generated as `%s`' % explainer_path)
 
         explainer_information = list()
         explainer_information.append(('Domain', domain))
         explainer_information.append(('Algorithm', algorithm))
         explainer_information.append(('Training data shape', train_data.shape))
         explainer_information.append(('Number of features in explanations', min(num_features,train_data.shape[1])))
+        if getattr(explainer_factory, 'background_error', None) is not None:
+            explainer_information.append(('Background summary error', '%.4f' % explainer_factory.background_error))
 
         report.detail.add_model_info_summary(model_info=explainer_information, notes='Explainer Configuration')
         report.detail.add_header_level_3('Explanation Samples')
 
-        for i in range(2):
+        samples = train_data[:2, :]
+        explain_fn = lambda instances: [explainer_factory.explain_instance(instance, num_features=num_features)
+                                        for instance in instances]
+        cache_dir = self.assert_attr(key='explanation_cache_dir', optional=True)
+        if cache_dir is not None:
+            params = {key: value for key, value in build_kwargs.items() if key != 'predict_fn'}
+            context = ExplanationCache.context(algorithm, predict_fn, domain=_domain, num_features=num_features,
+                                               **params)
+            sample_explanations = ExplanationCache(cache_dir).explain(context, samples, explain_fn)
+        else:
+            sample_explanations = explain_fn(samples)
+
+        for i, explainations in enumerate(sample_explanations):
             report.detail.add_paragraph_title('Example %s: ' % i)
-            explainations = explainer_factory.explain_instance(train_data[i, :],
-                                                               num_features=num_features)
             for key, value in explainations.items():
                 details = [(item[OUTPUT.FEATURE], "%.3f" % item[OUTPUT.SCORE]) for item in value[OUTPUT.EXPLANATION]]
                 report.detail.add_model_info_summary(model_info=details,
                                                      notes='Class %s - Confidence: %s' % (
                                                      class_names[key] if class_names else key, value[OUTPUT.PREDICTION]))
+
+        # an explainer loaded from the build cache calls its saved copy of the predict function
+        predict_fn = getattr(explainer_factory, 'predict_fn', predict_fn)
+        if isinstance(predict_fn, PredictionCache):
+            report.detail.add_paragraph('Prediction cache: %(hits)s hits, %(misses)s misses, '
+                                        'hit rate %(hit_rate).2f' % predict_fn.stats())
@@ -15,10 +15,12 @@ from pandas import DataFrame
 from scipy.sparse.csr import csr_matrix
 
 from xai.compiler.base import Dict2Obj
+from xai.explainer.explanation_cache import DEFAULT_MAX_BYTES
+from xai.explainer.prediction_cache import PredictionCache
+from xai.explainer.prediction_executor import PredictionExecutor
 from xai.formatter import Report
 from xai.model.interpreter import ModelInterpreter as MI
 from xai import (
- ALG,
  MODE
 )
 
@@ -37,7 +39,8 @@ class ModelInterpreter(Dict2Obj):
 
     Attr:
         domain (str): User-provided domain
-        method: (str, Optional) interpreter method, default (lime) = 'default'
+        method: (str, Optional) interpreter method, default is 'tree_shap' for a tree model,
+                'linear' for a linear model and 'lime' for other models
 
         ** For Model Interpretation **
         mode: (str, Optional) classification/regression model,
@@ -46,6 +49,20 @@ class ModelInterpreter(Dict2Obj):
                 Each row is a training sample, each column is a feature
         labels: a list of str/int, the class label for each training sample
         predict_func: model object or path to predict function call pickle
+        cache_predictions: bool set to True to cache the model predictions of identical inputs
+                Default value is False
+        prediction_chunk_size: int, maximum number of rows in a single call of the predict function
+                Default value is None to predict all rows in one call
+        prediction_workers: int, number of threads calling the predict function concurrently, e.g. for a
+                model served by a local process. Default value is 1
+        explanation_cache_dir: str, directory of a persistent explanation cache, a rerun with the same
+                model, data and parameters only explains the samples not in the cache
+                Default value is None for no cache
+        explanation_cache_max_bytes: int, maximum size of the explanation cache in bytes
+                Default value is 256MB
+        explanation_checkpoint_dir: str, directory to stream the explanations to, in shards with checkpoints
+                of the statistics, so a crashed run resumes after the last shard. Each component needs
+                its own directory. Default value is None for no checkpoints
         feature_names: array-list of feature names
         target_names: array-list of target names
         model_interpret_stats_type: str, default = 'top_k'
@@ -58,6 +75,33 @@ class ModelInterpreter(Dict2Obj):
                 Default value of k is 5
         model_interpret_top_value: int, the number of top explanation to display
                 Default value is 15
+        model_interpret_method: str, default = 'local'
+                - local: aggregate a local explanation of each training sample
+                - global_surrogate: fit a single interpretable surrogate on the model outputs of the training
+                  samples and their perturbations, and aggregate its explanations (tabular data only).
+                  The report states the fidelity of the surrogate
+        model_interpret_num_perturbations: int, the number of perturbations of each training sample
+                for the global surrogate. Default value is 10
+        model_interpret_num_clusters: int, cluster the training samples within each predicted class and
+                explain one representative per cluster, weighted by the cluster size. The report states
+                how well the explanations of the representatives match those of held-out samples
+                Default value is None to explain every sample
+        model_interpret_num_samples: int, the number of perturbed samples for each explanation,
+                which is the maximum if adaptive sampling is enabled
+                Default value is a tenth of the number of training samples, with a minimum of 100
+        model_interpret_adaptive: bool set to True to draw the perturbed samples in rounds and
+                stop once the explanation is stable, for the methods which support it (e.g. native_lime)
+                Default value is False
+        model_interpret_budget: int, maximum number of model evaluations of the interpretation. A subset of
+                the training data stratified by predicted class is explained, and the report states
+                the confidence intervals of the statistics
+                Default value is None for no budget
+        model_interpret_time_limit: float, wall-clock limit of the interpretation in seconds, planned like
+                the budget. Default value is None for no limit
+        n_jobs: int, number of worker processes to explain the samples in parallel, -1 for the number of CPUs
+                Default value is 1
+        random_state: int, base seed of the per-sample seeds, so the result does not depend on n_jobs
+                Default value is None for no per-sample seeds if n_jobs is 1, else 0
 
         ** For Error Analysis **
         enable_error_analysis: bool set to True to enable error analysis else False to disable
@@ -76,6 +120,11 @@ class ModelInterpreter(Dict2Obj):
                 Default value of k is 5
         error_analysis_top_value: int, the number of top error analysis explanation to display
                 Default value is 15
+        error_analysis_max_samples_per_cell: int, maximum number of misclassified samples explained
+                for each confusion matrix cell. Default value is None for no limit
+        error_analysis_max_samples: int, maximum number of misclassified samples explained in total,
+                drawn from each confusion matrix cell in proportion to its size
+                Default value is None for no limit
 
     Example:
         "component": {
@@ -112,8 +161,7 @@ class ModelInterpreter(Dict2Obj):
                 "default": "tabular"
             },
             "method": {
-                "enum": ["lime", "shap"],
-                "default": "lime"
+                "enum": ["lime", "shap", "native_lime", "tree_shap", "linear"]
             },
             "mode": {
                 "enum": ["classification", "regression"],
@@ -122,6 +170,14 @@ class ModelInterpreter(Dict2Obj):
             "train_data": {"type": ["string", "object"]},
             "labels": {"type": ["string", "object"]},
             "predict_func": {"type": ["string", "object"]},
+            "cache_predictions": {"type": "boolean", "default": False},
+            "prediction_chunk_size": {"type": "number"},
+            "prediction_workers": {"type": "number", "default": 1},
+            "explanation_cache_dir": {"type": "string"},
+            "explanation_cache_max_bytes": {"type": "number", "default": 268435456},
+            "explanation_checkpoint_dir": {"type": "string"},
+            "n_jobs": {"type": "number", "default": 1},
+            "random_state": {"type": "number"},
             "feature_names": {"type": ["string", "object"]},
             "target_names": {"type": ["string", "object"]},
             "model_interpret_stats_type": {
@@ -130,6 +186,16 @@ class ModelInterpreter(Dict2Obj):
             },
             "model_interpret_k_value": { "type": "number", "default": 5},
             "model_interpret_top_value": { "type": "number", "default": 15},
+            "model_interpret_method": {
+                "enum": ["local", "global_surrogate"],
+                "default": "local"
+            },
+            "model_interpret_num_perturbations": {"type": "number", "default": 10},
+            "model_interpret_num_clusters": {"type": "number"},
+            "model_interpret_num_samples": {"type": "number"},
+            "model_interpret_budget": {"type": "number"},
+            "model_interpret_time_limit": {"type": "number"},
+            "model_interpret_adaptive": {"type": "boolean", "default": False},
             "num_of_class": {"type": "number"},
             "valid_x":  {"type": ["string", "object"]},
             "valid_y":  {"type": ["string", "object"]},
@@ -139,6 +205,8 @@ class ModelInterpreter(Dict2Obj):
             },
             "error_analysis_k_value": { "type": "number", "default": 5},
             "error_analysis_top_value": {"type": "number", "default": 15},
+            "error_analysis_max_samples_per_cell": {"type": "number"},
+            "error_analysis_max_samples": {"type": "number"},
             "enable_error_analysis": {"type": "boolean", "default": False}
         },
         "required": ["domain", "train_data", "predict_func",
@@ -178,7 +246,7 @@ class ModelInterpreter(Dict2Obj):
         super(ModelInterpreter, self).__call__(report=report,
                                                level=level)
         domain = self.assert_attr(key='domain')
-        method = self.assert_attr(key='method', default=ALG.LIME)
+        method = self.assert_attr(key='method', optional=True)
         mode = self.assert_attr(key='mode', default=MODE.CLASSIFICATION)
 
         # -- Load Training Data --
@@ -201,6 +269,13 @@ class ModelInterpreter(Dict2Obj):
         # -- Load Predict Function --
         predict_fn_var = self.assert_attr(key='predict_func')
         predict_fn = self.load_data(predict_fn_var)
+        chunk_size = self.assert_attr(key='prediction_chunk_size', optional=True)
+        workers = self.assert_attr(key='prediction_workers', default=1)
+        if chunk_size is not None or workers > 1:
+            predict_fn = PredictionExecutor(predict_fn, chunk_size=chunk_size and int(chunk_size),
+                                            max_workers=int(workers))
+        if self.assert_attr(key='cache_predictions', default=False):
+            predict_fn = PredictionCache(predict_fn)
         # -- Check if feature names is set --
         fn_var = self.assert_attr(key='feature_names', optional=True)
         feature_names = None
@@ -215,6 +290,16 @@ class ModelInterpreter(Dict2Obj):
                                       default='top_k')
         k_value = self.assert_attr(key='model_interpret_k_value', default=5)
         top = self.assert_attr(key="model_interpret_top_value", default=15)
+        interpret_method = self.assert_attr(key="model_interpret_method", default='local')
+        num_perturbations = self.assert_attr(key="model_interpret_num_perturbations", default=10)
+        num_clusters = self.assert_attr(key="model_interpret_num_clusters", optional=True)
+        checkpoint_dir = self.assert_attr(key="explanation_checkpoint_dir", optional=True)
+        num_samples = self.assert_attr(key="model_interpret_num_samples", optional=True)
+        adaptive = self.assert_attr(key="model_interpret_adaptive", default=False)
+        budget = self.assert_attr(key="model_interpret_budget", optional=True)
+        time_limit = self.assert_attr(key="model_interpret_time_limit", optional=True)
+        n_jobs = self.assert_attr(key="n_jobs", default=1)
+        random_state = self.assert_attr(key="random_state", optional=True)
 
         # -- Error Analysis --
         classes = 0
@@ -243,9 +328,15 @@ class ModelInterpreter(Dict2Obj):
                                           default=5)
             ea_top = self.assert_attr(key="error_analysis_top_value",
                                       default=15)
+            ea_max_per_cell = self.assert_attr(key="error_analysis_max_samples_per_cell",
+                                               optional=True)
+            ea_max_samples = self.assert_attr(key="error_analysis_max_samples",
+                                              optional=True)
 
         # -- Define the domain and algorithm for interpreter --
-        mi = MI(domain=domain, algorithm=method)
+        mi = MI(domain=domain, algorithm=method,
+                cache_dir=self.assert_attr(key='explanation_cache_dir', optional=True),
+                cache_max_bytes=self.assert_attr(key='explanation_cache_max_bytes', default=DEFAULT_MAX_BYTES))
 
         # -- Build and initialize model interpreter --
         mi.build_interpreter(training_data=train_data,
@@ -256,22 +347,77 @@ class ModelInterpreter(Dict2Obj):
                              class_names=target_names)
 
         # -- Interpreter the model with training data --
-        class_stats, total_count = mi.interpret_model(samples=train_data,
-                                                      stats_type=stats_type,
-                                                      k=k_value)
+        if interpret_method == 'global_surrogate':
+            class_stats, total_count = mi.interpret_model_global(samples=train_data,
+                                                                 stats_type=stats_type,
+                                                                 k=k_value,
+                                                                 num_perturbations=num_perturbations,
+                                                                 random_state=random_state)
+        else:
+            class_stats, total_count = mi.interpret_model(samples=train_data,
+                                                          stats_type=stats_type,
+                                                          k=k_value,
+                                                          num_samples=num_samples,
+                                                          adaptive=adaptive,
+                                                          n_jobs=n_jobs,
+                                                          random_state=random_state,
+                                                          budget=budget,
+                                                          time_limit=time_limit,
+                                                          num_clusters=num_clusters,
+                                                          checkpoint_dir=checkpoint_dir)
         # -- Add Model Interpreter  --
+        plan = mi.get_sample_plan()
+        notes = []
+        fidelity = mi.get_surrogate_fidelity() if interpret_method == 'global_surrogate' else None
+        if fidelity is not None:
+            note = 'The statistics are computed from a global surrogate of the model, with a fidelity ' \
+                   '(R2 on the model outputs) of %.3f' % fidelity['r2']
+            if 'accuracy' in fidelity:
+                note += ' and a predicted class agreement of %.3f' % fidelity['accuracy']
+            notes.append(note + '.')
+        reuse_quality = mi.get_reuse_quality()
+        if reuse_quality is not None:
+            notes.append('The statistics are estimated from the explanations of %s cluster representatives, '
+                         'weighted by the cluster size.' % reuse_quality['num_clusters'])
+            if reuse_quality['num_validation']:
+                notes.append('On %(num_validation)s held-out samples, the features of the explanation of the '
+                             'representative overlap by %(feature_overlap).3f (Jaccard index) with those of the '
+                             'sample, and the explained class agrees for %(label_agreement).3f of them.'
+                             % reuse_quality)
+        if plan is not None:
+            notes.append('The statistics are estimated from %s of %s samples, stratified by predicted class, '
+                         'with %s perturbed samples per explanation.' % (len(plan.indices), plan.total_count,
+                                                                         plan.num_samples))
+        notes = ' '.join(notes) or None
         report.detail.add_model_interpreter(mode=mode, class_stats=class_stats,
                                             total_count=total_count,
                                             stats_type=stats_type,
-                                            k=k_value, top=top)
+                                            k=k_value, top=top, notes=notes)
+        if plan is not None:
+            intervals = mi.get_confidence_intervals(confidence=0.95)
+            for label, stats in class_stats.items():
+                details = [(feature, '%.3f +/- %.3f' % (value, intervals[label][feature]))
+                           for feature, value in list(stats.items())[:top]]
+                report.detail.add_model_info_summary(model_info=details,
+                                                     notes='Class %s - 95%% confidence intervals' % label)
 
         if en_flag:
             # -- Error Analysis with validation data --
             error_stats = mi.error_analysis(class_num=classes, valid_x=valid_x,
                                             valid_y=valid_y,
                                             stats_type=ea_stats_type,
-                                            k=ea_k_value)
+                                            k=ea_k_value,
+                                            n_jobs=n_jobs,
+                                            random_state=random_state,
+                                            max_samples_per_cell=ea_max_per_cell,
+                                            max_samples=ea_max_samples,
+                                            checkpoint_dir=checkpoint_dir)
             # -- Add Error Analysis --
             report.detail.add_error_analysis(mode=mode, error_stats=error_stats,
                                              stats_type=ea_stats_type,
                                              k=ea_k_value, top=ea_top)
+
+        cache_stats = mi.get_cache_stats()
+        if cache_stats is not None:
+            report.detail.add_paragraph('Explanation cache: %(hits)s hits, %(misses)s misses, '
+                                        '%(entries)s cached explanations' % cache_stats)
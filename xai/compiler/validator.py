@@ -9,10 +9,6 @@ from __future__ import absolute_import
 from __future__ import division
 from __future__ import print_function
 
-import itertools
-from collections import defaultdict
-from copy import deepcopy
-
 from xai.compiler.base import Dict2Obj
 from xai.data.constants import DATATYPE
 from xai.data.exceptions import AnalyzerDataTypeNotSupported
@@ -21,6 +17,8 @@ from xai.data.explorer import CategoricalDataAnalyzer, NumericDataAnalyzer, \
 from xai.data.explorer import CategoricalStats, NumericalStats, TextStats, \
     DatetimeStats
 from xai.data.validator.dataframe_validator import DataframeValidator
+from xai.data.validator.partitioned_validator import PartitionedValidator
+from xai.data.validator.relational_index import RelationalIndex
 from xai.formatter import Report
 
 
@@ -50,6 +48,14 @@ class DuplicationOrphanCheck(Dict2Obj):
                                         - foreign_key (str): column name in the foreign file
                                 - to_file (str): filepath to dump the orphan-droped data frame.
                                                  Default is None and no save back.
+        out_of_core (dict, Optional): a dict to enable the out-of-core mode for data larger than memory,
+                                `data` and `foreign_data` must be csv/tsv files or data frames.
+                                The data are hash-partitioned on the key columns into spill files and checked one
+                                partition at a time. It has following keys:
+                                - num_partitions (int): number of hash partitions. Default is 16.
+                                - chunk_size (int): number of rows read at a time. Default is 100000.
+                                - spill_dir (str): directory for the spill files.
+                                                 Default is None and a temporary directory is used.
 
     Example:
         "component": {
@@ -119,8 +125,15 @@ class DuplicationOrphanCheck(Dict2Obj):
                         "type": "string",
                         "default": None}
                 }
+            },
+            "out_of_core": {
+                "type": "object",
+                "properties": {
+                    "num_partitions": {"type": "integer", "default": 16},
+                    "chunk_size": {"type": "integer", "default": 100000},
+                    "spill_dir": {"type": "string", "default": None}
+                }
             }
-
         },
         "required": ["data"]
     }
@@ -149,20 +162,8 @@ class DuplicationOrphanCheck(Dict2Obj):
         data_var = self.assert_attr(key='data')
         duplication_rule = self.assert_attr(key='duplication_rule', default=None)
         orphan_rules = self.assert_attr(key='orphan_rules')
+        out_of_core = self.assert_attr(key='out_of_core', optional=True)
 
-        df = None
-        # -- Load Data --
-        if not (data_var is None):
-            df = self.load_data(data_var, header=True)
-
-        # -- Information about Raw Dataframe --
-        self.report.detail.add_key_value_pairs(info_list=[('Total number of raw samples', df.shape[0])],
-                                               notes='Raw Data Quantity')
-
-        # -- Initialize DataframeValidator --
-        dv_processor = DataframeValidator()
-
-        # -- Duplication Check about Raw Dataframe --
         if 'keys' in duplication_rule:
             duplication_keys = duplication_rule['keys']
         else:
@@ -172,20 +173,6 @@ class DuplicationOrphanCheck(Dict2Obj):
         else:
             duplication_to_file = None
 
-        duplicated_indices = dv_processor.duplication_check(df, duplication_keys)
-        drop_indices = list(itertools.chain.from_iterable([l[1:] for l in duplicated_indices]))
-
-        self.report.detail.add_key_value_pairs(info_list=[('Total number of samples after duplication check on %s' % (
-            duplication_keys if duplication_keys is not None else "all columns"),
-                                                           df.shape[0] - len(drop_indices))],
-                                               notes='Duplication Check')
-        duplicate_dropped_df = df.drop(index=drop_indices)
-
-        if duplication_to_file is not None:
-            duplicate_dropped_df.to_csv(duplication_to_file)
-
-        # -- Orphan Relation Check about Duplicated Data --
-        orphan_check_info = []
         if "rules" in orphan_rules:
             rules = orphan_rules["rules"]
         else:
@@ -196,35 +183,95 @@ class DuplicationOrphanCheck(Dict2Obj):
         else:
             orphan_to_filepath = None
 
-        all_orphaned_index = set()
-
-        for rule in rules:
-            local_key = rule['local_key']
-            foreign_var = rule['foreign_data']
-            foreign_key = rule['foreign_key']
-
-            foreign_df = None
-            if not (foreign_var is None):
-                foreign_df = self.load_data(foreign_var, header=True)
+        # -- Duplication Check and Orphan Relation Check --
+        if out_of_core is not None:
+            raw_count, duplicate_count, orphan_count = self._partitioned_check(
+                data_var, duplication_keys, duplication_to_file, rules, orphan_to_filepath, out_of_core)
+        else:
+            raw_count, duplicate_count, orphan_count = self._in_memory_check(
+                data_var, duplication_keys, duplication_to_file, rules, orphan_to_filepath)
 
-            orphan_indices = dv_processor.orphaned_relation_check(df_a=duplicate_dropped_df,
-                                                                  df_b=foreign_df,
-                                                                  col_a=local_key,
-                                                                  col_b=foreign_key)
+        # -- Information about Raw Dataframe --
+        self.report.detail.add_key_value_pairs(info_list=[('Total number of raw samples', raw_count)],
+                                               notes='Raw Data Quantity')
 
-            all_orphaned_index.update(set(orphan_indices))
+        # -- Duplication Check about Raw Dataframe --
+        self.report.detail.add_key_value_pairs(info_list=[('Total number of samples after duplication check on %s' % (
+            duplication_keys if duplication_keys is not None else "all columns"),
+                                                           raw_count - duplicate_count)],
+                                               notes='Duplication Check')
 
-            orphan_check_info.append(("[%s] not in [%s of %s]" % (local_key, foreign_key, foreign_var),
-                                      len(orphan_indices)))
+        # -- Orphan Relation Check about Duplicated Data --
+        orphan_check_info = []
+        for idx, rule in enumerate(rules):
+            orphan_check_info.append(("[%s] not in [%s of %s]" % (rule['local_key'], rule['foreign_key'],
+                                                                  rule['foreign_data']),
+                                      orphan_count[idx]))
 
         if len(orphan_check_info) > 0:
             self.report.detail.add_key_value_pairs(info_list=orphan_check_info, notes='Orphaned Relation Check')
 
-        orphan_dropped_df = duplicate_dropped_df.drop(index=list(all_orphaned_index))
+    def _in_memory_check(self, data_var, duplication_keys, duplication_to_file, rules, orphan_to_filepath):
+        """
+        Run duplication check and orphan relation check with all data loaded in memory
+
+        Returns:
+            raw_count: number of raw samples
+            duplicate_count: number of duplicated samples dropped
+            orphan_count: a dict maps the rule position to its number of orphaned samples
+        """
+        df = None
+        # -- Load Data --
+        if not (data_var is None):
+            df = self.load_data(data_var, header=True)
+
+        # -- Initialize DataframeValidator --
+        dv_processor = DataframeValidator()
+        relational_index = RelationalIndex(loader=lambda var: self.load_data(var, header=True))
+
+        drop_mask = dv_processor.duplication_drop_mask(df, duplication_keys)
+        duplicate_dropped_df = df[~drop_mask]
+
+        if duplication_to_file is not None:
+            duplicate_dropped_df.to_csv(duplication_to_file)
+
+        # foreign tables and key indices are shared by all rules
+        all_orphaned, orphan_count = relational_index.orphan_rules_mask(duplicate_dropped_df, rules)
+        orphan_dropped_df = duplicate_dropped_df[~all_orphaned]
 
         if orphan_to_filepath is not None:
             orphan_dropped_df.to_csv(orphan_to_filepath)
 
+        return df.shape[0], int(drop_mask.sum()), orphan_count
+
+    def _partitioned_check(self, data_var, duplication_keys, duplication_to_file, rules, orphan_to_filepath,
+                           out_of_core):
+        """
+        Run duplication check and orphan relation check out of core, one hash partition at a time
+
+        Returns:
+            raw_count: number of raw samples
+            duplicate_count: number of duplicated samples dropped
+            orphan_count: a dict maps the rule position to its number of orphaned samples
+        """
+        with PartitionedValidator(data_var,
+                                  num_partitions=out_of_core.get('num_partitions', 16),
+                                  chunk_size=out_of_core.get('chunk_size', 100000),
+                                  spill_dir=out_of_core.get('spill_dir', None)) as validator:
+            duplicate_count = validator.duplication_check(duplication_keys)
+            if duplication_to_file is not None:
+                validator.write(duplication_to_file, drop_orphans=False)
+
+            orphan_count = dict()
+            for idx, rule in enumerate(rules):
+                orphan_count[idx] = validator.orphaned_relation_check(local_key=rule['local_key'],
+                                                                      foreign_data=rule['foreign_data'],
+                                                                      foreign_key=rule['foreign_key'])
+            if orphan_to_filepath is not None:
+                validator.write(orphan_to_filepath, drop_orphans=True)
+
+            return validator.num_rows, duplicate_count, orphan_count
+
 
 ################################################################################
 ### Complete Match Check
@@ -356,13 +403,13 @@ class CompleteMatchCheck(Dict2Obj):
             Returns:
                 entity_df: pandas.DataFrame, the data frame for entity
                 entity_key: str, the index search for mapping with `entity_a_column` or `entity_b_column`
-                entity_unit_stats: dict, the basic unit dict to capture the distribution.
+                entity_analyzers: dict, the basic unit dict to capture the distribution.
                                     - key: column name
-                                    - value: corresponding analyzer based on data type
+                                    - value: corresponding analyzer class based on data type
             """
 
             entity_df = df
-            entity_unit_stats = dict()
+            entity_analyzers = dict()
             entity_key = default_entity_key
 
             if "foreign_file" in config:
@@ -376,62 +423,69 @@ class CompleteMatchCheck(Dict2Obj):
                 col_name = item['name']
                 col_type = item['type']
                 if col_type == DATATYPE.CATEGORY:
-                    entity_unit_stats[col_name] = CategoricalDataAnalyzer()
+                    entity_analyzers[col_name] = CategoricalDataAnalyzer
                     entity_df[col_name] = entity_df[col_name].astype(str)
                 elif col_type == DATATYPE.NUMBER:
-                    entity_unit_stats[col_name] = NumericDataAnalyzer()
+                    entity_analyzers[col_name] = NumericDataAnalyzer
                     entity_df[col_name] = entity_df[col_name].astype(float)
                 elif col_type == DATATYPE.FREETEXT:
-                    entity_unit_stats[col_name] = TextDataAnalyzer()
+                    entity_analyzers[col_name] = TextDataAnalyzer
                     entity_df[col_name] = entity_df[col_name].astype(str)
                 elif col_type == DATATYPE.DATETIME:
-                    entity_unit_stats[col_name] = DatetimeDataAnalyzer()
+                    entity_analyzers[col_name] = DatetimeDataAnalyzer
                     entity_df[col_name] = entity_df[col_name].astype(str)
                 else:
                     raise AnalyzerDataTypeNotSupported(data_type=col_type)
 
-            return entity_df, entity_key, entity_unit_stats
+            return entity_df, entity_key, entity_analyzers
+
+        def get_shape_stats(entity_df, entity_key, entity_analyzers, entity_shapes):
+            """
+            helper method to compute the column distributions for every (m, n) shape in one group-by pass
+
+            Args:
+                entity_df (pandas.DataFrame): the data frame for entity
+                entity_key (str): the index column in the entity data frame
+                entity_analyzers (dict): maps column name to analyzer class
+                entity_shapes (pandas.DataFrame): maps entity index to (m, n) of its complete match
+
+            Returns:
+                A dict maps (m, n) to a dict of column name to analyzer
+            """
+            entity_df = entity_df.drop_duplicates(subset=[entity_key])
+            shapes = entity_shapes.reindex(entity_df[entity_key].values)
+            matched = shapes['m'].notna().values
+            groups = shapes[matched].astype(int).groupby(['m', 'n']).indices
+
+            shape_stats = dict()
+            for (m, n) in groups.keys():
+                shape_stats[(m, n)] = {col_name: analyzer() for col_name, analyzer in entity_analyzers.items()}
+            for col_name in entity_analyzers.keys():
+                values = entity_df[col_name].values[matched]
+                for (m, n), positions in groups.items():
+                    shape_stats[(m, n)][col_name].feed_all(values[positions])
+            return shape_stats
+
+        # -- Check Complete Match --
+        dv = DataframeValidator()
+        a_shapes, b_shapes, m2n_stats = dv.complete_match_shapes(df=df, col_a=entity_a_column,
+                                                                 col_b=entity_b_column)
+        print("number of complete matches:", sum(m2n_stats.values()))
 
-        # -- Initialize the stats default dict --
+        # -- Process complete match result and update visualization columns stats --
         entity_a_stats = None
         entity_b_stats = None
         if relational_a_columns is not None:
-            entity_a_df, entity_a_key, entity_a_unit_stats = \
+            entity_a_df, entity_a_key, entity_a_analyzers = \
                 get_relational_column_config(config=relational_a_columns,
                                              default_entity_key=entity_a_column)
-            entity_a_stats = defaultdict(lambda: deepcopy(entity_a_unit_stats))
+            entity_a_stats = get_shape_stats(entity_a_df, entity_a_key, entity_a_analyzers, a_shapes)
 
         if relational_b_columns is not None:
-            entity_b_df, entity_b_key, entity_b_unit_stats = \
+            entity_b_df, entity_b_key, entity_b_analyzers = \
                 get_relational_column_config(config=relational_b_columns,
                                              default_entity_key=entity_b_column)
-            entity_b_stats = defaultdict(lambda: deepcopy(entity_b_unit_stats))
-
-        # -- Check Complete Match --
-        dv = DataframeValidator()
-        complete_matches = dv.find_m_to_n_complete_matches(df=df, col_a=entity_a_column, col_b=entity_b_column)
-        # -- Process complete match result and update visualization columns stats --
-
-        print("number of complete matches:", complete_matches)
-        m2n_stats = defaultdict(int)
-
-        for col_a, col_b in complete_matches:
-            m = len(col_a)
-            n = len(col_b)
-            m2n_stats[(m, n)] += 1
-            if entity_a_stats is not None:
-                sub_df = entity_a_df[entity_a_df[entity_a_key].isin(col_a)].drop_duplicates(subset=[entity_a_key],
-                                                                                            inplace=False)
-                for col_name, analyzer in entity_a_stats[(m, n)].items():
-                    values = sub_df[col_name].values.tolist()
-                    analyzer.feed_all(values)
-
-            if entity_b_stats is not None:
-                sub_df = entity_b_df[entity_b_df[entity_b_key].isin(col_b)].drop_duplicates(subset=[entity_b_key],
-                                                                                            inplace=False)
-                for col_name, analyzer in entity_b_stats[(m, n)].keys():
-                    values = sub_df[col_name].values.tolist()
-                    analyzer.feed_all(values)
+            entity_b_stats = get_shape_stats(entity_b_df, entity_b_key, entity_b_analyzers, b_shapes)
 
         # -- Process complete match result and update visualization columns stats --
         table_header = ['M', 'N', 'Count', entity_a_column, entity_b_column]
@@ -474,13 +528,13 @@ class CompleteMatchCheck(Dict2Obj):
             print(m, n, count, count * m, count * n)
             report.detail.add_table(table_header=table_header, table_data=table_values, col_width=[20, 20, 20, 50, 50])
 
-            if entity_a_stats is not None:
+            if entity_a_stats is not None and (m, n) in entity_a_stats:
                 for col_name, analyzer in entity_a_stats[(m, n)].items():
                     report.detail.add_paragraph('Distribution: %s' % col_name)
                     stats = analyzer.get_statistics()
                     draw_distribution_for_stats(stats)
 
-            if entity_b_stats is not None:
+            if entity_b_stats is not None and (m, n) in entity_b_stats:
                 for col_name, analyzer in entity_b_stats[(m, n)].items():
                     report.detail.add_paragraph('Distribution: %s' % col_name)
                     stats = analyzer.get_statistics()
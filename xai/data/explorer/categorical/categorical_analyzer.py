@@ -6,6 +6,10 @@
 
 
 from collections import defaultdict
+from typing import Iterator
+
+import numpy as np
+import pandas as pd
 
 from xai.data.exceptions import ItemDataTypeNotSupported
 from xai.data.explorer.abstract_analyzer import AbstractDataAnalyzer
@@ -35,6 +39,23 @@ class CategoricalDataAnalyzer(AbstractDataAnalyzer):
             raise ItemDataTypeNotSupported(type(value), type(self), CategoricalDataAnalyzer.SUPPORTED_TYPES)
         self._frequency_count[value] += 1
 
+    def feed_all(self, values: Iterator):
+        """
+        Accumulate count for values, numpy arrays are counted in bulk and only distinct values are type checked
+
+        Args:
+           values: values fed into the analyzer in sequence
+
+        """
+        if isinstance(values, np.ndarray):
+            value_counts = pd.Series(values).value_counts(sort=False, dropna=False)
+            for value, count in zip(value_counts.index.tolist(), value_counts.values.tolist()):
+                if type(value) not in CategoricalDataAnalyzer.SUPPORTED_TYPES:
+                    raise ItemDataTypeNotSupported(type(value), type(self), CategoricalDataAnalyzer.SUPPORTED_TYPES)
+                self._frequency_count[value] += count
+        else:
+            super(CategoricalDataAnalyzer, self).feed_all(values)
+
     def get_statistics(self) -> CategoricalStats:
         """
         Return stats for the analyzer
@@ -5,7 +5,7 @@
 # ============================================================================
 
 import math
-from typing import Optional, List, Tuple
+from typing import Optional, List, Tuple, Iterator
 
 import numpy as np
 from sklearn.neighbors import KernelDensity
@@ -43,6 +43,22 @@ class NumericDataAnalyzer(AbstractDataAnalyzer):
             return
         self._values.append(value)
 
+    def feed_all(self, values: Iterator):
+        """
+        Feed values into analyzer, numerical numpy arrays are fed in bulk
+
+        Args:
+           values: values fed into the analyzer in sequence
+
+        """
+        if isinstance(values, np.ndarray) and values.dtype.kind in 'iuf':
+            values = values.astype(float)
+            is_nan = np.isnan(values)
+            self._nan_counter += int(np.count_nonzero(is_nan))
+            self._values.extend(values[~is_nan].tolist())
+        else:
+            super(NumericDataAnalyzer, self).feed_all(values)
+
     def get_statistics(self, bin_edges: Optional[List[float]] = None,
                        extreme_value_percentile: Optional[Tuple[float, float]] = [5, 95],
                        num_of_bins: Optional[int] = STATSCONSTANTS.DEFAULT_BIN_SIZE) -> NumericalStats:
@@ -7,4 +7,6 @@
 from .validation_stats import ValidationStats
 from .enum_validator import EnumValidator
 from .missing_validator import MissingValidator
+from .relational_index import RelationalIndex
 from .dataframe_validator import DataframeValidator
+from .partitioned_validator import PartitionedValidator
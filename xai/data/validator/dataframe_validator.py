@@ -4,17 +4,114 @@
 # Copyright 2019 SAP SE or an SAP affiliate company. All rights reserved
 # ============================================================================
 
-import operator
-from collections import Counter
-from typing import List, Tuple
+from typing import Dict, List, Tuple
 
+import numpy as np
 import pandas as pd
+from scipy.sparse import coo_matrix
+from scipy.sparse.csgraph import connected_components
 
 from xai.data.exceptions import ColumnNotFound
+from xai.data.validator.relational_index import RelationalIndex
 
 
 class DataframeValidator:
 
+    @classmethod
+    def _key_columns(cls, df: pd.DataFrame, key_col: List[str] = None) -> List[str]:
+        """
+        Validate the key columns against the dataframe
+
+        Args:
+            df: dataframe to check
+            key_col: a list of column names, None means all columns
+
+        Returns:
+            A list of column names
+        """
+        if key_col is None:
+            return list(df.columns)
+        for col in key_col:
+            if col not in df.columns:
+                raise ColumnNotFound(col, df.columns)
+        return list(key_col)
+
+    @classmethod
+    def row_hashes(cls, df: pd.DataFrame, key_col: List[str] = None) -> np.ndarray:
+        """
+        Return a 64-bit hash for each row based on column names
+
+        Args:
+            df: dataframe to hash
+            key_col: a list of column names to hash on, default is all columns
+
+        Returns:
+            A uint64 array with one hash per row
+        """
+        key_col = cls._key_columns(df, key_col)
+        return pd.util.hash_pandas_object(df[key_col], index=False).values
+
+    @classmethod
+    def duplicated_group_ids(cls, df: pd.DataFrame, key_col: List[str] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Return the duplicated rows and their group ids based on row hashes of the key columns.
+        Rows which are unique on the key columns are not materialized, and the rows with equal hashes
+        are compared, so that a hash collision does not merge distinct rows.
+
+        Args:
+            df: dataframe to check
+            key_col: a list of column names to check the duplicates
+
+        Returns:
+            positions: an int64 array of row positions which belong to a duplicated group
+            group_ids: an int64 array of the same length, the compact group id (0 ~ number of groups - 1)
+                       of each position, numbered by first appearance
+        """
+        key_col = cls._key_columns(df, key_col)
+        hashes = cls.row_hashes(df, key_col)
+        positions = np.flatnonzero(pd.Series(hashes).duplicated(keep=False).values)
+        group_ids, _ = pd.factorize(hashes[positions])
+        rows = df[key_col].iloc[positions]
+        first = ~rows.duplicated(keep='first').values
+        num_groups = len(np.unique(group_ids))
+        # a hash group with more than one distinct row is split into groups of equal rows
+        for group in np.flatnonzero(np.bincount(group_ids[first], minlength=num_groups) > 1):
+            members = np.flatnonzero(group_ids == group)
+            for representative in members[first[members]][1:]:
+                same = cls._equal_rows(rows.iloc[members], rows.iloc[representative])
+                group_ids[members[same]] = num_groups
+                num_groups += 1
+        duplicated = np.bincount(group_ids, minlength=num_groups)[group_ids] > 1
+        group_ids, _ = pd.factorize(group_ids[duplicated])
+        return positions[duplicated].astype(np.int64), group_ids.astype(np.int64)
+
+    @classmethod
+    def _equal_rows(cls, rows: pd.DataFrame, row: pd.Series) -> np.ndarray:
+        """
+        Return for each row whether it equals the given row, missing values are equal like in `duplicated`
+        """
+        return ((rows == row) | (rows.isna() & row.isna())).all(axis=1).values
+
+    @classmethod
+    def duplication_drop_mask(cls, df: pd.DataFrame, key_col: List[str] = None) -> np.ndarray:
+        """
+        Return a mask of rows to drop so that only the first seen row of each duplicated group is kept
+
+        Args:
+            df: dataframe to check
+            key_col: a list of column names to check the duplicates
+
+        Returns:
+            A boolean array, True if the row is a duplicate of an earlier row
+        """
+        key_col = cls._key_columns(df, key_col)
+        hashes = cls.row_hashes(df, key_col)
+        # equal rows have equal hashes, only the rows with a repeated hash are compared
+        candidates = pd.Series(hashes).duplicated(keep=False).values
+        drop_mask = np.zeros(len(df), dtype=bool)
+        drop_mask[candidates] = df[key_col][candidates].duplicated(keep='first').values
+        return drop_mask
+
     @classmethod
     def duplication_check(cls, df: pd.DataFrame, key_col: List[str] = None):
         """
@@ -28,69 +125,86 @@ class DataframeValidator:
             A list of list with all duplicated row index
 
         """
-        if key_col is None:
-            key_col = df.columns
-        else:
-            for col in key_col:
-                if col not in df.columns:
-                    raise ColumnNotFound(col, df.columns)
-        groups = df.groupby(by=key_col).groups
-        results = list()
-        for indices in groups.values():
-            if len(indices) > 1:
-                results.append(indices.to_list())
-        return results
+        positions, group_ids = cls.duplicated_group_ids(df, key_col)
+        if len(positions) == 0:
+            return []
+        order = np.argsort(group_ids, kind='stable')
+        bounds = np.flatnonzero(np.diff(group_ids[order])) + 1
+        indices = df.index.values[positions[order]]
+        return [group.tolist() for group in np.split(indices, bounds)]
 
     @classmethod
-    def orphaned_relation_check(cls, df_a: pd.DataFrame, df_b: pd.DataFrame, col_a: str, col_b: str) -> List[bool]:
+    def orphaned_relation_check(cls, df_a: pd.DataFrame, df_b: pd.DataFrame, col_a: str, col_b: str,
+                                relational_index: RelationalIndex = None) -> List[bool]:
         """
         Return all the indices of dataframe A that column a not in column b of dataframe B
 
         Args:
             df_a: dataframe A
-            df_b: dataframe B
+            df_b: dataframe B, or a foreign data variable of the relational index
             col_a: column name a
             col_b: column name b
+            relational_index: shared index of foreign tables, default is None to use a new index
 
         Returns:
             A list of indices that is orphaned
         """
-
-        if col_a not in df_a.columns:
-            raise ColumnNotFound(col_a, df_a.columns)
-        if col_b not in df_b.columns:
-            raise ColumnNotFound(col_b, df_b.columns)
-        foreign_key = set(df_b[col_b].values)
-
-        return df_a[~df_a[col_a].isin(foreign_key)].index.tolist()
+        relational_index = relational_index if relational_index is not None else RelationalIndex()
+        orphaned = relational_index.orphan_mask(df_a, col_a, df_b, col_b)
+        return df_a.index[orphaned].tolist()
 
     @classmethod
-    def unidirectional_matches(cls, df_a: pd.DataFrame, df_b: pd.DataFrame, col_a: str, col_b: str) -> List[int]:
+    def unidirectional_matches(cls, df_a: pd.DataFrame, df_b: pd.DataFrame, col_a: str, col_b: str,
+                               relational_index: RelationalIndex = None) -> List[int]:
         """
         Return for each value in column a [of dataframe A] return the number of its occurrence in column b [of dataframe B]
 
         Args:
             df_a: dataframe A
-            df_b: dataframe B
+            df_b: dataframe B, or a foreign data variable of the relational index
             col_a: column name a
             col_b: column name b
+            relational_index: shared index of foreign tables, default is None to use a new index
 
         Returns:
             A list of number indicates occurrences
         """
-        if col_a not in df_a.columns:
-            raise ColumnNotFound(col_a, df_a.columns)
-        if col_b not in df_b.columns:
-            raise ColumnNotFound(col_b, df_b.columns)
+        relational_index = relational_index if relational_index is not None else RelationalIndex()
+        return relational_index.occurrence_counts(df_a, col_a, df_b, col_b).tolist()
 
-        counter_b = Counter(df_b[col_b].values)
-        occurrences_count = []
-        for value in df_a[col_a].values:
-            if value not in counter_b.keys():
-                occurrences_count.append(0)
-            else:
-                occurrences_count.append(counter_b[value])
-        return occurrences_count
+    @classmethod
+    def bipartite_components(cls, df: pd.DataFrame, col_a: str, col_b: str) -> Tuple[pd.Series, pd.Series,
+                                                                                     np.ndarray]:
+        """
+        Label the connected components of the bipartite graph built by the distinct (a, b) pairs
+
+        Args:
+            df: dataframe
+            col_a: column name a
+            col_b: column name b
+
+        Returns:
+            a_components: a series maps each distinct value in column a to its component id
+            b_components: a series maps each distinct value in column b to its component id
+            edge_count: the number of distinct edges in each component
+        """
+        if col_a not in df.columns:
+            raise ColumnNotFound(col_a, df.columns)
+        if col_b not in df.columns:
+            raise ColumnNotFound(col_b, df.columns)
+
+        edges = df[[col_a, col_b]].dropna().drop_duplicates()
+        a_codes, a_values = pd.factorize(edges[col_a])
+        b_codes, b_values = pd.factorize(edges[col_b])
+        num_a = len(a_values)
+        num_nodes = num_a + len(b_values)
+
+        graph = coo_matrix((np.ones(len(edges), dtype=np.int8), (a_codes, b_codes + num_a)),
+                           shape=(num_nodes, num_nodes))
+        num_components, labels = connected_components(graph, directed=False)
+        edge_count = np.bincount(labels[a_codes], minlength=num_components)
+
+        return pd.Series(labels[:num_a], index=a_values), pd.Series(labels[num_a:], index=b_values), edge_count
 
     @classmethod
     def find_m_to_n_complete_matches(cls, df: pd.DataFrame, col_a: str, col_b: str) -> List[
@@ -98,6 +212,9 @@ class DataframeValidator:
         """
         Find completed matches between two entities
 
+        A connected component of the bipartite graph between column a and column b is a complete match
+        if its number of distinct edges equals m x n, with m and n the number of its nodes on each side.
+
         Args:
             df: dataframe
             col_a: column name a
@@ -106,33 +223,68 @@ class DataframeValidator:
         Returns:
             A list of tuple, each item is the indices of nodes in the completed graph
         """
-        processed_cols = [col_a, col_b]
-        copy_df = df[processed_cols].copy(deep=True)
-        copy_df = copy_df.drop_duplicates()
-        sorted_unique_a_set = [a for a, _ in
-                               sorted(copy_df[col_a].value_counts().items(), key=operator.itemgetter(1))[::-1]]
-        matches_found = []
-        processed_a = set()
-
-        for idx, value_a in enumerate(sorted_unique_a_set):
-            if value_a in processed_a:
-                continue
-            b_set = set(copy_df[copy_df[col_a] == value_a][col_b].values)  # find all the connected b
-            relevant_b = copy_df[col_b].isin(b_set)
-            back_a_set = set(copy_df[relevant_b][col_a].values)  # find all the connected a for all the b above
-            relevant_a = copy_df[col_a].isin(back_a_set)
-            back_b_set = set(copy_df[relevant_a][col_b].values)  # find all the connected b for all the a above
-            if len(b_set) == len(back_b_set) and b_set == back_b_set:
-                m = len(back_a_set)
-                n = len(back_b_set)
-                logic = relevant_a & relevant_b
-                relevant_mr = copy_df[logic]
-                copy_df = copy_df[~logic]
-                if len(relevant_mr) == m * n:
-                    matches_found.append([list(back_a_set), list(back_b_set)])
-            processed_a.update(back_a_set)
-
-        return matches_found
+        a_components, b_components, edge_count = cls.bipartite_components(df, col_a, col_b)
+        num_components = len(edge_count)
+        m = np.bincount(a_components.values, minlength=num_components)
+        n = np.bincount(b_components.values, minlength=num_components)
+        complete = np.flatnonzero(edge_count == m * n)
+        if len(complete) == 0:
+            return []
+
+        a_groups = cls._split_by_component(a_components, complete)
+        b_groups = cls._split_by_component(b_components, complete)
+        return [[a.tolist(), b.tolist()] for a, b in zip(a_groups, b_groups)]
+
+    @classmethod
+    def complete_match_shapes(cls, df: pd.DataFrame, col_a: str, col_b: str) -> Tuple[pd.DataFrame, pd.DataFrame,
+                                                                                      Dict[Tuple[int, int], int]]:
+        """
+        Assign every entity in a complete match to the (m, n) shape of its match
+
+        Args:
+            df: dataframe
+            col_a: column name a
+            col_b: column name b
+
+        Returns:
+            a_shapes: a dataframe indexed by the values in column a which are in a complete match,
+                      with columns `m` and `n`
+            b_shapes: a dataframe indexed by the values in column b which are in a complete match,
+                      with columns `m` and `n`
+            shape_count: a dict maps (m, n) to the number of complete matches of that shape
+        """
+        a_components, b_components, edge_count = cls.bipartite_components(df, col_a, col_b)
+        num_components = len(edge_count)
+        m = np.bincount(a_components.values, minlength=num_components)
+        n = np.bincount(b_components.values, minlength=num_components)
+        complete = edge_count == m * n
+
+        def shapes(components):
+            keep = complete[components.values]
+            ids = components.values[keep]
+            return pd.DataFrame({'m': m[ids], 'n': n[ids]}, index=components.index[keep])
+
+        shape_count = pd.Series(list(zip(m[complete].tolist(), n[complete].tolist())),
+                                dtype=object).value_counts(sort=False)
+        return shapes(a_components), shapes(b_components), dict(shape_count.items())
+
+    @classmethod
+    def _split_by_component(cls, components: pd.Series, selected: np.ndarray) -> List[np.ndarray]:
+        """
+        Split the node values by component id
+
+        Args:
+            components: a series maps node value to its component id
+            selected: sorted component ids to keep
+
+        Returns:
+            A list of node value arrays, one for each selected component in order
+        """
+        keep = np.isin(components.values, selected)
+        ids = components.values[keep]
+        order = np.argsort(ids, kind='stable')
+        bounds = np.searchsorted(ids[order], selected[1:])
+        return np.split(components.index.values[keep][order], bounds)
 
     @classmethod
     def relational_filter(cls, df: pd.DataFrame, relation_query: str):
@@ -146,6 +298,5 @@ class DataframeValidator:
         Returns:
             A list of true indices
         """
-
-        valid_df = df.query(relation_query)
-        return valid_df.index.to_list()
+        valid = RelationalIndex().filter_mask(df, relation_query)
+        return df.index[valid].tolist()
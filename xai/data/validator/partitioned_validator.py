@@ -0,0 +1,270 @@
+#!/usr/bin/python
+#
+# -*- coding: utf-8 -*-
+# Copyright 2019 SAP SE or an SAP affiliate company. All rights reserved
+# ============================================================================
+
+import os
+import pickle
+import shutil
+import tempfile
+from pathlib import Path
+from typing import Dict, Iterator, List
+
+import numpy as np
+import pandas as pd
+from pandas.api.types import is_bool_dtype, is_numeric_dtype
+
+from xai.data.validator.dataframe_validator import DataframeValidator
+
+DUPLICATED = 1
+ORPHANED = 2
+
+
+class PartitionedValidator:
+    """
+    Out-of-core duplication and orphan checks for a dataframe which does not fit in memory.
+
+    The main data and the foreign data are read in chunks and hash-partitioned on the key columns
+    into on-disk spill files, so that each check only holds one partition in memory at a time.
+    The result of the checks is kept as one flag byte per row in a memory-mapped file, and the
+    cleaned rows are streamed to the output file in the original order.
+    The results are the same as the in-memory checks of `DataframeValidator`.
+
+    Data can be a dataframe or a path to a csv/tsv file.
+    """
+
+    def __init__(self, data, num_partitions: int = 16, chunk_size: int = 100000, spill_dir: str = None):
+        """
+        Args:
+            data: main data, a dataframe or a path to a csv/tsv file
+            num_partitions: number of hash partitions, default is 16
+            chunk_size: number of rows read per chunk, default is 100000
+            spill_dir: directory to keep the spill files. Default is None and a temporary directory is created
+                       and removed on close.
+        """
+        self._data = data
+        self._num_partitions = num_partitions
+        self._chunk_size = chunk_size
+        self._owns_spill_dir = spill_dir is None
+        self._spill_dir = tempfile.mkdtemp(prefix='xai-spill-') if spill_dir is None else spill_dir
+        os.makedirs(self._spill_dir, exist_ok=True)
+        self._flags = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def close(self):
+        """
+        Release the row flags and remove the spill files
+        """
+        self._flags = None
+        if self._owns_spill_dir:
+            shutil.rmtree(self._spill_dir, ignore_errors=True)
+
+    @property
+    def num_rows(self) -> int:
+        """Returns the number of rows in the main data"""
+        self._ensure_flags()
+        return len(self._flags)
+
+    def _iter_chunks(self, source, columns: List[str] = None) -> Iterator[pd.DataFrame]:
+        """
+        Iterate over a data source in chunks
+        """
+        if isinstance(source, pd.DataFrame):
+            for start in range(0, len(source), self._chunk_size):
+                chunk = source.iloc[start:start + self._chunk_size]
+                yield chunk if columns is None else chunk[columns]
+        else:
+            sep = '\t' if Path(source).suffix.lower() == '.tsv' else ','
+            for chunk in pd.read_csv(str(source), sep=sep, usecols=columns, chunksize=self._chunk_size):
+                # usecols keeps the file order, while hashing depends on the column order
+                yield chunk if columns is None else chunk[columns]
+
+    @staticmethod
+    def _common_dtype(dtypes: List[np.dtype]) -> np.dtype:
+        """
+        Return the dtype of a column whose chunks or tables have the given dtypes, as if they were read at once
+        """
+        dtypes = list(dict.fromkeys(dtypes))
+        if len(dtypes) == 1:
+            return dtypes[0]
+        if all(is_numeric_dtype(dtype) and not is_bool_dtype(dtype) for dtype in dtypes):
+            return np.result_type(*dtypes)
+        return np.dtype(object)
+
+    def _column_dtypes(self, source, columns: List[str] = None) -> Dict[str, np.dtype]:
+        """
+        Return the dtypes of the columns of a data source, as if the source was read in memory.
+        A column of a csv file may be parsed as int in one chunk and float in another, e.g. if only the later
+        chunk has NaN, so the files are read once more to find the dtypes of the columns.
+        """
+        if isinstance(source, pd.DataFrame):
+            dtypes = source.dtypes if columns is None else source[columns].dtypes
+            return dict(dtypes.items())
+        chunk_dtypes = dict()
+        for chunk in self._iter_chunks(source, columns):
+            for col, dtype in chunk.dtypes.items():
+                chunk_dtypes.setdefault(col, []).append(dtype)
+        return {col: self._common_dtype(dtypes) for col, dtypes in chunk_dtypes.items()}
+
+    @staticmethod
+    def _conform(frame, dtypes: Dict[str, np.dtype]):
+        """
+        Cast the columns of a chunk whose dtype differs from the dtype of the whole column
+        """
+        if isinstance(frame, pd.Series):
+            return frame if frame.dtype == dtypes[frame.name] else frame.astype(dtypes[frame.name])
+        differ = {col: dtype for col, dtype in dtypes.items() if frame[col].dtype != dtype}
+        return frame.astype(differ) if differ else frame
+
+    def _spill(self, name: str, frames: Iterator):
+        """
+        Append (hashes, frame) pairs to the partition files of a pass
+        """
+        handles = [open(self._partition_path(name, p), 'wb') for p in range(self._num_partitions)]
+        try:
+            for hashes, frame in frames:
+                partition_ids = (hashes % np.uint64(self._num_partitions)).astype(np.int64)
+                for p, part in frame.groupby(partition_ids):
+                    pickle.dump(part, handles[p], protocol=pickle.HIGHEST_PROTOCOL)
+        finally:
+            for handle in handles:
+                handle.close()
+
+    def _partition_path(self, name: str, partition: int) -> str:
+        return os.path.join(self._spill_dir, '%s-%d.pkl' % (name, partition))
+
+    def _load_partition(self, name: str, partition: int, columns: List[str]) -> pd.DataFrame:
+        """
+        Load and remove one partition file of a pass
+        """
+        path = self._partition_path(name, partition)
+        parts = []
+        with open(path, 'rb') as handle:
+            while True:
+                try:
+                    parts.append(pickle.load(handle))
+                except EOFError:
+                    break
+        os.remove(path)
+        if len(parts) == 0:
+            return pd.DataFrame(columns=columns)
+        return pd.concat(parts, ignore_index=True)
+
+    def _init_flags(self, num_rows: int):
+        self._flags = np.memmap(os.path.join(self._spill_dir, 'flags.bin'), dtype=np.uint8, mode='w+',
+                                shape=(max(num_rows, 1),))[:num_rows]
+        self._flags[:] = 0
+
+    def _ensure_flags(self):
+        if self._flags is None:
+            self._init_flags(sum(len(chunk) for chunk in self._iter_chunks(self._data)))
+
+    def duplication_check(self, key_col: List[str] = None) -> int:
+        """
+        Flag the duplicated rows, only the first seen row of each duplicated group is kept
+
+        Args:
+            key_col: a list of column names to check the duplicates, default is all columns
+
+        Returns:
+            The number of duplicated rows to drop
+        """
+        dtypes = self._column_dtypes(self._data, key_col)
+        key_col = list(dtypes)
+        num_rows = [0]
+
+        def hashed_rows():
+            for chunk in self._iter_chunks(self._data, key_col):
+                chunk = self._conform(chunk, dtypes)
+                hashes = DataframeValidator.row_hashes(chunk, key_col)
+                rows = np.arange(num_rows[0], num_rows[0] + len(chunk), dtype=np.int64)
+                num_rows[0] += len(chunk)
+                # the key columns are spilled by position, so that they do not clash with the row column
+                part = chunk.rename(columns={col: idx for idx, col in enumerate(key_col)})
+                yield hashes, part.reset_index(drop=True).assign(row=rows)
+
+        self._spill('duplication', hashed_rows())
+        self._init_flags(num_rows[0])
+
+        for p in range(self._num_partitions):
+            part = self._load_partition('duplication', p, columns=list(range(len(key_col))) + ['row'])
+            # chunks are spilled in order, so the rows in a partition are in ascending order
+            duplicated = DataframeValidator.duplication_drop_mask(part, list(range(len(key_col))))
+            self._flags[part['row'].values[duplicated].astype(np.int64)] |= DUPLICATED
+
+        self._flags.flush()
+        return int(np.count_nonzero(self._flags & DUPLICATED))
+
+    def orphaned_relation_check(self, local_key: str, foreign_data, foreign_key: str) -> int:
+        """
+        Flag the rows that are not duplicated and of which the local key is not in the foreign key column
+
+        Args:
+            local_key: column name in the main data
+            foreign_data: foreign data, a dataframe or a path to a csv/tsv file
+            foreign_key: column name in the foreign data
+
+        Returns:
+            The number of orphaned rows for this rule
+        """
+        self._ensure_flags()
+        local_dtypes = self._column_dtypes(self._data, [local_key])
+        foreign_dtypes = self._column_dtypes(foreign_data, [foreign_key])
+        # equal local and foreign keys land in the same partition, e.g. an int and a float key,
+        # while the keys are compared in their own dtype within a partition
+        hash_dtype = self._common_dtype([local_dtypes[local_key], foreign_dtypes[foreign_key]])
+
+        def key_hashes(keys: pd.Series) -> np.ndarray:
+            keys = keys if keys.dtype == hash_dtype else keys.astype(hash_dtype)
+            return pd.util.hash_pandas_object(keys, index=False).values
+
+        def local_keys():
+            offset = 0
+            for chunk in self._iter_chunks(self._data, [local_key]):
+                rows = np.arange(offset, offset + len(chunk), dtype=np.int64)
+                offset += len(chunk)
+                keep = (self._flags[rows] & DUPLICATED) == 0
+                keys = self._conform(chunk[local_key][keep], local_dtypes)
+                yield key_hashes(keys), pd.DataFrame({'row': rows[keep], 'key': keys.values})
+
+        def foreign_keys():
+            for chunk in self._iter_chunks(foreign_data, [foreign_key]):
+                keys = self._conform(chunk[foreign_key].drop_duplicates(), foreign_dtypes)
+                yield key_hashes(keys), pd.DataFrame({'key': keys.values})
+
+        self._spill('local', local_keys())
+        self._spill('foreign', foreign_keys())
+
+        orphan_count = 0
+        for p in range(self._num_partitions):
+            local = self._load_partition('local', p, columns=['row', 'key'])
+            foreign = self._load_partition('foreign', p, columns=['key'])
+            orphaned = ~local['key'].isin(foreign['key'].unique()).values
+            self._flags[local['row'].values[orphaned].astype(np.int64)] |= ORPHANED
+            orphan_count += int(np.count_nonzero(orphaned))
+
+        self._flags.flush()
+        return orphan_count
+
+    def write(self, path: str, drop_orphans: bool = True):
+        """
+        Stream the rows that are kept by the checks to a csv file, in the original order
+
+        Args:
+            path: output csv file path
+            drop_orphans: drop the orphaned rows as well as the duplicated rows, default is True
+        """
+        self._ensure_flags()
+        drop = DUPLICATED | ORPHANED if drop_orphans else DUPLICATED
+        offset = 0
+        with open(path, 'w', newline='') as handle:
+            for chunk in self._iter_chunks(self._data):
+                keep = (self._flags[offset:offset + len(chunk)] & drop) == 0
+                chunk[keep].to_csv(handle, header=(offset == 0))
+                offset += len(chunk)
@@ -0,0 +1,166 @@
+#!/usr/bin/python
+#
+# -*- coding: utf-8 -*-
+# Copyright 2019 SAP SE or an SAP affiliate company. All rights reserved
+# ============================================================================
+
+from typing import Callable, Dict, Tuple
+
+import numpy as np
+import pandas as pd
+
+from xai.data.exceptions import ColumnNotFound
+
+
+class RelationalIndex:
+    """
+    Shared index for relational checks between a local dataframe and foreign tables.
+
+    Each foreign file is loaded once and each (file, column) key index is built once, so
+    multiple orphan, unidirectional-count and relational-filter rules against the same
+    foreign file reuse the same build. Dataframes may be modified in place between calls,
+    so their key indices and factorized local columns are only shared by the rules of a
+    single `orphan_rules_mask` call. Every rule is answered by looking up the distinct
+    local values only.
+    """
+
+    def __init__(self, loader: Callable = None):
+        """
+        Args:
+            loader: function maps a foreign data variable (e.g. file path) to a dataframe.
+                    Default is None and dataframes are used as is, strings are read as csv files.
+        """
+        self._loader = loader
+        self._tables = dict()
+        self._key_counts = dict()
+
+    def table(self, source) -> pd.DataFrame:
+        """
+        Return the foreign table, loading a file on first access
+
+        Args:
+            source: foreign data variable, a file path or a dataframe
+
+        Returns:
+            The foreign dataframe
+        """
+        if not isinstance(source, str):
+            return source
+        if source not in self._tables:
+            if self._loader is not None:
+                self._tables[source] = self._loader(source)
+            else:
+                self._tables[source] = pd.read_csv(source)
+        return self._tables[source]
+
+    def key_counts(self, source, column: str, scope: Dict = None) -> pd.Series:
+        """
+        Return the number of occurrences of each distinct key in a foreign column
+
+        Args:
+            source: foreign data variable, a file path or a dataframe
+            column: column name in the foreign table
+            scope: cache of the current call for dataframe sources, default is None to not cache them
+
+        Returns:
+            A series indexed by the distinct keys, NaN keys are counted as well
+        """
+        if isinstance(source, str):
+            cache, key = self._key_counts, (source, column)
+        else:
+            # the scope keeps the dataframe referenced, so its id is not reused during the call
+            cache, key = scope if scope is not None else dict(), (id(source), column)
+        if key not in cache:
+            df = self.table(source)
+            if column not in df.columns:
+                raise ColumnNotFound(column, df.columns)
+            cache[key] = (df, df[column].value_counts(dropna=False))
+        return cache[key][1]
+
+    @staticmethod
+    def _factorize(df: pd.DataFrame, column: str, scope: Dict = None) -> Tuple[np.ndarray, pd.Index]:
+        """
+        Factorize a local column, once per call with a scope
+        """
+        cache, key = scope if scope is not None else dict(), ('local', id(df), column)
+        if key not in cache:
+            if column not in df.columns:
+                raise ColumnNotFound(column, df.columns)
+            codes, uniques = pd.factorize(df[column])
+            cache[key] = (df, codes, pd.Index(uniques))
+        _, codes, uniques = cache[key]
+        return codes, uniques
+
+    def occurrence_counts(self, df: pd.DataFrame, column: str, source, foreign_column: str,
+                          scope: Dict = None) -> np.ndarray:
+        """
+        Return for each row in the local dataframe the number of occurrences of its key in the foreign column
+
+        Args:
+            df: local dataframe
+            column: column name in the local dataframe
+            source: foreign data variable, a file path or a dataframe
+            foreign_column: column name in the foreign table
+            scope: cache of the current call for dataframes, default is None to not cache them
+
+        Returns:
+            An int64 array with one count per local row
+        """
+        codes, uniques = self._factorize(df, column, scope)
+        counts = self.key_counts(source, foreign_column, scope)
+        unique_counts = counts.reindex(uniques).fillna(0).values.astype(np.int64)
+        nan_count = int(counts[counts.index.isna()].sum())
+        # factorize marks missing values with -1, which picks the trailing NaN count
+        return np.append(unique_counts, nan_count)[codes]
+
+    def orphan_mask(self, df: pd.DataFrame, column: str, source, foreign_column: str,
+                    scope: Dict = None) -> np.ndarray:
+        """
+        Return for each row in the local dataframe whether its key is missing in the foreign column
+
+        Args:
+            df: local dataframe
+            column: column name in the local dataframe
+            source: foreign data variable, a file path or a dataframe
+            foreign_column: column name in the foreign table
+            scope: cache of the current call for dataframes, default is None to not cache them
+
+        Returns:
+            A boolean array, True if the row is orphaned
+        """
+        return self.occurrence_counts(df, column, source, foreign_column, scope) == 0
+
+    def filter_mask(self, source, relation_query: str) -> np.ndarray:
+        """
+        Return for each row in the table whether the query is satisfied
+
+        Args:
+            source: data variable, a file path or a dataframe
+            relation_query: a relational query returns a bool
+
+        Returns:
+            A boolean array, True if the row satisfies the query
+        """
+        df = self.table(source)
+        return np.asarray(df.eval(relation_query), dtype=bool)
+
+    def orphan_rules_mask(self, df: pd.DataFrame, rules: list) -> Tuple[np.ndarray, Dict[int, int]]:
+        """
+        Apply a list of orphan rules on the local dataframe
+
+        Args:
+            df: local dataframe
+            rules: a list of dict object with keys `local_key`, `foreign_data` and `foreign_key`
+
+        Returns:
+            A boolean array, True if the row is orphaned by any rule
+            A dict maps the rule position to its number of orphaned rows
+        """
+        all_orphaned = np.zeros(len(df), dtype=bool)
+        orphan_count = dict()
+        scope = dict()
+        for idx, rule in enumerate(rules):
+            orphaned = self.orphan_mask(df, rule['local_key'], rule['foreign_data'], rule['foreign_key'], scope)
+            orphan_count[idx] = int(orphaned.sum())
+            all_orphaned |= orphaned
+        return all_orphaned, orphan_count
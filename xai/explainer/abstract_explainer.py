@@ -5,7 +5,10 @@
 
 from abc import ABC, abstractmethod
 
-from typing import Dict
+import numpy as np
+from typing import Dict, List
+
+from xai.explainer.batch import DEFAULT_BATCH_SIZE
 
 
 class AbstractExplainer(ABC):
@@ -36,17 +39,50 @@ class AbstractExplainer(ABC):
             **kwargs (dict): keyword arguments for calling the explanation method
 
         Returns:
-            A dictionary that maps a class index to explanations
+            A dictionary that maps a class index to explanations, e.g. a `CompactExplanation`
         """
         raise NotImplementedError("Derived class should implement this")
 
+    def explain_instances(self, instances: List, batch_size: int = DEFAULT_BATCH_SIZE, **kwargs) -> List[Dict]:
+        """
+        Explain a batch of instances using the AbstractExplainer.
+        Explainers which call a predict function should override it to batch the model calls
+        across instances, the default implementation explains one instance at a time.
+
+        Args:
+            instances (list): A list of instances, each of the format accepted by `explain_instance`
+            batch_size (int): Maximum number of rows in a single call of the predict function
+            **kwargs (dict): keyword arguments for calling the explanation method
+
+        Returns:
+            A list of explanations, one for each instance, in the format of `explain_instance`
+        """
+        return [self.explain_instance(instance=instance, **kwargs) for instance in instances]
+
+    def set_random_state(self, seed: int):
+        """
+        Seed the random numbers of the next explanations, e.g. to explain each instance with its own seed.
+        The default implementation seeds the global numpy random generator, explainers which keep
+        their own random state should override it. `xai.explainer.parallel.explain_in_parallel` restores
+        the global numpy random state after the explanations.
+
+        Args:
+            seed (int): the random seed
+
+        Returns:
+            None
+        """
+        np.random.seed(seed)
+
     @abstractmethod
-    def save_explainer(self, path: str):
+    def save_explainer(self, path: str, compact: bool = False):
         """
         Saves the explainer to disk.
 
         Args:
             path (str): Path to which the explainer is stored
+            compact (bool): Whether to save in the compact format of `xai.explainer.serialization.save_compact`,
+                which is loaded with memory-mapped arrays
 
         Returns:
             None
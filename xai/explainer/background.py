@@ -0,0 +1,126 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+# Copyright 2019 SAP SE or an SAP affiliate company. All rights reserved
+# ============================================================================
+
+from typing import Callable, Optional, Tuple, Any
+
+import numpy as np
+import shap
+
+from xai.explainer.batch import DEFAULT_BATCH_SIZE, predict_in_batches
+from xai.explainer.constants import BACKGROUND
+from xai.explainer.feature_groups import FeatureGroups
+
+try:
+    from shap.utils._legacy import DenseData
+except ImportError:
+    from shap.common import DenseData
+
+DEFAULT_ERROR_SAMPLE_SIZE = 1000
+
+
+def summarize_background(training_data: np.ndarray,
+                         size: int,
+                         method: str = BACKGROUND.KMEANS,
+                         training_labels: Optional[Any] = None,
+                         random_state: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Summarize the training data into a small weighted background dataset
+
+    Args:
+        training_data (np.ndarray): 2D numpy array of the training data
+        size (int): Number of rows in the background dataset
+        method (str): Summarization method
+            - kmeans: k-means centroids, rounded to values seen in the data and weighted by cluster size
+            - stratified: random sample of each label in `training_labels`, with at least one row per label
+                and weighted by the label frequency
+            - sample: random sample with equal weights
+        training_labels (list): Labels of the training data, used by the stratified method
+        random_state (int): The random seed of the sampling methods
+
+    Returns:
+        The background data as a 2D numpy array
+        The weights of the background rows, which sum to one
+    """
+    training_data = np.asarray(training_data)
+    if size >= len(training_data):
+        return training_data, np.full(len(training_data), 1.0 / len(training_data))
+
+    rng = np.random.RandomState(random_state)
+    if method == BACKGROUND.KMEANS:
+        summary = shap.kmeans(training_data, size)
+        data, weights = summary.data, summary.weights
+    elif method == BACKGROUND.STRATIFIED:
+        if training_labels is None:
+            raise ValueError('Training labels are required for stratified background sampling')
+        labels, codes, counts = np.unique(np.asarray(training_labels), return_inverse=True, return_counts=True)
+        allocation = np.maximum(1, np.round(size * counts / counts.sum()).astype(int))
+        allocation = np.minimum(allocation, counts)
+        indices, weights = [], []
+        for code in range(len(labels)):
+            members = np.flatnonzero(codes == code)
+            indices.append(rng.choice(members, allocation[code], replace=False))
+            weights.append(np.full(allocation[code], counts[code] / allocation[code]))
+        data, weights = training_data[np.concatenate(indices)], np.concatenate(weights)
+    elif method == BACKGROUND.SAMPLE:
+        data, weights = training_data[rng.choice(len(training_data), size, replace=False)], np.ones(size)
+    else:
+        raise ValueError('Background method must be one of {}'.format(
+            [BACKGROUND.KMEANS, BACKGROUND.STRATIFIED, BACKGROUND.SAMPLE]))
+
+    return data, np.asarray(weights, dtype=np.float64) / np.sum(weights)
+
+
+def background_error(predict_fn: Callable,
+                     training_data: np.ndarray,
+                     background_data: np.ndarray,
+                     background_weights: np.ndarray,
+                     batch_size: int = DEFAULT_BATCH_SIZE,
+                     sample_size: int = DEFAULT_ERROR_SAMPLE_SIZE,
+                     random_state: Optional[int] = None) -> float:
+    """
+    Estimate the attribution error of a summarized background.
+
+    The attributions of an instance sum up to its model output minus the expected output over the
+    background, so the difference between the expected output over the summary and over the full
+    training data is the error of the summed attributions, for every instance. The expected output over
+    the training data is estimated on a random sample of at most `sample_size` rows, so that building
+    the explainer does not predict the full training data.
+
+    Args:
+        predict_fn (Callable): Model prediction function
+        training_data (np.ndarray): 2D numpy array of the full training data
+        background_data (np.ndarray): 2D numpy array of the background data
+        background_weights (np.ndarray): Weights of the background rows
+        batch_size (int): Maximum number of rows in a single call of `predict_fn`
+        sample_size (int): Maximum number of training rows to predict
+        random_state (int): The random seed of the training sample
+
+    Returns:
+        The largest absolute error of the expected output, over all model outputs
+    """
+    training_data = np.asarray(training_data)
+    if len(training_data) > sample_size:
+        rng = np.random.RandomState(random_state)
+        training_data = training_data[rng.choice(len(training_data), sample_size, replace=False)]
+    training_output, background_output = predict_in_batches(predict_fn, [training_data,
+                                                                          np.asarray(background_data)],
+                                                             batch_size=batch_size)
+    full_expectation = training_output.reshape(len(training_output), -1).mean(axis=0)
+    summary_expectation = np.average(background_output.reshape(len(background_output), -1), axis=0,
+                                     weights=background_weights)
+    return float(np.max(np.abs(full_expectation - summary_expectation)))
+
+
+def to_dense_data(background_data: np.ndarray, background_weights: np.ndarray,
+                  feature_groups: Optional[FeatureGroups] = None) -> DenseData:
+    """
+    Wrap a weighted background into the data format of shap.KernelExplainer,
+    with the groups of columns which are attributed as single features
+    """
+    if feature_groups is not None:
+        return DenseData(background_data, feature_groups.names, feature_groups.columns,
+                         np.asarray(background_weights, dtype=np.float64))
+    group_names = [str(idx) for idx in range(background_data.shape[1])]
+    return DenseData(background_data, group_names, None, background_weights)
@@ -0,0 +1,126 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+# Copyright 2019 SAP SE or an SAP affiliate company. All rights reserved
+# ============================================================================
+
+from typing import List, Dict, Callable, Any, Optional
+
+import numpy as np
+
+DEFAULT_BATCH_SIZE = 10000
+
+
+class _PredictionRequired(Exception):
+    """
+    Raised by the replaying predict function when an explanation needs a model output that is not yet known
+    """
+
+    def __init__(self, data):
+        Exception.__init__(self, 'Prediction required')
+        self.data = data
+
+
+def _num_rows(data) -> int:
+    return data.shape[0] if hasattr(data, 'shape') else len(data)
+
+
+def _concatenate(inputs: List):
+    if isinstance(inputs[0], np.ndarray):
+        return np.concatenate(inputs, axis=0)
+    return [row for data in inputs for row in data]
+
+
+def predict_in_batches(predict_fn: Callable, inputs: List, batch_size: int = DEFAULT_BATCH_SIZE) -> List[np.ndarray]:
+    """
+    Concatenate several model inputs, predict them in calls of at most `batch_size` rows,
+    and split the outputs back
+
+    Args:
+        predict_fn (Callable): model prediction function
+        inputs (list): a list of model inputs, each is a 2D numpy array or a list of rows
+        batch_size (int): maximum number of rows in a single call of `predict_fn`
+
+    Returns:
+        (list) Model outputs, one for each input
+    """
+    if len(inputs) == 0:
+        return []
+    lengths = [_num_rows(data) for data in inputs]
+    data = _concatenate(inputs)
+    total = sum(lengths)
+    outputs = [np.asarray(predict_fn(data[start:start + batch_size])) for start in range(0, total, batch_size)]
+    outputs = np.concatenate(outputs, axis=0)
+    return np.split(outputs, np.cumsum(lengths)[:-1])
+
+
+def explain_in_batches(explain_fn: Callable[[Any, Callable], Dict],
+                       instances: List,
+                       predict_fn: Callable,
+                       batch_size: int = DEFAULT_BATCH_SIZE,
+                       random_state: Optional[Any] = None,
+                       seed_each: bool = False) -> List[Dict]:
+    """
+    Explain a batch of instances with batched model calls.
+
+    The explanation of each instance is run with a replaying predict function, which serves the model
+    outputs already known for that instance and stops the explanation at the first unknown model call.
+    The inputs of these calls are gathered over all the instances and predicted together, and the rounds
+    are repeated until all explanations are finished. The random state is restored for each instance before
+    every round, so that the perturbations are the same in every round.
+
+    The explanations are the same as explaining one instance at a time only if the explainer draws all its
+    random numbers before its first model call, as LIME does. Other explainers, e.g. SHAP which predicts the
+    instance first, use `seed_each`: a seed is drawn for each instance in order, and the random state is
+    seeded with it before every round of the instance, so that the explanations are reproducible and do not
+    depend on the batching.
+
+    Args:
+        explain_fn (Callable): function takes an instance and a predict function, returns the explanation
+        instances (list): instances to explain
+        predict_fn (Callable): model prediction function
+        batch_size (int): maximum number of rows in a single call of `predict_fn`
+        random_state: object with `get_state`, `set_state`, `seed` and `randint`, which the explainer draws
+            perturbations from, e.g. numpy.random.RandomState or the numpy.random module
+        seed_each (bool): seed the random state for each instance, default is False
+
+    Returns:
+        (list) Explanations in the same format as `explain_fn`, one for each instance
+    """
+    explanations = [None] * len(instances)
+    outputs = [[] for _ in instances]
+    states = [None] * len(instances)
+    pending = list(range(len(instances)))
+    seeds = None
+    if random_state is not None and seed_each:
+        seeds = random_state.randint(np.iinfo(np.int32).max, size=len(instances))
+
+    while len(pending) > 0:
+        requests = dict()
+        for idx in pending:
+            if seeds is not None:
+                random_state.seed(seeds[idx])
+            elif random_state is not None:
+                if states[idx] is None:
+                    states[idx] = random_state.get_state()
+                else:
+                    random_state.set_state(states[idx])
+
+            known_outputs = iter(outputs[idx])
+
+            def replay_fn(data, known_outputs=known_outputs):
+                output = next(known_outputs, None)
+                if output is None:
+                    raise _PredictionRequired(data)
+                return output
+
+            try:
+                explanations[idx] = explain_fn(instances[idx], replay_fn)
+            except _PredictionRequired as request:
+                requests[idx] = request.data
+
+        pending = list(requests.keys())
+        predictions = predict_in_batches(predict_fn, [requests[idx] for idx in pending], batch_size=batch_size)
+        for idx, prediction in zip(pending, predictions):
+            outputs[idx].append(prediction)
+
+    return explanations
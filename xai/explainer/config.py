@@ -5,7 +5,10 @@
 
 from xai.explainer.constants import DOMAIN, ALG
 from xai.explainer.tabular.lime_tabular_explainer import LimeTabularExplainer
+from xai.explainer.tabular.linear_tabular_explainer import LinearTabularExplainer
+from xai.explainer.tabular.native_lime_tabular_explainer import NativeLimeTabularExplainer
 from xai.explainer.tabular.shap_tabular_explainer import SHAPTabularExplainer
+from xai.explainer.tabular.tree_shap_tabular_explainer import TreeSHAPTabularExplainer
 from xai.explainer.text.lime_text_explainer import LimeTextExplainer
 
 DICT_DOMAIN_TO_CLASS = {
@@ -14,7 +17,10 @@ DICT_DOMAIN_TO_CLASS = {
     },
     DOMAIN.TABULAR: {
         ALG.LIME: LimeTabularExplainer,
-        ALG.SHAP: SHAPTabularExplainer
+        ALG.SHAP: SHAPTabularExplainer,
+        ALG.NATIVE_LIME: NativeLimeTabularExplainer,
+        ALG.TREE_SHAP: TreeSHAPTabularExplainer,
+        ALG.LINEAR: LinearTabularExplainer
     }
 }
 
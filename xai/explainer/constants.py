@@ -17,6 +17,17 @@ class ALG:
     """
     LIME = 'lime'
     SHAP = 'shap'
+    NATIVE_LIME = 'native_lime'
+    TREE_SHAP = 'tree_shap'
+    LINEAR = 'linear'
+
+class BACKGROUND:
+    """
+    Summarization methods for the background data of SHAP
+    """
+    KMEANS = 'kmeans'
+    STRATIFIED = 'stratified'
+    SAMPLE = 'sample'
 
 class MODE:
     """
@@ -30,3 +41,5 @@ class OUTPUT:
     EXPLANATION = 'explanation'
     FEATURE = 'feature'
     SCORE = 'score'
+    NUM_SAMPLES = 'num_samples'
+    SEGMENTS = 'segments'
@@ -38,3 +38,13 @@ class UnsupportedModeError(Exception):
     def __init__(self, message):
         Exception.__init__(self, message)
         self.message = message
+
+
+class ExplainerNotFound(Exception):
+    """
+    Raised when an explanation is requested from an explainer which is not served
+    """
+    def __init__(self, name):
+        message = 'Explainer {} is not served.'.format(name)
+        Exception.__init__(self, message)
+        self.message = message
@@ -0,0 +1,201 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+# Copyright 2019 SAP SE or an SAP affiliate company. All rights reserved
+# ============================================================================
+
+from typing import Dict, List, Optional, Any, Iterator, Tuple, Hashable
+
+import numpy as np
+
+from xai.explainer.constants import MODE, OUTPUT
+
+
+class FeatureTable:
+    """
+    Table of the feature names of explanations, which refer to a feature by its index in the table.
+    A table only grows, so the explainers create a new table for each call or batch of explanations,
+    as the feature names of some explainers contain the feature values, e.g. 'age = 37.5'.
+    """
+
+    def __init__(self, names: Optional[List[Hashable]] = None):
+        """
+        Args:
+            names (list): The initial feature names
+        """
+        self.names = []
+        self._index = dict()
+        for name in names or []:
+            self.index(name)
+
+    def index(self, name: Hashable) -> int:
+        """
+        Get the index of a feature name, and add the name to the table if it is new
+
+        Args:
+            name: The feature name
+
+        Returns:
+            (int) The index of the feature name
+        """
+        idx = self._index.get(name)
+        if idx is None:
+            idx = self._index[name] = len(self.names)
+            self.names.append(name)
+        return idx
+
+    def indices(self, names: List[Hashable]) -> np.ndarray:
+        """
+        Get the indices of feature names, see `index`
+
+        Args:
+            names (list): The feature names
+
+        Returns:
+            (np.ndarray) The indices of the feature names
+        """
+        return np.array([self.index(name) for name in names], dtype=np.int64)
+
+    def __len__(self):
+        return len(self.names)
+
+    def __getitem__(self, idx: int) -> Hashable:
+        return self.names[idx]
+
+
+class CompactExplanation(dict):
+    """
+    Explanation of an instance as arrays: for each label, the indices of the features in a shared
+    `FeatureTable` and their scores.
+
+    It is a dict with the JSON schema of `xai.explainer.utils.explanation_to_json`, i.e. class index to
+    prediction and list of feature scores for classification, and prediction and list of feature scores for
+    regression, so it can be serialized and modified like the explanations of the other explainers.
+    `ExplanationAggregator` and `ExplanationStore` read the arrays directly, which are not updated when
+    the dict is modified.
+    """
+
+    def __init__(self, feature_table: FeatureTable, labels: Optional[List[Any]], predictions: List[Any],
+                 indices: List[np.ndarray], scores: List[np.ndarray], mode: str = MODE.CLASSIFICATION,
+                 info: Optional[Dict[str, Any]] = None):
+        """
+        Args:
+            feature_table (FeatureTable): The table of the feature names
+            labels (list): The explained labels, None for regression
+            predictions (list): The prediction of each label, or a single prediction for regression
+            indices (list): The feature indices of each label, or a single array for regression
+            scores (list): The feature scores of each label, or a single array for regression
+            mode (str): Regression or classification
+            info (dict): Additional entries of the explanation of each label, e.g. `OUTPUT.NUM_SAMPLES`
+        """
+        super(CompactExplanation, self).__init__()
+        self.feature_table = feature_table
+        self.mode = mode
+        self.labels = list(labels) if mode == MODE.CLASSIFICATION else [None]
+        self.predictions = list(predictions)
+        self.indices = [np.asarray(idx, dtype=np.int64) for idx in indices]
+        self.scores = [np.asarray(score, dtype=np.float64) for score in scores]
+        self.info = dict()
+        if self.mode != MODE.CLASSIFICATION:
+            self.update(self._label_json(0))
+        else:
+            for position, label in enumerate(self.labels):
+                self[label] = self._label_json(position)
+        self.add_info(info or {})
+
+    @classmethod
+    def from_lists(cls, feature_table: FeatureTable, label_explanations: Dict[Any, Tuple[Any, List[Tuple]]],
+                   mode: str = MODE.CLASSIFICATION, sort: bool = True) -> 'CompactExplanation':
+        """
+        Create an explanation from lists of (feature name, score) pairs
+
+        Args:
+            feature_table (FeatureTable): The table of the feature names
+            label_explanations (dict): Maps each label to its prediction and its list of (feature name, score) pairs,
+                with the single label None for regression
+            mode (str): Regression or classification
+            sort (bool): Sort the features by descending score, default True
+
+        Returns:
+            (CompactExplanation) The explanation
+        """
+        predictions, indices, scores = [], [], []
+        for prediction, pairs in label_explanations.values():
+            names = [name for name, _ in pairs]
+            label_scores = np.array([score for _, score in pairs], dtype=np.float64)
+            label_indices = feature_table.indices(names)
+            if sort:
+                order = np.argsort(-label_scores, kind='stable')
+                label_indices, label_scores = label_indices[order], label_scores[order]
+            predictions.append(prediction)
+            indices.append(label_indices)
+            scores.append(label_scores)
+        return cls(feature_table, list(label_explanations.keys()), predictions, indices, scores, mode=mode)
+
+    def add_info(self, info: Dict[str, Any]):
+        """
+        Add entries to the explanation of each label, e.g. `OUTPUT.NUM_SAMPLES`
+
+        Args:
+            info (dict): The additional entries
+
+        Returns:
+            None
+        """
+        self.info.update(info)
+        if self.mode != MODE.CLASSIFICATION:
+            self.update(info)
+        else:
+            for label in self.labels:
+                self[label].update(info)
+
+    def arrays(self) -> Iterator[Tuple[Any, Any, np.ndarray, np.ndarray]]:
+        """
+        Iterate over the label, prediction, feature indices and scores of each explained label,
+        with the label None for regression
+        """
+        return zip(self.labels, self.predictions, self.indices, self.scores)
+
+    def _label_json(self, position: int) -> Dict:
+        names = self.feature_table.names
+        return {
+            OUTPUT.PREDICTION: self.predictions[position],
+            OUTPUT.EXPLANATION: [{OUTPUT.FEATURE: names[idx], OUTPUT.SCORE: score}
+                                 for idx, score in zip(self.indices[position].tolist(),
+                                                       self.scores[position].tolist())]
+        }
+
+    def to_json(self) -> Dict:
+        """
+        Convert to the JSON schema of `xai.explainer.utils.explanation_to_json`
+
+        Returns:
+            (dict) The explanation as a plain dictionary
+        """
+        return dict(self)
+
+    def _state(self) -> Dict:
+        # only the names of the features used, not the shared table
+        used, positions = np.unique(np.concatenate(self.indices + [np.zeros(0, dtype=np.int64)]),
+                                    return_inverse=True)
+        sizes = np.cumsum([0] + [len(idx) for idx in self.indices])
+        return {
+            'names': [self.feature_table.names[idx] for idx in used.tolist()],
+            'mode': self.mode,
+            'labels': self.labels,
+            'predictions': self.predictions,
+            'indices': [positions[start:end] for start, end in zip(sizes[:-1], sizes[1:])],
+            'scores': self.scores,
+            'info': self.info
+        }
+
+    def __reduce__(self):
+        # pickle the arrays, the dict is rebuilt from them
+        return _from_state, (self._state(),)
+
+    def __repr__(self):
+        return 'CompactExplanation(%s)' % super(CompactExplanation, self).__repr__()
+
+
+def _from_state(state: Dict) -> CompactExplanation:
+    return CompactExplanation(FeatureTable(state['names']), state['labels'], state['predictions'], state['indices'],
+                              state['scores'], mode=state['mode'], info=state['info'])
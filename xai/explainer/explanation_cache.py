@@ -0,0 +1,302 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+# Copyright 2019 SAP SE or an SAP affiliate company. All rights reserved
+# ============================================================================
+
+import hashlib
+import os
+import pickle
+import struct
+import types
+import warnings
+from collections import OrderedDict
+from typing import Callable, Dict, List, Any, Optional
+
+import dill
+import numpy as np
+
+from xai.explainer.helper import get_model
+from xai.explainer.prediction_cache import hash_rows
+
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+STORE_FILE = 'explanations.log'
+
+# each record is the 16 byte key, the length of the payload, then the pickled explanation
+_HEADER = struct.Struct('<16sI')
+
+
+def fingerprint(obj: Any) -> bytes:
+    """
+    Hash an object by its content, e.g. a model, a parameter dict or the training data
+
+    Args:
+        obj: the object to hash. Dicts are hashed independent of the key order.
+
+    Returns:
+        A 16 byte digest. Objects which cannot be pickled are hashed by their identity, which is
+        only stable within the process, so the explanations are not reused across runs.
+        Functions are hashed by their code and the objects they refer to, see `_function_state`.
+    """
+    hasher = hashlib.blake2b(digest_size=16)
+    if isinstance(obj, types.FunctionType):
+        # a module-level function is pickled by reference, which misses e.g. a retrained global model
+        hasher.update(fingerprint(_function_state(obj)))
+    elif isinstance(obj, dict):
+        for key in sorted(obj, key=str):
+            hasher.update(str(key).encode('utf-8'))
+            hasher.update(fingerprint(obj[key]))
+    elif isinstance(obj, np.ndarray) and obj.dtype != object:
+        hasher.update(obj.dtype.str.encode() + str(obj.shape).encode())
+        hasher.update(np.ascontiguousarray(obj).tobytes())
+    else:
+        try:
+            hasher.update(dill.dumps(obj))
+        except Exception:
+            warnings.warn(message='%s cannot be pickled, the explanations are only cached within '
+                                  'this process' % type(obj).__name__)
+            hasher.update(('%s@%s' % (type(obj).__name__, id(obj))).encode())
+    return hasher.digest()
+
+
+def _referenced_names(code: types.CodeType) -> List[str]:
+    """
+    Return the global names used by a code object and the code objects nested in it
+    """
+    names = list(code.co_names)
+    for const in code.co_consts:
+        if isinstance(const, types.CodeType):
+            names.extend(_referenced_names(const))
+    return names
+
+
+def _function_state(fn: types.FunctionType, _seen: Optional[set] = None) -> Dict[str, Any]:
+    """
+    Return what determines the result of a function: its code, defaults, closure and the global
+    objects it refers to, e.g. the model of `lambda x: model.predict_proba(x)`
+
+    Args:
+        fn: the function
+
+    Returns:
+        A dict with the content of the function. Referenced functions are expanded in turn, modules are
+        left out, and recursive references are replaced by the name of the function.
+    """
+    _seen = set() if _seen is None else _seen
+    _seen.add(id(fn))
+
+    def expand(value):
+        if isinstance(value, types.FunctionType):
+            return value.__qualname__ if id(value) in _seen else _function_state(value, _seen)
+        return value
+
+    code = fn.__code__
+    referenced = {name: expand(fn.__globals__[name]) for name in sorted(set(_referenced_names(code)))
+                  if name in fn.__globals__ and not isinstance(fn.__globals__[name], types.ModuleType)}
+    return {
+        'code': [code.co_code, [const for const in code.co_consts if not isinstance(const, types.CodeType)],
+                 code.co_names],
+        'nested': [nested.co_code for nested in code.co_consts if isinstance(nested, types.CodeType)],
+        'defaults': [fn.__defaults__, fn.__kwdefaults__],
+        'closure': [expand(cell.cell_contents) for cell in fn.__closure__ or []],
+        'globals': referenced
+    }
+
+
+def model_fingerprint(model_or_predict_fn: Any) -> bytes:
+    """
+    Hash the model of a prediction function
+
+    Args:
+        model_or_predict_fn: a model object, or a predict function which may be a bound method of a model
+
+    Returns:
+        A 16 byte digest of the model, see `fingerprint`. A predict function which is not a bound method is
+        hashed with the objects it refers to, so that a retrained global model changes the digest.
+    """
+    return fingerprint(get_model(model_or_predict_fn))
+
+
+class ExplanationCache:
+    """
+    Persistent cache of explanations in a local directory.
+
+    An explanation is keyed by the hash of a context, i.e. the explainer algorithm, its parameters and
+    the model fingerprint, together with the hash of the instance. The explanations are appended to a single
+    file and the index is rebuilt from the file when the cache is opened. When the file exceeds `max_bytes`,
+    it is compacted to the most recently written explanations within half of the limit.
+    """
+
+    def __init__(self, cache_dir: str, max_bytes: Optional[int] = DEFAULT_MAX_BYTES):
+        """
+        Args:
+            cache_dir (str): directory of the cache, created if it does not exist
+            max_bytes (int): maximum size of the cache file in bytes, default is 256MB. None for no limit
+        """
+        os.makedirs(cache_dir, exist_ok=True)
+        self.path = os.path.join(cache_dir, STORE_FILE)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._index = OrderedDict()
+        self._size = 0
+        self._load_index()
+
+    @staticmethod
+    def context(algorithm: str, model_or_predict_fn: Any = None, **params) -> bytes:
+        """
+        Build the context part of the cache keys
+
+        Args:
+            algorithm (str): the explainer algorithm
+            model_or_predict_fn: the model, or its prediction function, see `model_fingerprint`
+            **params: parameters which change the explanations, e.g. the training data and `num_samples`
+
+        Returns:
+            A 16 byte digest
+        """
+        return fingerprint({'algorithm': algorithm,
+                            'model': model_fingerprint(model_or_predict_fn),
+                            'params': fingerprint(params)})
+
+    def _load_index(self):
+        """
+        Scan the record headers of the cache file, and drop a partly written record at the end
+        """
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, 'rb') as fp:
+            file_size = os.fstat(fp.fileno()).st_size
+            offset = 0
+            while offset + _HEADER.size <= file_size:
+                key, length = _HEADER.unpack(fp.read(_HEADER.size))
+                if offset + _HEADER.size + length > file_size:
+                    break
+                self._index.pop(key, None)
+                self._index[key] = (offset + _HEADER.size, length)
+                offset += _HEADER.size + length
+                fp.seek(offset)
+        if offset < file_size:
+            with open(self.path, 'r+b') as fp:
+                fp.truncate(offset)
+        self._size = offset
+
+    def get(self, context: bytes, instances: List) -> List[Optional[Dict]]:
+        """
+        Look up the explanations of the instances
+
+        Args:
+            context (bytes): the context, see `context`
+            instances (list): a list of instances, i.e. a 2D array, a list of 1D arrays or a list of strings
+
+        Returns:
+            (list) The cached explanation of each instance, None for the instances not in the cache
+        """
+        keys = self._keys(context, instances)
+        results = [None] * len(keys)
+        found = [(idx, self._index[key]) for idx, key in enumerate(keys) if key in self._index]
+        if len(found) > 0:
+            with open(self.path, 'rb') as fp:
+                for idx, (offset, length) in sorted(found, key=lambda item: item[1][0]):
+                    fp.seek(offset)
+                    results[idx] = pickle.loads(fp.read(length))
+        self.hits += len(found)
+        self.misses += len(keys) - len(found)
+        return results
+
+    def put(self, context: bytes, instances: List, explanations: List[Dict]):
+        """
+        Append the explanations of the instances to the cache
+
+        Args:
+            context (bytes): the context, see `context`
+            instances (list): a list of instances
+            explanations (list): the explanation of each instance
+        """
+        keys = self._keys(context, instances)
+        with open(self.path, 'ab') as fp:
+            offset = fp.tell()
+            for key, explanation in zip(keys, explanations):
+                payload = pickle.dumps(explanation, protocol=pickle.HIGHEST_PROTOCOL)
+                fp.write(_HEADER.pack(key, len(payload)))
+                fp.write(payload)
+                self._index.pop(key, None)
+                self._index[key] = (offset + _HEADER.size, len(payload))
+                offset += _HEADER.size + len(payload)
+        self._size = offset
+        if self.max_bytes is not None and self._size > self.max_bytes:
+            self._compact(self.max_bytes // 2)
+
+    def explain(self, context: bytes, instances: List, explain_fn: Callable[[List], List[Dict]]) -> List[Dict]:
+        """
+        Get the explanations of the instances, only the instances not in the cache are explained
+
+        Args:
+            context (bytes): the context, see `context`
+            instances (list): a list of instances
+            explain_fn (Callable): function explains a list of instances, and returns a list of explanations
+
+        Returns:
+            (list) The explanation of each instance
+        """
+        results = self.get(context, instances)
+        missing = [idx for idx, explanation in enumerate(results) if explanation is None]
+        if len(missing) > 0:
+            if isinstance(instances, np.ndarray):
+                missing_instances = instances[missing]
+            else:
+                missing_instances = [instances[idx] for idx in missing]
+            explanations = explain_fn(missing_instances)
+            self.put(context, missing_instances, explanations)
+            for idx, explanation in zip(missing, explanations):
+                results[idx] = explanation
+        return results
+
+    def _compact(self, target_bytes: int):
+        """
+        Rewrite the cache file with the most recently written explanations within `target_bytes`
+        """
+        kept, total = [], 0
+        for key, (offset, length) in reversed(self._index.items()):
+            if total + _HEADER.size + length > target_bytes:
+                break
+            kept.append((key, offset, length))
+            total += _HEADER.size + length
+
+        index, position = OrderedDict(), 0
+        with open(self.path, 'rb') as source, open(self.path + '.tmp', 'wb') as target:
+            for key, offset, length in reversed(kept):
+                source.seek(offset)
+                target.write(_HEADER.pack(key, length))
+                target.write(source.read(length))
+                index[key] = (position + _HEADER.size, length)
+                position += _HEADER.size + length
+        os.replace(self.path + '.tmp', self.path)
+        self._index = index
+        self._size = position
+
+    @staticmethod
+    def _keys(context: bytes, instances: List) -> List[bytes]:
+        return [hashlib.blake2b(context + row, digest_size=16).digest() for row in hash_rows(instances)]
+
+    def stats(self) -> Dict:
+        """
+        Returns the cache statistics
+
+        Returns:
+            A dict with the number of hits and misses, the number of cached explanations and the file size in bytes
+        """
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'entries': len(self._index),
+            'bytes': self._size
+        }
+
+    def clear(self):
+        """
+        Remove all cached explanations
+        """
+        if os.path.exists(self.path):
+            os.remove(self.path)
+        self._index = OrderedDict()
+        self._size = 0
@@ -0,0 +1,235 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+# Copyright 2019 SAP SE or an SAP affiliate company. All rights reserved
+# ============================================================================
+
+import json
+import os
+import pickle
+from typing import Dict, List, Any, Optional, Iterator, Tuple
+
+import numpy as np
+
+from xai.explainer.constants import MODE, OUTPUT
+from xai.explainer.explanation import CompactExplanation, FeatureTable
+
+DEFAULT_SHARD_SIZE = 1000
+MANIFEST_FILE = 'manifest.json'
+CHECKPOINT_FILE = 'checkpoint.pkl'
+SHARD_PATTERN = 'shard-%06d.npz'
+
+# the label of a regression explanation in the shards
+_NO_LABEL = -1
+
+
+def to_compact(explanation: Dict, feature_table: FeatureTable) -> CompactExplanation:
+    """
+    Convert an explanation in the format of `xai.explainer.utils.explanation_to_json` to a compact explanation
+
+    Args:
+        explanation (dict): the explanation, a `CompactExplanation` is returned as it is
+        feature_table (FeatureTable): the table of the feature names of the new compact explanation
+
+    Returns:
+        (CompactExplanation) The explanation, with the features in the same order
+    """
+    if isinstance(explanation, CompactExplanation):
+        return explanation
+    if OUTPUT.EXPLANATION in explanation:
+        info = {key: value for key, value in explanation.items() if key not in (OUTPUT.PREDICTION, OUTPUT.EXPLANATION)}
+        label_explanations = {None: explanation}
+        mode = MODE.REGRESSION
+    else:
+        info = {key: values[key] for values in explanation.values() for key in values
+                if key not in (OUTPUT.PREDICTION, OUTPUT.EXPLANATION)}
+        label_explanations = explanation
+        mode = MODE.CLASSIFICATION
+    compact = CompactExplanation.from_lists(
+        feature_table,
+        {label: (values[OUTPUT.PREDICTION], [(item[OUTPUT.FEATURE], item[OUTPUT.SCORE])
+                                             for item in values[OUTPUT.EXPLANATION]])
+         for label, values in label_explanations.items()},
+        mode=mode, sort=False)
+    compact.add_info(info)
+    return compact
+
+
+class ExplanationStore:
+    """
+    Append-only store of the explanations of a long run in a directory, to resume the run after a crash.
+
+    The explanations are buffered and written in shards of `shard_size` explanations, as columnar numpy
+    arrays (`.npz`): the feature indices, scores, predictions and labels of all explanations of a shard are
+    concatenated, with offsets. A shard is written to a temporary file and renamed, so the directory only
+    contains complete shards. With each shard, a checkpoint of the state of the consumer, e.g. an
+    `ExplanationAggregator`, is saved together with the number of explanations it has seen.
+
+    A store belongs to a run, identified by a key such as the fingerprint of the samples and parameters,
+    and it cannot be reopened with another key.
+    """
+
+    def __init__(self, path: str, run_key: Optional[str] = None, shard_size: int = DEFAULT_SHARD_SIZE):
+        """
+        Args:
+            path (str): directory of the store, created if it does not exist
+            run_key (str): identifier of the run, checked when the store is reopened
+            shard_size (int): number of explanations of a shard
+        """
+        self.path = path
+        self.shard_size = shard_size
+        os.makedirs(path, exist_ok=True)
+
+        manifest_path = os.path.join(path, MANIFEST_FILE)
+        if os.path.isfile(manifest_path):
+            with open(manifest_path, 'r') as fp:
+                manifest = json.load(fp)
+            if run_key is not None and manifest.get('run') != run_key:
+                raise ValueError('%s stores the explanations of another run, '
+                                 'use a new directory or remove it' % path)
+        else:
+            with open(manifest_path, 'w') as fp:
+                json.dump({'run': run_key, 'shard_size': shard_size}, fp)
+
+        self._shard_counts = []
+        while os.path.isfile(self._shard_path(len(self._shard_counts))):
+            with np.load(self._shard_path(len(self._shard_counts))) as shard:
+                self._shard_counts.append(len(shard['weights']))
+        self._buffer = []
+
+    def _shard_path(self, idx: int) -> str:
+        return os.path.join(self.path, SHARD_PATTERN % idx)
+
+    @property
+    def num_stored(self) -> int:
+        """Returns the number of explanations in the written shards"""
+        return sum(self._shard_counts)
+
+    def append(self, explanation: Dict, weight: int = 1, state: Any = None):
+        """
+        Add an explanation, and write a shard when the buffer is full
+
+        Args:
+            explanation (dict): the explanation, a `CompactExplanation` or a dict in the same format
+            weight (int): the weight of the explanation, see `ExplanationAggregator.feed`
+            state: the state of the consumer after this explanation, saved as checkpoint with the shard
+        """
+        self._buffer.append((explanation, weight))
+        if len(self._buffer) >= self.shard_size:
+            self.flush(state)
+
+    def flush(self, state: Any = None):
+        """
+        Write the buffered explanations to a shard, and save the checkpoint
+
+        Args:
+            state: the state of the consumer after the buffered explanations, None to not save a checkpoint
+        """
+        if self._buffer:
+            self._write_shard(self._buffer)
+            self._shard_counts.append(len(self._buffer))
+            self._buffer = []
+        if state is not None:
+            self._write_atomic(os.path.join(self.path, CHECKPOINT_FILE),
+                               lambda fp: pickle.dump({'num_explanations': self.num_stored, 'state': state}, fp))
+
+    def load_checkpoint(self) -> Any:
+        """
+        Load the checkpoint of the written shards
+
+        Returns:
+            The state saved with the last shard, None if there is no checkpoint of all written shards
+        """
+        checkpoint_path = os.path.join(self.path, CHECKPOINT_FILE)
+        if not os.path.isfile(checkpoint_path):
+            return None
+        with open(checkpoint_path, 'rb') as fp:
+            checkpoint = pickle.load(fp)
+        return checkpoint['state'] if checkpoint['num_explanations'] == self.num_stored else None
+
+    def _write_atomic(self, path: str, write_fn):
+        temp_path = path + '.tmp'
+        with open(temp_path, 'wb') as fp:
+            write_fn(fp)
+            fp.flush()
+            os.fsync(fp.fileno())
+        os.replace(temp_path, path)
+
+    def _write_shard(self, records: List[Tuple[Dict, int]]):
+        feature_table = FeatureTable()
+        names = dict()
+        label_offsets, labels, predictions, feature_offsets, features, scores = [0], [], [], [0], [], []
+        modes, infos = [], []
+        for explanation, _ in records:
+            explanation = to_compact(explanation, feature_table)
+            for label, prediction, indices, label_scores in explanation.arrays():
+                labels.append(_NO_LABEL if label is None else label)
+                predictions.append(prediction)
+                # the indices are relative to the feature names of the shard
+                features.append([names.setdefault(explanation.feature_table.names[idx], len(names))
+                                 for idx in indices.tolist()])
+                scores.append(label_scores)
+                feature_offsets.append(feature_offsets[-1] + len(indices))
+            label_offsets.append(len(labels))
+            modes.append(explanation.mode)
+            infos.append(json.dumps(explanation.info))
+
+        arrays = {
+            'weights': np.array([weight for _, weight in records], dtype=np.int64),
+            'modes': np.array(modes, dtype=str),
+            'infos': np.array(infos, dtype=str),
+            'label_offsets': np.array(label_offsets, dtype=np.int64),
+            'labels': np.array(labels, dtype=np.int64),
+            'predictions': np.array(predictions, dtype=np.float64),
+            'feature_offsets': np.array(feature_offsets, dtype=np.int64),
+            'features': np.concatenate([np.zeros(0, dtype=np.int64)] + [np.array(idx, dtype=np.int64)
+                                                                       for idx in features]),
+            'scores': np.concatenate([np.zeros(0)] + scores),
+            # JSON keeps the type of the names, e.g. the integer feature indices of shap
+            'names': np.array([json.dumps(name.item() if isinstance(name, np.generic) else name)
+                               for name in names], dtype=str)
+        }
+        self._write_atomic(self._shard_path(len(self._shard_counts)), lambda fp: np.savez(fp, **arrays))
+
+    def iter_explanations(self, feature_table: Optional[FeatureTable] = None) -> Iterator[Tuple[CompactExplanation,
+                                                                                                 int]]:
+        """
+        Read the explanations of the written shards, in the order they were appended
+
+        Args:
+            feature_table (FeatureTable): the table of the feature names of the explanations, default is a new table
+
+        Returns:
+            An iterator over the explanations and their weights
+        """
+        feature_table = feature_table if feature_table is not None else FeatureTable()
+        for idx in range(len(self._shard_counts)):
+            with np.load(self._shard_path(idx)) as shard:
+                shard = {key: shard[key] for key in shard.files}
+            names = feature_table.indices([json.loads(name) for name in shard['names'].tolist()])
+            label_offsets, feature_offsets = shard['label_offsets'], shard['feature_offsets']
+            for record, weight in enumerate(shard['weights'].tolist()):
+                rows = range(label_offsets[record], label_offsets[record + 1])
+                mode = str(shard['modes'][record])
+                labels = [int(shard['labels'][row]) for row in rows]
+                explanation = CompactExplanation(
+                    feature_table,
+                    labels if mode == MODE.CLASSIFICATION else None,
+                    [float(shard['predictions'][row]) for row in rows],
+                    [names[shard['features'][feature_offsets[row]:feature_offsets[row + 1]]] for row in rows],
+                    [shard['scores'][feature_offsets[row]:feature_offsets[row + 1]] for row in rows],
+                    mode=mode, info=json.loads(str(shard['infos'][record])))
+                yield explanation, weight
+
+    def load_into(self, aggregator):
+        """
+        Feed the explanations of the written shards to an aggregator, without explaining anything
+
+        Args:
+            aggregator (ExplanationAggregator): the aggregator
+
+        Returns:
+            The aggregator
+        """
+        for explanation, weight in self.iter_explanations():
+            aggregator.feed(explanation, weight=weight)
+        return aggregator
@@ -0,0 +1,207 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+# Copyright 2019 SAP SE or an SAP affiliate company. All rights reserved
+# ============================================================================
+
+from typing import Dict, List, Optional, Any
+
+import numpy as np
+
+
+class FeatureGroups:
+    """
+    Groups of the columns of tabular data, which are perturbed and attributed as single features,
+    e.g. the columns of a one-hot encoded category or of an embedding.
+
+    The columns which are not in a group are groups of their own, so the groups partition the columns,
+    in the order of their first column.
+
+    For explainers which perturb feature by feature like LIME, a group of several columns is encoded as a
+    categorical feature: the code of a row is the index of its values in the distinct values of the group in
+    the training data. A perturbation either keeps the values of the instance, or takes the values of a
+    training row for the whole group.
+    """
+
+    def __init__(self, feature_groups: Dict[str, List[int]], num_features: int,
+                 feature_names: Optional[List[str]] = None):
+        """
+        Args:
+            feature_groups (dict): mapping of the name of a group to the list of indices of its columns
+            num_features (int): number of columns of the data
+            feature_names (list): names of the columns, used for the columns which are not in a group
+                and to name the values of one-hot encoded groups. Default is the column indices.
+
+        Raises:
+            ValueError: if a group is empty, or a column is out of range or in several groups
+        """
+        if feature_names is None:
+            feature_names = range(num_features)
+        self.feature_names = [str(name) for name in feature_names]
+        self.num_features = num_features
+
+        group_of = dict()
+        for name, columns in feature_groups.items():
+            if len(columns) == 0:
+                raise ValueError('Feature group %s has no column' % name)
+            for column in columns:
+                if not 0 <= column < num_features:
+                    raise ValueError('Column %s of feature group %s is out of range' % (column, name))
+                if column in group_of:
+                    raise ValueError('Column %s is in feature groups %s and %s' % (column, group_of[column], name))
+                group_of[column] = name
+
+        self.names = []
+        self.columns = []
+        for column in range(num_features):
+            if column not in group_of:
+                self.names.append(self.feature_names[column])
+                self.columns.append(np.array([column]))
+            elif column == min(feature_groups[group_of[column]]):
+                self.names.append(str(group_of[column]))
+                self.columns.append(np.array(sorted(feature_groups[group_of[column]])))
+        self._patterns = None
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def group_index(self, columns: List[int]) -> List[int]:
+        """
+        Map the indices of columns which are not in a group of several columns to the indices of their groups
+
+        Args:
+            columns (list): indices of columns, e.g. the categorical features
+
+        Returns:
+            (list) The indices of the groups, the columns in a group of several columns are left out
+        """
+        single = {int(group[0]): idx for idx, group in enumerate(self.columns) if len(group) == 1}
+        return [single[column] for column in columns if column in single]
+
+    def labels(self, instance: np.ndarray) -> List[str]:
+        """
+        Name the groups with their values in an instance, in the format of the SHAP explanations
+
+        Args:
+            instance (np.ndarray): a row of the data
+
+        Returns:
+            (list) 'name = value' for a single column, 'name = column' for a one-hot encoded group,
+            and the name of the group for other groups
+        """
+        instance = np.asarray(instance).ravel()
+        labels = []
+        for name, group in zip(self.names, self.columns):
+            if len(group) == 1:
+                labels.append('{} = {}'.format(name, instance[group[0]]))
+            else:
+                value = self._one_hot_column(instance[group], group)
+                labels.append(name if value is None else '{} = {}'.format(name, value))
+        return labels
+
+    def _one_hot_column(self, values: np.ndarray, group: np.ndarray) -> Optional[str]:
+        active = np.flatnonzero(values)
+        if len(active) == 1 and values[active[0]] == 1 and np.all((values == 0) | (values == 1)):
+            return self.feature_names[group[active[0]]]
+        return None
+
+    def fit_encode(self, training_data: np.ndarray) -> np.ndarray:
+        """
+        Learn the distinct values of the groups in the training data, and encode it
+
+        Args:
+            training_data (np.ndarray): 2d array of the training data
+
+        Returns:
+            (np.ndarray) The training data with a column for each group, the code of the values of a group of
+            several columns and the value of a single column
+        """
+        training_data = np.asarray(training_data)
+        self._patterns = dict()
+        encoded = np.empty((len(training_data), len(self)), dtype=np.float64)
+        for idx, group in enumerate(self.columns):
+            if len(group) == 1:
+                encoded[:, idx] = training_data[:, group[0]]
+            else:
+                self._patterns[idx], encoded[:, idx] = np.unique(training_data[:, group], axis=0,
+                                                                 return_inverse=True)
+        return encoded
+
+    def categorical_features(self) -> List[int]:
+        """Returns the indices of the groups of several columns, which are categorical after encoding"""
+        return sorted(self._patterns)
+
+    def categorical_names(self) -> Dict[int, List[str]]:
+        """
+        Name the codes of the groups of several columns
+
+        Returns:
+            (dict) Mapping of the index of a group to the names of its codes, the active column of a one-hot
+            encoded value and the code itself otherwise
+        """
+        names = dict()
+        for idx, patterns in self._patterns.items():
+            names[idx] = [self._one_hot_column(pattern, self.columns[idx]) or str(code)
+                          for code, pattern in enumerate(patterns)]
+        return names
+
+    def encode(self, data: np.ndarray) -> np.ndarray:
+        """
+        Encode rows, the values of a group which are not in the training data take the code of the closest values
+
+        Args:
+            data (np.ndarray): 1d or 2d array of rows of the data
+
+        Returns:
+            (np.ndarray) The encoded rows, in the same shape
+        """
+        data = np.asarray(data, dtype=np.float64)
+        rows = data.reshape(-1, self.num_features)
+        encoded = np.empty((len(rows), len(self)), dtype=np.float64)
+        for idx, group in enumerate(self.columns):
+            if idx in self._patterns:
+                distances = ((rows[:, None, group] - self._patterns[idx][None, :, :]) ** 2).sum(axis=2)
+                encoded[:, idx] = np.argmin(distances, axis=1)
+            else:
+                encoded[:, idx] = rows[:, group[0]]
+        return encoded.ravel() if data.ndim == 1 else encoded
+
+    def decode(self, encoded: np.ndarray, instance: np.ndarray) -> np.ndarray:
+        """
+        Decode perturbations of an instance
+
+        Args:
+            encoded (np.ndarray): 2d array of the encoded perturbations
+            instance (np.ndarray): the instance, whose values are restored for the codes of the instance
+
+        Returns:
+            (np.ndarray) The perturbations with all the columns
+        """
+        encoded = np.asarray(encoded)
+        instance = np.asarray(instance, dtype=np.float64).ravel()
+        instance_codes = self.encode(instance)
+        data = np.empty((len(encoded), self.num_features), dtype=np.float64)
+        for idx, group in enumerate(self.columns):
+            if idx in self._patterns:
+                codes = encoded[:, idx].astype(np.int64)
+                data[:, group] = self._patterns[idx][codes]
+                keep = codes == instance_codes[idx]
+                data[np.ix_(keep, group)] = instance[group]
+            else:
+                data[:, group[0]] = encoded[:, idx]
+        return data
+
+    def wrap_predict_fn(self, predict_fn, instance: np.ndarray):
+        """
+        Wrap a predict function to take the encoded perturbations of an instance
+
+        Args:
+            predict_fn (Callable): model prediction function
+            instance (np.ndarray): the instance
+
+        Returns:
+            (Callable) Prediction function of the encoded perturbations
+        """
+        def grouped_predict_fn(encoded: np.ndarray) -> Any:
+            return predict_fn(self.decode(encoded, instance))
+
+        return grouped_predict_fn
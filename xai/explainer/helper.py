@@ -4,7 +4,24 @@
 # Copyright 2019 SAP SE or an SAP affiliate company. All rights reserved
 # ============================================================================
 
-from typing import Tuple
+from typing import Tuple, Optional, Dict, List
+
+from xai.explainer.constants import DOMAIN, ALG
+
+TREE_MODEL_NAMES = {
+    'DecisionTreeClassifier', 'DecisionTreeRegressor',
+    'ExtraTreeClassifier', 'ExtraTreeRegressor',
+    'RandomForestClassifier', 'RandomForestRegressor',
+    'ExtraTreesClassifier', 'ExtraTreesRegressor',
+    'GradientBoostingClassifier', 'GradientBoostingRegressor',
+    'XGBClassifier', 'XGBRegressor',
+    'LGBMClassifier', 'LGBMRegressor',
+    'CatBoostClassifier', 'CatBoostRegressor'
+}
+
+LINEAR_MODEL_MODULES = ('sklearn.linear_model',)
+
+LINEAR_MODEL_NAMES = {'LinearSVC', 'LinearSVR'}
 
 
 def parse_feature_meta_tabular(metadata: dict) -> Tuple[list, list, dict]:
@@ -33,3 +50,71 @@ def parse_feature_meta_tabular(metadata: dict) -> Tuple[list, list, dict]:
                 categorical_mapping[idx] = mapping
 
     return feature_names, categorical_idx, categorical_mapping
+
+
+def parse_feature_groups(metadata: dict, feature_names: Optional[List[str]] = None) -> Dict[str, List[int]]:
+    """
+    parse the groups of columns which are explained as single features, e.g.
+    `"feature_groups": {"color": ["color_red", "color_blue"], "embedding": [5, 6, 7]}`
+    Args:
+        metadata: dict contains class information and feature information
+        feature_names: list of feature names, to find the columns given by name
+
+    Returns:
+        feature_groups: a dict maps the name of a group to the list of index of its columns
+
+    Raises:
+        ValueError: if a column is not one of the feature names
+
+    """
+    feature_groups = dict()
+    for name, columns in metadata.get("feature_groups", {}).items():
+        feature_groups[name] = list()
+        for column in columns:
+            if isinstance(column, str):
+                if feature_names is None or column not in feature_names:
+                    raise ValueError('Column %s of feature group %s is not a feature' % (column, name))
+                column = list(feature_names).index(column)
+            feature_groups[name].append(int(column))
+
+    return feature_groups
+
+
+def get_model(model_or_predict_fn):
+    """
+    Get the model object of a predict function
+    Args:
+        model_or_predict_fn: a model object, or a predict function which may be a bound method of a model
+
+    Returns:
+        the model object if the predict function is a bound method (e.g. `clf.predict_proba`), else the input itself.
+        Wrappers of the predict function (e.g. `PredictionCache`) are unwrapped first.
+    """
+    while hasattr(model_or_predict_fn, '__wrapped__'):
+        model_or_predict_fn = model_or_predict_fn.__wrapped__
+    return getattr(model_or_predict_fn, '__self__', model_or_predict_fn)
+
+
+def get_model_specific_algorithm(domain: str, model_or_predict_fn) -> Optional[str]:
+    """
+    Select an exact model-specific explainer for a supported model
+    Args:
+        domain: domain of the data
+        model_or_predict_fn: a model object, or a predict function which is a bound method of a model
+
+    Returns:
+        ALG.TREE_SHAP for a supported tree model, ALG.LINEAR for a linear model,
+        None if the model is not supported and a model-agnostic explainer is needed
+    """
+    if domain != DOMAIN.TABULAR or model_or_predict_fn is None:
+        return None
+    model = get_model(model_or_predict_fn)
+    if type(model).__name__ in TREE_MODEL_NAMES:
+        if type(model).__name__ == 'GradientBoostingClassifier' and getattr(model, 'n_classes_', 2) > 2:
+            # shap.TreeExplainer only supports binary gradient boosting classifiers from scikit-learn
+            return None
+        return ALG.TREE_SHAP
+    if (type(model).__module__.startswith(LINEAR_MODEL_MODULES) or type(model).__name__ in LINEAR_MODEL_NAMES) \
+            and hasattr(model, 'coef_') and hasattr(model, 'intercept_'):
+        return ALG.LINEAR
+    return None
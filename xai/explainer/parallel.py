@@ -0,0 +1,112 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+# Copyright 2019 SAP SE or an SAP affiliate company. All rights reserved
+# ============================================================================
+
+import os
+import shutil
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Iterator, Optional
+
+import numpy as np
+
+from xai.explainer.abstract_explainer import AbstractExplainer
+from xai.explainer.prediction_cache import hash_rows
+
+CHUNKS_PER_WORKER = 4
+
+# the explainer of a worker process, loaded once by `_init_worker`
+_worker_explainer = None
+
+
+def sample_seeds(instances: List, random_state: int = 0) -> List[int]:
+    """
+    Derive a random seed for each instance from its content, so the explanation of an instance does not
+    depend on its position, on the other instances or on the number of workers
+
+    Args:
+        instances (list): a 2D array, a list of 1D arrays or a list of strings
+        random_state (int): the base seed
+
+    Returns:
+        (list) A 32 bit seed for each instance
+    """
+    return [int(np.random.SeedSequence([random_state, int.from_bytes(row[:8], 'little')]).generate_state(1)[0])
+            for row in hash_rows(instances)]
+
+
+def _explain_seeded(explainer: AbstractExplainer, instances: List, seeds: List[int], kwargs: Dict) -> List[Dict]:
+    # explainers like SHAP seed the global numpy random generator, which is restored for the caller
+    global_state = np.random.get_state()
+    try:
+        explanations = []
+        for instance, seed in zip(instances, seeds):
+            explainer.set_random_state(seed)
+            explanations.append(explainer.explain_instance(instance=instance, **kwargs))
+        return explanations
+    finally:
+        np.random.set_state(global_state)
+
+
+def _init_worker(explainer_class: type, path: str):
+    global _worker_explainer
+    _worker_explainer = explainer_class()
+    _worker_explainer.load_explainer(path)
+
+
+def _explain_chunk(instances: List, seeds: List[int], kwargs: Dict) -> List[Dict]:
+    return _explain_seeded(_worker_explainer, instances, seeds, kwargs)
+
+
+def explain_in_parallel(explainer: AbstractExplainer,
+                        instances: List,
+                        n_jobs: int = 1,
+                        random_state: int = 0,
+                        chunk_size: Optional[int] = None,
+                        **kwargs) -> Iterator[Dict]:
+    """
+    Explain the instances in a pool of worker processes.
+
+    The explainer is saved once in the compact format and loaded by every worker, so the arrays of the
+    explainer, e.g. the training data, are memory-mapped and shared between the workers. Each instance is
+    explained with a seed derived from its content, see `sample_seeds`, so the explanations are the same
+    for any number of workers, including the serial explanation with `n_jobs=1`.
+
+    Args:
+        explainer (AbstractExplainer): a built explainer, which can be saved with `save_explainer(compact=True)`
+        instances (list): the instances to explain
+        n_jobs (int): number of worker processes, -1 for the number of CPUs. Default is 1 to explain
+            in the current process
+        random_state (int): the base seed of the instance seeds
+        chunk_size (int): number of instances sent to a worker at a time. Default is None to split the
+            instances into 4 chunks per worker
+        **kwargs: parameters of `explain_instance`
+
+    Returns:
+        An iterator over the explanations, in the order of the instances
+    """
+    if n_jobs is not None and n_jobs < 0:
+        n_jobs = os.cpu_count()
+    seeds = sample_seeds(instances, random_state=random_state)
+    if not n_jobs or n_jobs == 1 or len(instances) <= 1:
+        for instance, seed in zip(instances, seeds):
+            yield _explain_seeded(explainer, [instance], [seed], kwargs)[0]
+        return
+
+    if chunk_size is None:
+        chunk_size = max(1, int(np.ceil(len(instances) / (n_jobs * CHUNKS_PER_WORKER))))
+    save_dir = tempfile.mkdtemp()
+    try:
+        path = os.path.join(save_dir, 'explainer')
+        explainer.save_explainer(path, compact=True)
+        with ProcessPoolExecutor(max_workers=n_jobs, initializer=_init_worker,
+                                 initargs=(type(explainer), path)) as executor:
+            futures = [executor.submit(_explain_chunk, instances[start:start + chunk_size],
+                                       seeds[start:start + chunk_size], kwargs)
+                       for start in range(0, len(instances), chunk_size)]
+            for future in futures:
+                for explanation in future.result():
+                    yield explanation
+    finally:
+        shutil.rmtree(save_dir, ignore_errors=True)
@@ -0,0 +1,148 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+# Copyright 2019 SAP SE or an SAP affiliate company. All rights reserved
+# ============================================================================
+
+import hashlib
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+DEFAULT_MAX_ENTRIES = 100000
+
+
+def hash_rows(data) -> List[bytes]:
+    """
+    Hash each input row by its content
+
+    Args:
+        data: a 2D array, or a list of rows or strings
+
+    Returns:
+        (list) A 16 byte digest for each row
+    """
+    if isinstance(data, np.ndarray) and data.dtype != object:
+        data = np.ascontiguousarray(data.reshape(len(data), -1))
+        prefix = data.dtype.str.encode()
+        return [hashlib.blake2b(prefix + row.tobytes(), digest_size=16).digest() for row in data]
+    keys = []
+    for row in data:
+        if isinstance(row, str):
+            content = b'str:' + row.encode('utf-8')
+        else:
+            row = np.asarray(row)
+            content = row.dtype.str.encode() + row.tobytes() if row.dtype != object else repr(row).encode()
+        keys.append(hashlib.blake2b(content, digest_size=16).digest())
+    return keys
+
+
+class PredictionCache:
+    """
+    Content-addressed cache around a model prediction function.
+
+    Each input row (a row of a 2D array, or a string for text models) is hashed, the rows already
+    predicted are served from a least-recently-used store, and only the missing distinct rows are
+    forwarded to the prediction function, in one call. The cache is used in place of the prediction
+    function, e.g. `explainer.build_explainer(..., predict_fn=PredictionCache(clf.predict_proba))`.
+    """
+
+    def __init__(self, predict_fn: Callable, max_entries: Optional[int] = DEFAULT_MAX_ENTRIES,
+                 max_bytes: Optional[int] = None):
+        """
+        Args:
+            predict_fn (Callable): model prediction function, takes a 2D array or a list of strings
+            max_entries (int): maximum number of cached rows, default is 100000. None for no limit
+            max_bytes (int): maximum size of the cached outputs in bytes, default is None for no limit
+        """
+        self.__wrapped__ = predict_fn
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._store = OrderedDict()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def __call__(self, data) -> np.ndarray:
+        """
+        Predict the rows, only the rows not in the cache are forwarded to the prediction function
+
+        Args:
+            data: a 2D array, or a list of rows or strings
+
+        Returns:
+            The model output for all rows, in the format of the prediction function
+        """
+        keys = hash_rows(data)
+        missing = OrderedDict()
+        for idx, key in enumerate(keys):
+            if key not in self._store and key not in missing:
+                missing[key] = idx
+
+        if len(missing) > 0:
+            positions = list(missing.values())
+            if isinstance(data, np.ndarray):
+                rows = data[positions]
+            else:
+                rows = [data[idx] for idx in positions]
+            outputs = np.asarray(self.__wrapped__(rows))
+            for key, output in zip(missing.keys(), outputs):
+                self._store[key] = output.copy()
+                self._bytes += output.nbytes
+
+        results = []
+        for key in keys:
+            results.append(self._store[key])
+            self._store.move_to_end(key)
+
+        self.misses += len(missing)
+        self.hits += len(keys) - len(missing)
+        self._evict()
+        return np.stack(results) if len(results) > 0 else np.asarray(self.__wrapped__(data))
+
+    def _evict(self):
+        """
+        Remove the least recently used rows until the store is within the limits
+        """
+        while len(self._store) > 0 and \
+                ((self.max_entries is not None and len(self._store) > self.max_entries) or
+                 (self.max_bytes is not None and self._bytes > self.max_bytes)):
+            _, output = self._store.popitem(last=False)
+            self._bytes -= output.nbytes
+
+    @property
+    def hit_rate(self) -> float:
+        """Returns the fraction of rows served from the cache"""
+        total = self.hits + self.misses
+        return self.hits / total if total > 0 else 0.0
+
+    def stats(self) -> Dict:
+        """
+        Returns the cache statistics
+
+        Returns:
+            A dict with the number of hits and misses, the hit rate, the number of cached rows and their size in bytes
+        """
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hit_rate,
+            'entries': len(self._store),
+            'bytes': self._bytes
+        }
+
+    def clear(self):
+        """
+        Remove all cached rows and reset the statistics
+        """
+        self._store.clear()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def __getstate__(self):
+        # saved explainers keep the prediction function but not the cached rows
+        state = self.__dict__.copy()
+        state['_store'] = OrderedDict()
+        state['_bytes'] = 0
+        return state
@@ -0,0 +1,128 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+# Copyright 2019 SAP SE or an SAP affiliate company. All rights reserved
+# ============================================================================
+
+import asyncio
+import inspect
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List, Optional
+
+import numpy as np
+
+from xai.explainer.batch import _num_rows
+
+
+def is_async(predict_fn: Callable) -> bool:
+    """
+    Check whether a prediction function is defined with `async def`
+
+    Args:
+        predict_fn (Callable): a function, a bound method or a callable object
+
+    Returns:
+        True if calling the function returns a coroutine
+    """
+    return inspect.iscoroutinefunction(predict_fn) or \
+        inspect.iscoroutinefunction(getattr(predict_fn, '__call__', None))
+
+
+class PredictionExecutor:
+    """
+    Execution layer around a model prediction function.
+
+    The input rows are split into chunks of at most `chunk_size` rows, which bounds the size of a single
+    model call, and the chunks are dispatched to a pool of `max_workers` threads, e.g. to drive a model
+    served by a local HTTP or gRPC process concurrently. A prediction function defined with `async def` is
+    awaited in a new asyncio event loop instead, with at most `max_concurrency` chunks in flight, so it
+    cannot be called from a running event loop. The outputs are reassembled in the order of the rows.
+
+    The executor is used in place of the prediction function, e.g.
+    `explainer.build_explainer(..., predict_fn=PredictionExecutor(client.predict, chunk_size=500, max_workers=4))`.
+    """
+
+    def __init__(self, predict_fn: Callable, chunk_size: Optional[int] = None, max_workers: int = 1,
+                 max_concurrency: int = 1):
+        """
+        Args:
+            predict_fn (Callable): model prediction function, takes a 2D array or a list of strings. It can be
+                defined with `async def`
+            chunk_size (int): maximum number of rows in a single call of `predict_fn`, default is None to
+                predict all rows in one call
+            max_workers (int): number of threads calling a synchronous `predict_fn`, default is 1 to call it
+                in the current thread
+            max_concurrency (int): maximum number of concurrent calls of an asynchronous `predict_fn`
+        """
+        if chunk_size is not None and chunk_size < 1:
+            raise ValueError('chunk_size must be positive, got %s' % chunk_size)
+        self.__wrapped__ = predict_fn
+        self.chunk_size = chunk_size
+        self.max_workers = max_workers
+        self.max_concurrency = max_concurrency
+
+    def _chunks(self, data) -> List:
+        num_rows = _num_rows(data)
+        chunk_size = self.chunk_size or max(num_rows, 1)
+        return [data[start:start + chunk_size] for start in range(0, num_rows, chunk_size)]
+
+    def __call__(self, data) -> np.ndarray:
+        """
+        Predict the rows in chunks
+
+        Args:
+            data: a 2D array, or a list of rows or strings
+
+        Returns:
+            The model output for all rows, concatenated along the first axis
+        """
+        chunks = self._chunks(data)
+        if len(chunks) == 0:
+            return np.asarray(self._predict_all([data])[0])
+        outputs = self._predict_all(chunks)
+        if len(outputs) == 1:
+            return np.asarray(outputs[0])
+        return np.concatenate([np.asarray(output) for output in outputs], axis=0)
+
+    def _predict_all(self, chunks: List) -> List:
+        if is_async(self.__wrapped__):
+            return self._run_async(chunks)
+        if self.max_workers > 1 and len(chunks) > 1:
+            with ThreadPoolExecutor(max_workers=min(self.max_workers, len(chunks))) as pool:
+                return list(pool.map(self.__wrapped__, chunks))
+        return [self.__wrapped__(chunk) for chunk in chunks]
+
+    def _run_async(self, chunks: List) -> List:
+        # asyncio.get_running_loop and asyncio.run are not available on Python 3.6
+        if asyncio._get_running_loop() is not None:
+            raise RuntimeError('The asynchronous predict function cannot be called from a running event loop, '
+                               'await the explanation in a thread instead, e.g. with '
+                               '`await loop.run_in_executor(None, explainer.explain_instance, instance)`')
+        loop = asyncio.new_event_loop()
+        try:
+            return loop.run_until_complete(self._gather(chunks))
+        finally:
+            loop.close()
+
+    async def _gather(self, chunks: List) -> List:
+        semaphore = asyncio.Semaphore(max(self.max_concurrency, 1))
+
+        async def predict(chunk):
+            async with semaphore:
+                return await self.__wrapped__(chunk)
+
+        return await asyncio.gather(*[predict(chunk) for chunk in chunks])
+
+
+def as_executor(predict_fn: Optional[Callable]) -> Optional[Callable]:
+    """
+    Wrap an asynchronous prediction function into a `PredictionExecutor`, so that the explainers can call it
+
+    Args:
+        predict_fn (Callable): model prediction function
+
+    Returns:
+        The executor of an `async def` function, other functions as they are
+    """
+    if predict_fn is not None and not isinstance(predict_fn, PredictionExecutor) and is_async(predict_fn):
+        return PredictionExecutor(predict_fn)
+    return predict_fn
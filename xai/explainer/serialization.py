@@ -0,0 +1,215 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+# Copyright 2019 SAP SE or an SAP affiliate company. All rights reserved
+# ============================================================================
+
+import io
+import json
+import mmap as mmap_module
+import os
+import shutil
+from typing import Dict, Any, Optional
+
+import dill
+import numpy as np
+
+from xai.explainer.explanation_cache import ExplanationCache
+
+COMPACT_FORMAT = 'xai-compact'
+COMPACT_VERSION = 1
+META_FILE = 'meta.json'
+STATE_FILE = 'state.pkl'
+ARRAY_FILE = 'arrays.bin'
+MIN_ARRAY_BYTES = 1024
+ARRAY_ALIGNMENT = 64
+
+
+class _ArrayPickler(dill.Pickler):
+    """
+    Pickler which writes the numeric arrays of at least `MIN_ARRAY_BYTES` to a separate binary file,
+    and pickles their offset, dtype and shape instead
+    """
+
+    def __init__(self, file, array_file):
+        dill.Pickler.__init__(self, file)
+        self.array_file = array_file
+        self.arrays = dict()
+
+    def persistent_id(self, obj):
+        if type(obj) is not np.ndarray or obj.dtype.hasobject or obj.nbytes < MIN_ARRAY_BYTES:
+            return None
+        if id(obj) not in self.arrays:
+            offset = self.array_file.tell()
+            padding = -offset % ARRAY_ALIGNMENT
+            self.array_file.write(b'\0' * padding)
+            fortran = obj.flags.f_contiguous and not obj.flags.c_contiguous
+            self.array_file.write(obj.tobytes(order='F' if fortran else 'C'))
+            # keep a reference, so the id is not reused by another array while pickling
+            self.arrays[id(obj)] = ((offset + padding, obj.dtype, obj.shape, fortran), obj)
+        return self.arrays[id(obj)][0]
+
+
+class _ArrayUnpickler(dill.Unpickler):
+    """
+    Unpickler which creates the arrays written by `_ArrayPickler` on a buffer of the binary file
+    """
+
+    def __init__(self, file, buffer):
+        dill.Unpickler.__init__(self, file)
+        self.buffer = buffer
+
+    def persistent_load(self, pid):
+        offset, dtype, shape, fortran = pid
+        return np.ndarray(shape, dtype=dtype, buffer=self.buffer, offset=offset, order='F' if fortran else 'C')
+
+
+def is_compact(path: str) -> bool:
+    """
+    Check whether a saved explainer is in the compact format
+
+    Args:
+        path (str): path of the saved explainer
+
+    Returns:
+        True if the path is a directory saved by `save_compact`
+    """
+    return os.path.isfile(os.path.join(path, META_FILE))
+
+
+def save_compact(path: str, state: Dict[str, Any], metadata: Optional[Dict] = None):
+    """
+    Save the state of an explainer to a directory in the compact format.
+
+    The numeric arrays found anywhere in the state (e.g. the background data, the training statistics and
+    the arrays of the model) are written to a single binary file, which is memory-mapped on load,
+    the rest of the objects are pickled with dill, and the metadata is written as JSON.
+
+    Args:
+        path (str): directory to save the explainer, replaced if it exists
+        state (dict): the state of the explainer, i.e. the dict saved by `save_explainer`
+        metadata (dict): JSON serializable information, e.g. the explainer class and build parameters
+
+    Returns:
+        None
+    """
+    if os.path.isdir(path):
+        shutil.rmtree(path)
+    os.makedirs(path)
+
+    buffer = io.BytesIO()
+    with open(os.path.join(path, ARRAY_FILE), 'wb') as array_file:
+        pickler = _ArrayPickler(buffer, array_file)
+        pickler.dump(state)
+    with open(os.path.join(path, STATE_FILE), 'wb') as fp:
+        fp.write(buffer.getvalue())
+
+    meta = {
+        'format': COMPACT_FORMAT,
+        'version': COMPACT_VERSION,
+        'arrays': [{'offset': offset, 'dtype': str(dtype), 'shape': list(shape)}
+                   for (offset, dtype, shape, _), _ in pickler.arrays.values()],
+        'metadata': metadata or {}
+    }
+    # the metadata is written last, so a directory without it is an incomplete save
+    with open(os.path.join(path, META_FILE), 'w') as fp:
+        json.dump(meta, fp, indent=2)
+
+
+def load_compact(path: str, mmap: bool = True) -> Dict[str, Any]:
+    """
+    Load the state of an explainer saved by `save_compact`
+
+    Args:
+        path (str): directory of the saved explainer
+        mmap (bool): memory-map the arrays instead of reading them, default True.
+            The memory-mapped arrays are read-only.
+
+    Returns:
+        The state of the explainer
+    """
+    with open(os.path.join(path, META_FILE), 'r') as fp:
+        meta = json.load(fp)
+    if meta.get('format') != COMPACT_FORMAT or meta.get('version', 0) > COMPACT_VERSION:
+        raise ValueError('%s is not a supported compact explainer' % path)
+
+    buffer = b''
+    with open(os.path.join(path, ARRAY_FILE), 'rb') as fp:
+        if os.fstat(fp.fileno()).st_size > 0:
+            buffer = mmap_module.mmap(fp.fileno(), 0, access=mmap_module.ACCESS_READ) if mmap else bytearray(fp.read())
+    with open(os.path.join(path, STATE_FILE), 'rb') as fp:
+        return _ArrayUnpickler(fp, buffer).load()
+
+
+def load_metadata(path: str) -> Dict:
+    """
+    Load the metadata of an explainer saved by `save_compact`, without loading the explainer
+
+    Args:
+        path (str): directory of the saved explainer
+
+    Returns:
+        The metadata given to `save_compact`
+    """
+    with open(os.path.join(path, META_FILE), 'r') as fp:
+        return json.load(fp)['metadata']
+
+
+def save_state(path: str, state: Dict[str, Any], compact: bool = False, metadata: Optional[Dict] = None):
+    """
+    Save the state of an explainer, as a single dill pickle or in the compact format
+
+    Args:
+        path (str): path to save the explainer, a file for the pickle and a directory for the compact format
+        state (dict): the state of the explainer
+        compact (bool): save in the compact format, see `save_compact`. Default is False
+        metadata (dict): JSON serializable information saved with the compact format
+
+    Returns:
+        None
+    """
+    if compact:
+        save_compact(path, state, metadata=metadata)
+    else:
+        with open(path, 'wb') as fp:
+            dill.dump(state, fp)
+
+
+def load_state(path: str) -> Dict[str, Any]:
+    """
+    Load the state of an explainer saved by `save_state`, the format is detected from the path
+
+    Args:
+        path (str): path of the saved explainer
+
+    Returns:
+        The state of the explainer
+    """
+    if is_compact(path):
+        return load_compact(path)
+    with open(path, 'rb') as fp:
+        return dill.load(fp)
+
+
+def build_explainer_cached(explainer, cache_dir: str, **kwargs) -> bool:
+    """
+    Build the explainer, or load it from a build cache if it was built before with the same model,
+    training data and parameters. A newly built explainer is saved to the cache in the compact format.
+
+    Args:
+        explainer (AbstractExplainer): the explainer to build
+        cache_dir (str): directory of the build cache
+        **kwargs: parameters of `build_explainer`
+
+    Returns:
+        True if the explainer is loaded from the cache, False if it is built
+    """
+    params = {key: value for key, value in kwargs.items() if key not in ['model', 'predict_fn']}
+    context = ExplanationCache.context(type(explainer).__name__, kwargs.get('model', kwargs.get('predict_fn')),
+                                       **params)
+    path = os.path.join(cache_dir, context.hex())
+    if is_compact(path):
+        explainer.load_explainer(path)
+        return True
+    explainer.build_explainer(**kwargs)
+    explainer.save_explainer(path, compact=True)
+    return False
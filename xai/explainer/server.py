@@ -0,0 +1,316 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+# Copyright 2019 SAP SE or an SAP affiliate company. All rights reserved
+# ============================================================================
+
+import argparse
+import json
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from socketserver import ThreadingMixIn
+from typing import Dict, List, Any, Optional, Tuple
+
+import numpy as np
+
+from xai.explainer.abstract_explainer import AbstractExplainer
+from xai.explainer.explainer_exceptions import ExplainerNotFound
+from xai.explainer.explainer_factory import ExplainerFactory
+
+DEFAULT_MAX_BATCH_SIZE = 32
+DEFAULT_MAX_WAIT = 0.01
+DEFAULT_PORT = 8501
+LATENCY_WINDOW = 1000
+
+
+def load_explainer(domain: str, algorithm: str, path: str) -> AbstractExplainer:
+    """
+    Load a saved explainer
+
+    Args:
+        domain (str): domain of the explainer, e.g. 'tabular'
+        algorithm (str): algorithm of the explainer, e.g. 'lime'
+        path (str): path of the explainer saved by `save_explainer`
+
+    Returns:
+        (AbstractExplainer) The loaded explainer
+    """
+    explainer = ExplainerFactory.get_explainer(domain=domain, algorithm=algorithm)
+    explainer.load_explainer(path)
+    return explainer
+
+
+class _ThreadingHTTPServer(ThreadingMixIn, HTTPServer):
+    # http.server.ThreadingHTTPServer is not available on Python 3.6
+    daemon_threads = True
+
+
+class _Request:
+
+    def __init__(self, instance: Any, params: Dict):
+        self.instance = instance
+        self.params = params
+        self.key = json.dumps(params, sort_keys=True)
+        self.future = Future()
+        self.start = time.perf_counter()
+
+
+class ExplanationServer:
+    """
+    Long-running explanation service, which keeps one or more explainers loaded.
+
+    The requests of an explainer are queued, and a worker thread of the explainer coalesces the concurrent
+    requests into micro-batches of at most `max_batch_size` instances: after the first request of a batch,
+    it waits at most `max_wait` seconds for more. A batch is explained with `explain_instances`, so the model
+    calls of its instances are batched together. Requests with different explanation parameters are explained
+    in separate batches.
+
+    The service is used in process with `explain`, or over local HTTP with `start` or `serve`:
+        - POST /explain/<name> with {"instance": ..., "params": {...}} returns the explanation
+        - GET /explainers returns the names of the explainers
+        - GET /stats returns the latency and throughput counters
+    """
+
+    def __init__(self, explainers: Dict[str, AbstractExplainer], max_batch_size: int = DEFAULT_MAX_BATCH_SIZE,
+                 max_wait: float = DEFAULT_MAX_WAIT):
+        """
+        Args:
+            explainers (dict): mapping of names to built or loaded explainers
+            max_batch_size (int): maximum number of instances explained together
+            max_wait (float): maximum time in seconds to wait for more requests after the first of a batch
+        """
+        self.explainers = explainers
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self._queues = {name: queue.Queue() for name in explainers}
+        self._lock = threading.Lock()
+        self._latencies = deque(maxlen=LATENCY_WINDOW)
+        self._counters = {'requests': 0, 'errors': 0, 'batches': 0}
+        self._started = time.perf_counter()
+        self._http_server = None
+        self._workers = [threading.Thread(target=self._work, args=(name,), daemon=True) for name in explainers]
+        for worker in self._workers:
+            worker.start()
+
+    def explain(self, name: str, instance: Any, **params) -> Dict:
+        """
+        Explain an instance, blocks until the batch of the instance is explained
+
+        Args:
+            name (str): name of the explainer
+            instance: the instance in the format of `explain_instance` of the explainer
+            **params: parameters of `explain_instances`, e.g. `num_features`
+
+        Returns:
+            (dict) The explanation
+
+        Raises:
+            ExplainerNotFound: if there is no explainer with this name
+        """
+        if name not in self._queues:
+            raise ExplainerNotFound(name)
+        request = _Request(instance, params)
+        self._queues[name].put(request)
+        return request.future.result()
+
+    def _collect(self, requests: "queue.Queue[_Request]") -> Optional[List[_Request]]:
+        first = requests.get()
+        if first is None:
+            return None
+        batch = [first]
+        deadline = time.perf_counter() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            timeout = deadline - time.perf_counter()
+            try:
+                request = requests.get(timeout=timeout) if timeout > 0 else requests.get_nowait()
+            except queue.Empty:
+                break
+            if request is None:
+                # explain the collected requests before stopping
+                requests.put(None)
+                break
+            batch.append(request)
+        return batch
+
+    def _work(self, name: str):
+        explainer = self.explainers[name]
+        while True:
+            batch = self._collect(self._queues[name])
+            if batch is None:
+                return
+            groups = dict()
+            for request in batch:
+                groups.setdefault(request.key, []).append(request)
+            for group in groups.values():
+                try:
+                    explanations = explainer.explain_instances([request.instance for request in group],
+                                                               **group[0].params)
+                except Exception as error:
+                    for request in group:
+                        request.future.set_exception(error)
+                    self._record(group, failed=True)
+                    continue
+                for request, explanation in zip(group, explanations):
+                    request.future.set_result(explanation)
+                self._record(group, failed=False)
+
+    def _record(self, group: List[_Request], failed: bool):
+        end = time.perf_counter()
+        with self._lock:
+            self._counters['requests'] += len(group)
+            self._counters['batches'] += 1
+            if failed:
+                self._counters['errors'] += len(group)
+            self._latencies.extend(end - request.start for request in group)
+
+    def stats(self) -> Dict:
+        """
+        Returns the counters of the service
+
+        Returns:
+            A dict with the number of requests, errors and batches, the average batch size, the throughput in
+            requests per second since the start, and the mean, median and 95th percentile latency in seconds
+            of the last 1000 requests
+        """
+        with self._lock:
+            counters = dict(self._counters)
+            latencies = np.array(self._latencies)
+        uptime = time.perf_counter() - self._started
+        counters.update({
+            'average_batch_size': counters['requests'] / counters['batches'] if counters['batches'] > 0 else 0.0,
+            'uptime': uptime,
+            'throughput': counters['requests'] / uptime if uptime > 0 else 0.0,
+            'latency_mean': float(latencies.mean()) if len(latencies) > 0 else 0.0,
+            'latency_p50': float(np.percentile(latencies, 50)) if len(latencies) > 0 else 0.0,
+            'latency_p95': float(np.percentile(latencies, 95)) if len(latencies) > 0 else 0.0
+        })
+        return counters
+
+    def start(self, host: str = '127.0.0.1', port: int = 0) -> Tuple[str, int]:
+        """
+        Serve the explainers over HTTP in a background thread
+
+        Args:
+            host (str): host to bind, default is the local host only
+            port (int): port to bind, default 0 for a free port
+
+        Returns:
+            (tuple) The host and port of the server
+        """
+        self._http_server = _ThreadingHTTPServer((host, port), _make_handler(self))
+        threading.Thread(target=self._http_server.serve_forever, daemon=True).start()
+        return self._http_server.server_address[:2]
+
+    def serve(self, host: str = '127.0.0.1', port: int = DEFAULT_PORT):
+        """
+        Serve the explainers over HTTP until interrupted
+
+        Args:
+            host (str): host to bind, default is the local host only
+            port (int): port to bind
+        """
+        self._http_server = _ThreadingHTTPServer((host, port), _make_handler(self))
+        try:
+            self._http_server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.shutdown()
+
+    def shutdown(self):
+        """
+        Stop the HTTP server and the workers, the queued requests are explained first
+        """
+        if self._http_server is not None:
+            self._http_server.shutdown()
+            self._http_server.server_close()
+            self._http_server = None
+        for requests in self._queues.values():
+            requests.put(None)
+        for worker in self._workers:
+            if worker is not threading.current_thread():
+                worker.join()
+
+
+def _to_json(value):
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, np.generic):
+        return value.item()
+    raise TypeError('%s is not JSON serializable' % type(value).__name__)
+
+
+def _make_handler(server: ExplanationServer):
+
+    class Handler(BaseHTTPRequestHandler):
+
+        def _reply(self, status: int, body: Any):
+            content = json.dumps(body, default=_to_json).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(content)))
+            self.end_headers()
+            self.wfile.write(content)
+
+        def do_GET(self):
+            if self.path == '/stats':
+                self._reply(200, server.stats())
+            elif self.path == '/explainers':
+                self._reply(200, sorted(server.explainers))
+            else:
+                self._reply(404, {'error': 'Unknown path %s' % self.path})
+
+        def do_POST(self):
+            if not self.path.startswith('/explain/'):
+                self._reply(404, {'error': 'Unknown path %s' % self.path})
+                return
+            try:
+                body = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))))
+                instance = body['instance']
+                params = body.get('params', {})
+            except (ValueError, KeyError, TypeError) as error:
+                self._reply(400, {'error': 'Invalid request: %s' % error})
+                return
+            if not isinstance(instance, str):
+                instance = np.asarray(instance)
+            try:
+                explanation = server.explain(self.path[len('/explain/'):], instance, **params)
+            except ExplainerNotFound as error:
+                self._reply(404, {'error': error.message})
+            except Exception as error:
+                self._reply(500, {'error': str(error)})
+            else:
+                # the labels of some explainers are numpy integers
+                self._reply(200, {key.item() if isinstance(key, np.generic) else key: value
+                                  for key, value in explanation.items()})
+
+        def log_message(self, *args):
+            pass
+
+    return Handler
+
+
+def main(argv: Optional[List[str]] = None):
+    """
+    Entry point of the explanation service, e.g.
+    `python -m xai.explainer.server --explainer credit tabular lime credit_explainer.pkl --port 8501`
+    """
+    parser = argparse.ArgumentParser(description='Serve saved explainers over local HTTP')
+    parser.add_argument('--explainer', nargs=4, action='append', required=True,
+                        metavar=('NAME', 'DOMAIN', 'ALGORITHM', 'PATH'), help='a saved explainer to serve')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument('--max-batch-size', type=int, default=DEFAULT_MAX_BATCH_SIZE)
+    parser.add_argument('--max-wait', type=float, default=DEFAULT_MAX_WAIT)
+    args = parser.parse_args(argv)
+
+    explainers = {name: load_explainer(domain, algorithm, path) for name, domain, algorithm, path in args.explainer}
+    ExplanationServer(explainers, max_batch_size=args.max_batch_size,
+                      max_wait=args.max_wait).serve(host=args.host, port=args.port)
+
+
+if __name__ == '__main__':
+    main()
@@ -5,7 +5,6 @@
 
 import warnings
 
-import dill
 import numpy as np
 from lime.lime_tabular import (
     LimeTabularExplainer as OriginalLimeTabularExplainer
@@ -13,12 +12,17 @@ from lime.lime_tabular import (
 from typing import List, Dict, Optional, Callable
 
 from xai.explainer.abstract_explainer import AbstractExplainer
+from xai.explainer.batch import DEFAULT_BATCH_SIZE, explain_in_batches
 from xai.explainer.constants import MODE
 from xai.explainer.explainer_exceptions import (
     ExplainerUninitializedError,
     UnsupportedModeError
 )
-from xai.explainer.utils import explanation_to_json
+from xai.explainer.explanation import FeatureTable
+from xai.explainer.feature_groups import FeatureGroups
+from xai.explainer.prediction_executor import as_executor
+from xai.explainer.serialization import save_state, load_state
+from xai.explainer.utils import explanation_to_compact
 
 NUM_TOP_FEATURES = 5
 
@@ -28,6 +32,7 @@ class LimeTabularExplainer(AbstractExplainer):
     def __init__(self):
         super(LimeTabularExplainer, self).__init__()
         self.available_modes = ['classification', 'regression']
+        self.feature_groups = None
 
     def build_explainer(self, training_data: np.ndarray,
                         predict_fn: Callable[[np.ndarray], np.ndarray],
@@ -44,6 +49,7 @@ class LimeTabularExplainer(AbstractExplainer):
                         discretizer: str = 'quartile',
                         sample_around_instance: bool = False,
                         random_state: Optional[int] = None,
+                        feature_groups: Optional[Dict[str, List[int]]] = None,
                         **kwargs):
         """
         Build the LIME tabular explainer.
@@ -55,7 +61,8 @@ class LimeTabularExplainer(AbstractExplainer):
             training_data (np.ndarray): 2d Numpy array representing the training data 
                 (or some representative subset)
             predict_fn (Callable): A function that takes in a 1D numpy array and outputs a vector
-                of probabilities which should sum to 1.
+                of probabilities which should sum to 1. It can be defined with `async def`, and wrapped in a
+                `xai.explainer.prediction_executor.PredictionExecutor` to predict in chunks concurrently
             feature_names (list): The names of the columns of the training data
             mode (str): Whether the problem is 'classification' or 'regression'
             training_labels (list): Training labels, which can be used by the continuous feature
@@ -76,6 +83,10 @@ class LimeTabularExplainer(AbstractExplainer):
                 being explained. Otherwise, the normal is centered on the mean
                 of the feature data.
             random_state (int): The random seed to generate random numbers during training
+            feature_groups (dict): Mapping of the name of a group to the list of indices of its columns,
+                e.g. the columns of a one-hot encoded category or of an embedding. Each group is perturbed
+                and explained as a single categorical feature, see `xai.explainer.feature_groups.FeatureGroups`.
+                Default is None and each column is a feature
 
         Returns:
             None
@@ -94,7 +105,21 @@ class LimeTabularExplainer(AbstractExplainer):
                 warnings.warn(message='Class names are not specified! Explanations will refer to classes'
                                'by their indices.')
 
-        self.predict_fn = predict_fn
+        self.predict_fn = as_executor(predict_fn)
+        self.num_class = training_data.shape[1]
+        self.feature_groups = None
+        if feature_groups:
+            self.feature_groups = FeatureGroups(feature_groups, training_data.shape[1], feature_names)
+            training_data = self.feature_groups.fit_encode(training_data)
+            feature_names = self.feature_groups.names
+            categorical_features = self.feature_groups.group_index(categorical_features or []) + \
+                self.feature_groups.categorical_features()
+            grouped_mapping = self.feature_groups.categorical_names()
+            for column, mapping in (dict_categorical_mapping or {}).items():
+                for group in self.feature_groups.group_index([column]):
+                    grouped_mapping[group] = mapping
+            dict_categorical_mapping = grouped_mapping
+
         self.explainer_object = OriginalLimeTabularExplainer(
             training_data=training_data,
             mode=mode,
@@ -111,7 +136,6 @@ class LimeTabularExplainer(AbstractExplainer):
             sample_around_instance=sample_around_instance,
             random_state=random_state
         )
-        self.num_class = training_data.shape[1]
         self.mode = mode
 
         if verbose:
@@ -148,43 +172,116 @@ class LimeTabularExplainer(AbstractExplainer):
         """
 
         if self.explainer_object:
-            if top_labels is None and labels is None:
-                top_labels = self.num_class
+            return self._explain_instance(instance, self.predict_fn, num_samples=num_samples,
+                                          num_features=num_features, labels=labels, top_labels=top_labels,
+                                          distance_metric=distance_metric, feature_table=FeatureTable())
+        else:
+            raise ExplainerUninitializedError('This explainer is not yet instantiated! '
+                                              'Please call build_explainer()'
+                                              'first before calling explain_instance.')
 
-            explanation = self.explainer_object.explain_instance(
-                data_row=instance,
+    def explain_instances(self,
+                          instances: List[np.ndarray],
+                          batch_size: int = DEFAULT_BATCH_SIZE,
+                          num_samples: int = 5000,
+                          num_features: Optional[int] = NUM_TOP_FEATURES,
+                          labels: List = None,
+                          top_labels: Optional[int] = None,
+                          distance_metric: str = 'euclidean', **kwargs) -> List[Dict[int, Dict]]:
+        """
+        Explain a batch of prediction instances using the LIME tabular explainer.
+        The perturbed samples of all instances are predicted together, in calls of at most
+        `batch_size` rows.
+
+        Args:
+            instances (list): A list of 1D numpy arrays, each corresponds to a row/single example
+            batch_size (int): Maximum number of rows in a single call of the predict function
+            Other arguments are the same as `explain_instance`
+
+        Returns:
+            (list) A list of mappings of class to explanations, one for each instance
+
+        Raises:
+            ExplainerUninitializedError: Raised if self.explainer_object is None
+        """
+        if self.explainer_object:
+            # the explanations of the batch share a table of their feature names
+            feature_table = FeatureTable()
+            return explain_in_batches(
+                explain_fn=lambda instance, predict_fn: self._explain_instance(
+                    instance, predict_fn, num_samples=num_samples, num_features=num_features, labels=labels,
+                    top_labels=top_labels, distance_metric=distance_metric, feature_table=feature_table),
+                instances=instances,
                 predict_fn=self.predict_fn,
-                labels=labels,
-                top_labels=top_labels,
-                num_features=num_features,
-                num_samples=num_samples,
-                distance_metric=distance_metric
-            )
-
-            if top_labels:
-                labels_to_extract = list(explanation.as_map().keys())
-            else:
-                labels_to_extract = labels
-
-            if self.mode == MODE.CLASSIFICATION:
-                # For a classification model, the predictions are softmax probabilities
-                predictions = explanation.predict_proba
-            else:
-                # For a regression model, the predictions are single scalars
-                predictions = explanation.predicted_value
-
-            return explanation_to_json(explanation, labels_to_extract, predictions, self.mode)
+                batch_size=batch_size,
+                random_state=self.explainer_object.random_state)
         else:
             raise ExplainerUninitializedError('This explainer is not yet instantiated! '
                                               'Please call build_explainer()'
-                                              'first before calling explain_instance.')
+                                              'first before calling explain_instances.')
+
+    def _explain_instance(self, instance: np.ndarray, predict_fn: Callable, num_samples: int,
+                          num_features: Optional[int], labels: Optional[List], top_labels: Optional[int],
+                          distance_metric: str, feature_table: FeatureTable) -> Dict[int, Dict]:
+        """
+        Explain a prediction instance with the given predict function
+        """
+        if top_labels is None and labels is None:
+            top_labels = self.num_class
+
+        if self.feature_groups is not None:
+            predict_fn = self.feature_groups.wrap_predict_fn(predict_fn, instance)
+            instance = self.feature_groups.encode(instance)
+
+        explanation = self.explainer_object.explain_instance(
+            data_row=instance,
+            predict_fn=predict_fn,
+            labels=labels,
+            top_labels=top_labels,
+            num_features=num_features,
+            num_samples=num_samples,
+            distance_metric=distance_metric
+        )
+
+        if top_labels:
+            labels_to_extract = list(explanation.as_map().keys())
+        else:
+            labels_to_extract = labels
+
+        if self.mode == MODE.CLASSIFICATION:
+            # For a classification model, the predictions are softmax probabilities
+            predictions = explanation.predict_proba
+        else:
+            # For a regression model, the predictions are single scalars
+            predictions = explanation.predicted_value
+
+        return explanation_to_compact(explanation, labels_to_extract, predictions, self.mode,
+                                      feature_table=feature_table)
+
+    def set_random_state(self, seed: int):
+        """
+        Seed the random numbers of the next explanations
+
+        Args:
+            seed (int): the random seed
+
+        Returns:
+            None
+        """
+        random_state = np.random.RandomState(seed)
+        self.explainer_object.random_state = random_state
+        self.explainer_object.base.random_state = random_state
+        if self.explainer_object.discretizer is not None:
+            self.explainer_object.discretizer.random_state = random_state
 
-    def save_explainer(self, path: str):
+    def save_explainer(self, path: str, compact: bool = False):
         """
         Save the explainer.
 
         Args:
             path (str): Path to save the explainer
+            compact (bool): Save in the compact format, a directory of memory-mappable arrays and
+                JSON metadata. Default is False for a single dill pickle
 
         Returns:
             None
@@ -193,25 +290,25 @@ class LimeTabularExplainer(AbstractExplainer):
             'explainer_object': self.explainer_object,
             'predict_fn': self.predict_fn,
             'num_class': self.num_class,
-            'mode': self.mode
+            'mode': self.mode,
+            'feature_groups': self.feature_groups
         }
-        with open(path, 'wb') as fp:
-            dill.dump(dict_to_save, fp)
+        save_state(path, dict_to_save, compact=compact, metadata={'explainer': type(self).__name__})
 
     def load_explainer(self, path: str):
         """
         Load the explainer
 
         Args:
-            path (str): Path to load the explainer
+            path (str): Path to load the explainer, in the format detected from the path
 
         Returns:
             None
         """
-        with open(path, 'rb') as fp:
-            dict_loaded = dill.load(fp)
-            self.explainer_object = dict_loaded['explainer_object']
-            self.predict_fn = dict_loaded['predict_fn']
-            self.num_class = dict_loaded['num_class']
-            if 'mode' in dict_loaded:
-                self.mode = dict_loaded['mode']
+        dict_loaded = load_state(path)
+        self.explainer_object = dict_loaded['explainer_object']
+        self.predict_fn = dict_loaded['predict_fn']
+        self.num_class = dict_loaded['num_class']
+        if 'mode' in dict_loaded:
+            self.mode = dict_loaded['mode']
+        self.feature_groups = dict_loaded.get('feature_groups')
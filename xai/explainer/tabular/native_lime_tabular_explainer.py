@@ -0,0 +1,438 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+# Copyright 2019 SAP SE or an SAP affiliate company. All rights reserved
+# ============================================================================
+
+import warnings
+
+import numpy as np
+from typing import List, Dict, Optional, Callable
+
+from xai.explainer.abstract_explainer import AbstractExplainer
+from xai.explainer.batch import DEFAULT_BATCH_SIZE, predict_in_batches
+from xai.explainer.constants import MODE, OUTPUT
+from xai.explainer.explanation import CompactExplanation, FeatureTable
+from xai.explainer.explainer_exceptions import (
+    ExplainerUninitializedError,
+    UnsupportedModeError
+)
+from xai.explainer.serialization import save_state, load_state
+
+NUM_TOP_FEATURES = 5
+DEFAULT_ROUND_SIZE = 500
+DEFAULT_TOLERANCE = 0.05
+
+DICT_DISCRETIZER_TO_PERCENTILES = {
+    'quartile': [25, 50, 75],
+    'decile': [10, 20, 30, 40, 50, 60, 70, 80, 90]
+}
+
+
+class NativeLimeTabularExplainer(AbstractExplainer):
+    """
+    In-house vectorized implementation of the LIME tabular explainer.
+
+    Continuous features are discretized into percentile bins and the interpretable representation
+    of a perturbed sample tells, for each feature, whether it falls in the same bin as the instance.
+    A single binary perturbation design, together with the training rows which replace the switched-off
+    features, is drawn once per call and shared by all the instances explained in that call.
+    Kernel weights are computed for all instances at once and the weighted ridge models of all
+    instances and labels are solved together with batched linear algebra.
+    The `num_features` features with the highest absolute weights are selected and refitted.
+    """
+
+    def __init__(self):
+        super(NativeLimeTabularExplainer, self).__init__()
+        self.available_modes = ['classification', 'regression']
+        self.predict_fn = None
+        self.mode = None
+
+    def build_explainer(self, training_data: np.ndarray,
+                        predict_fn: Callable[[np.ndarray], np.ndarray],
+                        feature_names: Optional[List[str]] = None,
+                        mode: str = MODE.CLASSIFICATION,
+                        categorical_features: Optional[List[int]] = None,
+                        dict_categorical_mapping: Optional[Dict[int, List[str]]] = None,
+                        kernel_width: Optional[float] = None,
+                        verbose: bool = False,
+                        class_names: Optional[List[str]] = None,
+                        discretizer: str = 'quartile',
+                        random_state: Optional[int] = None,
+                        **kwargs):
+        """
+        Build the native LIME tabular explainer.
+        The parameters follow those of `LimeTabularExplainer`, the other parameters of the original
+        LIME explainer are ignored.
+
+        Args:
+            training_data (np.ndarray): 2d Numpy array representing the training data
+                (or some representative subset)
+            predict_fn (Callable): A function that takes in a 2D numpy array and outputs a vector
+                of probabilities which should sum to 1 for each row.
+            feature_names (list): The names of the columns of the training data
+            mode (str): Whether the problem is 'classification' or 'regression'
+            categorical_features (list): Integer list indicating the indices of categorical features
+            dict_categorical_mapping (dict): Mapping of integer index of categorical feature
+                (same as from categorical_features) to a list of values for that column.
+                So dict_categorical_mapping[x][y] is the yth value of column x.
+            kernel_width (float): Width of the exponential kernel, default is 0.75 * sqrt(number of features)
+            verbose (bool): Control verbosity
+            class_names (list): Class names (positional index corresponding to class index)
+            discretizer (str): Type of discretization of continuous features, 'quartile' or 'decile'
+            random_state (int): The random seed to generate the perturbation design
+
+        Returns:
+            None
+        """
+        if mode not in self.available_modes:
+            msg = 'Mode must be one of {}! Failed to build explainer'.format(
+                self.available_modes)
+            raise UnsupportedModeError(msg)
+
+        if discretizer not in DICT_DISCRETIZER_TO_PERCENTILES:
+            raise ValueError('Discretizer must be one of {}'.format(list(DICT_DISCRETIZER_TO_PERCENTILES.keys())))
+
+        if verbose and not feature_names:
+            warnings.warn(message='Column names are not specified! Explanations will '
+                                  'refer to columns by their indices.')
+
+        training_data = np.asarray(training_data, dtype=np.float64)
+        num_features = training_data.shape[1]
+        categorical_features = list(categorical_features or [])
+        dict_categorical_mapping = dict_categorical_mapping or dict()
+        if feature_names is None:
+            feature_names = [str(idx) for idx in range(num_features)]
+
+        bins = dict()
+        names = dict()
+        for feature in range(num_features):
+            name = feature_names[feature]
+            if feature in categorical_features:
+                values = np.unique(training_data[:, feature])
+                bins[feature] = values
+                names[feature] = ['%s=%s' % (name, dict_categorical_mapping[feature][int(value)]
+                                  if feature in dict_categorical_mapping else value) for value in values]
+            else:
+                qts = np.unique(np.percentile(training_data[:, feature],
+                                              DICT_DISCRETIZER_TO_PERCENTILES[discretizer]))
+                bins[feature] = qts
+                names[feature] = ['%s <= %.2f' % (name, qts[0])]
+                for i in range(len(qts) - 1):
+                    names[feature].append('%.2f < %s <= %.2f' % (qts[i], name, qts[i + 1]))
+                names[feature].append('%s > %.2f' % (name, qts[-1]))
+
+        self.explainer_object = {
+            'training_data': training_data,
+            'feature_names': feature_names,
+            'categorical_features': categorical_features,
+            'bins': bins,
+            'names': names,
+            'kernel_width': np.sqrt(num_features) * 0.75 if kernel_width is None else float(kernel_width),
+            'class_names': class_names
+        }
+        self.explainer_object['training_bins'] = self._discretize(training_data)
+        self.random_state = np.random.RandomState(random_state)
+        self.predict_fn = predict_fn
+        self.mode = mode
+
+        if verbose:
+            warnings.warn(message='Explainer built successfully!')
+
+    def _discretize(self, data: np.ndarray) -> np.ndarray:
+        """
+        Map each value of a 2D array to the index of its bin
+        """
+        discretized = np.empty(data.shape, dtype=np.int64)
+        for feature, bins in self.explainer_object['bins'].items():
+            if feature in self.explainer_object['categorical_features']:
+                # unseen categorical values do not match any training value
+                codes = np.searchsorted(bins, data[..., feature])
+                known = (codes < len(bins)) & (bins[np.minimum(codes, len(bins) - 1)] == data[..., feature])
+                discretized[..., feature] = np.where(known, codes, -1)
+            else:
+                discretized[..., feature] = np.searchsorted(bins, data[..., feature])
+        return discretized
+
+    def explain_instance(self,
+                         instance: np.ndarray,
+                         num_samples: int = 5000,
+                         num_features: Optional[int] = NUM_TOP_FEATURES,
+                         labels: List = None,
+                         top_labels: Optional[int] = None,
+                         adaptive: bool = False,
+                         round_size: int = DEFAULT_ROUND_SIZE,
+                         tolerance: float = DEFAULT_TOLERANCE, **kwargs) -> Dict:
+        """
+        Explain a prediction instance using the native LIME tabular explainer.
+
+        Args:
+            instance (np.ndarray): A 1D numpy array corresponding to a row/single example
+            num_samples (int): The number of perturbed samples to train the LIME model with,
+                which is the maximum number of samples if `adaptive` is True
+            num_features (int): Number of features to include in an explanation
+            labels (list): The list of class indexes to produce explanations for, default is None and
+                explain all labels.
+            top_labels (int): If not None, this overwrites labels and the explainer instead produces
+                explanations for the top k classes
+            adaptive (bool): If True, draw the perturbed samples in rounds of `round_size` and stop once
+                the explanation is stable
+            round_size (int): Number of perturbed samples drawn in each round of the adaptive mode
+            tolerance (float): The adaptive mode stops once the top features of every label are unchanged
+                by a round and the largest change of the weights is within `tolerance` times the largest weight
+
+        Returns:
+            (dict) A mapping of class to explanations, in the format of `LimeTabularExplainer`.
+            The number of perturbed samples used is reported in `OUTPUT.NUM_SAMPLES`.
+
+        Raises:
+            ExplainerUninitializedError: Raised if self.explainer_object is None
+        """
+        return self.explain_instances([instance], num_samples=num_samples, num_features=num_features,
+                                      labels=labels, top_labels=top_labels, adaptive=adaptive,
+                                      round_size=round_size, tolerance=tolerance)[0]
+
+    def explain_instances(self,
+                          instances: List[np.ndarray],
+                          batch_size: int = DEFAULT_BATCH_SIZE,
+                          num_samples: int = 5000,
+                          num_features: Optional[int] = NUM_TOP_FEATURES,
+                          labels: List = None,
+                          top_labels: Optional[int] = None,
+                          adaptive: bool = False,
+                          round_size: int = DEFAULT_ROUND_SIZE,
+                          tolerance: float = DEFAULT_TOLERANCE, **kwargs) -> List[Dict]:
+        """
+        Explain a batch of prediction instances using the native LIME tabular explainer.
+        The instances share the same perturbation design, and the instances of which the perturbed
+        samples of a round fit in `batch_size` rows are predicted and solved together.
+
+        Args:
+            instances (list): A list of 1D numpy arrays, each corresponds to a row/single example
+            batch_size (int): Maximum number of rows in a single call of the predict function
+            Other arguments are the same as `explain_instance`
+
+        Returns:
+            (list) A list of mappings of class to explanations, one for each instance
+
+        Raises:
+            ExplainerUninitializedError: Raised if self.explainer_object is None
+        """
+        if not self.explainer_object:
+            raise ExplainerUninitializedError('This explainer is not yet instantiated! '
+                                              'Please call build_explainer()'
+                                              'first before calling explain_instance.')
+
+        training_data = self.explainer_object['training_data']
+        num_total_features = training_data.shape[1]
+        if num_features is None:
+            num_features = num_total_features
+        num_features = min(num_features, num_total_features)
+
+        if adaptive:
+            round_sizes = [round_size] * (num_samples // round_size)
+            if num_samples % round_size:
+                round_sizes.append(num_samples % round_size)
+        else:
+            round_sizes = [num_samples]
+
+        # the shared design: which features keep the instance value, and which training rows replace the others.
+        # Rounds are drawn on first use and shared by all the groups of instances
+        rounds = []
+
+        def get_round(idx):
+            while len(rounds) <= idx:
+                size = round_sizes[len(rounds)]
+                design = self.random_state.randint(0, 2, size=(size, num_total_features)).astype(bool)
+                if len(rounds) == 0:
+                    design[0] = True
+                replacements = self.random_state.randint(0, training_data.shape[0], size=size)
+                rounds.append((design, replacements))
+            return rounds[idx]
+
+        instances = np.atleast_2d(np.asarray(instances, dtype=np.float64))
+        group_size = max(1, batch_size // round_sizes[0])
+        # the explanations of the batch share a table of their feature names
+        feature_table = FeatureTable()
+        explanations = []
+        for start in range(0, len(instances), group_size):
+            explanations += self._explain_group(instances[start:start + group_size], get_round, len(round_sizes),
+                                                batch_size=batch_size, num_features=num_features,
+                                                labels=labels, top_labels=top_labels, tolerance=tolerance,
+                                                feature_table=feature_table)
+        return explanations
+
+    def _explain_group(self, instances: np.ndarray, get_round: Callable, num_rounds: int,
+                       batch_size: int, num_features: int, labels: Optional[List],
+                       top_labels: Optional[int], tolerance: float, feature_table: FeatureTable) -> List[Dict]:
+        """
+        Explain a group of instances with one batched prediction and one batched ridge solve per round.
+        The weighted ridge problems are accumulated as normal equations, so that the samples of a round
+        are not kept after the round and the selected features are refitted from the same statistics.
+        """
+        training_data = self.explainer_object['training_data']
+        num_instances, num_total_features = instances.shape
+        instance_bins = self._discretize(instances)
+
+        gram = np.zeros((num_instances, num_total_features + 1, num_total_features + 1))
+        rhs = None
+        predictions = None
+        samples_used = np.zeros(num_instances, dtype=int)
+        previous_selected = None
+        previous_coefs = None
+        active = np.arange(num_instances)
+
+        for round_idx in range(num_rounds):
+            design, replacements = get_round(round_idx)
+            num_samples = len(design)
+
+            # perturbed samples and their interpretable representation, (instances, samples, features)
+            samples = np.where(design[None, :, :], instances[active, None, :],
+                               training_data[replacements][None, :, :])
+            binary = design[None, :, :] | (self.explainer_object['training_bins'][replacements][None, :, :] ==
+                                           instance_bins[active, None, :])
+            binary = np.concatenate([binary, np.ones(binary.shape[:-1] + (1,), dtype=bool)], axis=-1)
+            binary = binary.astype(np.float64)
+
+            outputs = np.concatenate(predict_in_batches(self.predict_fn,
+                                                        [samples.reshape(-1, num_total_features)],
+                                                        batch_size=batch_size))
+            outputs = outputs.reshape(len(active), num_samples, -1)
+            if round_idx == 0:
+                # the first sample of the first round is the instance itself
+                predictions = outputs[:, 0]
+                rhs = np.zeros((num_instances, num_total_features + 1, outputs.shape[2]))
+
+            distances = np.sqrt(num_total_features + 1 - binary.sum(axis=2))
+            weights = np.sqrt(np.exp(-distances ** 2 / self.explainer_object['kernel_width'] ** 2))
+            weighted = binary * weights[..., None]
+            gram[active] += np.einsum('asi,asj->aij', weighted, binary)
+            rhs[active] += np.einsum('asi,asl->ail', weighted, outputs)
+            samples_used[active] += num_samples
+
+            if num_rounds > 1:
+                coefs = self._solve(gram[active], rhs[active])
+                selected = np.argsort(-np.abs(coefs[:, :-1, :]), axis=1, kind='stable')[:, :num_features, :]
+                if previous_selected is not None:
+                    change = np.abs(coefs - previous_coefs[active])[:, :-1, :].max(axis=(1, 2))
+                    scale = np.abs(coefs[:, :-1, :]).max(axis=(1, 2))
+                    converged = np.all(selected == previous_selected[active], axis=(1, 2)) & \
+                        (change <= tolerance * scale)
+                else:
+                    previous_selected = np.zeros((num_instances,) + selected.shape[1:], dtype=int)
+                    previous_coefs = np.zeros((num_instances,) + coefs.shape[1:])
+                    converged = np.zeros(len(active), dtype=bool)
+                previous_selected[active] = selected
+                previous_coefs[active] = coefs
+                active = active[~converged]
+                if len(active) == 0:
+                    break
+
+        # fit on all features, keep the highest absolute weights for each label and refit on them
+        coefs = self._solve(gram, rhs)
+        selected = np.argsort(-np.abs(np.moveaxis(coefs[:, :-1, :], 2, 1)), axis=2, kind='stable')[..., :num_features]
+        columns = np.concatenate([selected, np.full(selected.shape[:-1] + (1,), num_total_features)], axis=-1)
+        num_labels = rhs.shape[2]
+        instance_idx = np.arange(num_instances)[:, None, None]
+        selected_gram = gram[instance_idx[..., None], columns[..., :, None], columns[..., None, :]]
+        selected_rhs = rhs[instance_idx, columns, np.arange(num_labels)[None, :, None]]
+        coefs = self._solve(selected_gram, selected_rhs[..., None])[..., 0]
+
+        explanations = []
+        for idx in range(num_instances):
+            feature_names = feature_table.indices(
+                [self._bin_name(feature, instance_bins[idx, feature], instances[idx, feature])
+                 for feature in range(num_total_features)])
+
+            if self.mode == MODE.CLASSIFICATION:
+                if top_labels:
+                    labels_to_extract = list(np.argsort(predictions[idx])[::-1][:top_labels])
+                elif labels is None:
+                    labels_to_extract = list(range(len(predictions[idx])))
+                else:
+                    labels_to_extract = labels
+                labels_to_extract = [int(label) for label in labels_to_extract]
+            else:
+                labels_to_extract = [0]
+            orders = [np.argsort(-coefs[idx, label, :-1], kind='stable') for label in labels_to_extract]
+            explanations.append(CompactExplanation(
+                feature_table,
+                labels_to_extract if self.mode == MODE.CLASSIFICATION else None,
+                [predictions[idx, label] for label in labels_to_extract],
+                [feature_names[selected[idx, label][order]] for label, order in zip(labels_to_extract, orders)],
+                [coefs[idx, label, :-1][order] for label, order in zip(labels_to_extract, orders)],
+                mode=self.mode, info={OUTPUT.NUM_SAMPLES: int(samples_used[idx])}))
+        return explanations
+
+    @staticmethod
+    def _solve(gram: np.ndarray, rhs: np.ndarray, alpha: float = 1.0) -> np.ndarray:
+        """
+        Solve weighted ridge regressions with an unpenalized intercept from their normal equations in one batch
+
+        Args:
+            gram: weighted gram matrices of the interpretable representation with the intercept column last,
+                (..., features + 1, features + 1)
+            rhs: weighted products of the representation and the model outputs, (..., features + 1, outputs)
+            alpha: ridge penalty
+
+        Returns:
+            Coefficients with the intercept last, (..., features + 1, outputs)
+        """
+        penalty = np.full(gram.shape[-1], alpha)
+        penalty[-1] = 0
+        return np.linalg.solve(gram + np.diag(penalty), rhs)
+
+    def _bin_name(self, feature: int, code: int, value: float) -> str:
+        """
+        Name the interpretable feature of the bin that an instance value falls in
+        """
+        if code < 0:
+            return '%s=%s' % (self.explainer_object['feature_names'][feature], value)
+        return self.explainer_object['names'][feature][code]
+
+    def set_random_state(self, seed: int):
+        """
+        Seed the random numbers of the next explanations
+
+        Args:
+            seed (int): the random seed
+
+        Returns:
+            None
+        """
+        self.random_state = np.random.RandomState(seed)
+
+    def save_explainer(self, path: str, compact: bool = False):
+        """
+        Save the explainer.
+
+        Args:
+            path (str): Path to save the explainer
+            compact (bool): Save in the compact format, a directory of memory-mappable arrays and
+                JSON metadata. Default is False for a single dill pickle
+
+        Returns:
+            None
+        """
+        dict_to_save = {
+            'explainer_object': self.explainer_object,
+            'random_state': self.random_state,
+            'predict_fn': self.predict_fn,
+            'mode': self.mode
+        }
+        save_state(path, dict_to_save, compact=compact, metadata={'explainer': type(self).__name__})
+
+    def load_explainer(self, path: str):
+        """
+        Load the explainer
+
+        Args:
+            path (str): Path to load the explainer, in the format detected from the path
+
+        Returns:
+            None
+        """
+        dict_loaded = load_state(path)
+        self.explainer_object = dict_loaded['explainer_object']
+        self.random_state = dict_loaded['random_state']
+        self.predict_fn = dict_loaded['predict_fn']
+        self.mode = dict_loaded['mode']
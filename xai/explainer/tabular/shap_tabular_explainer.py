@@ -3,16 +3,23 @@
 # Copyright 2019 SAP SE or an SAP affiliate company. All rights reserved
 # ============================================================================
 
+import copy
 import warnings
 
-import dill
 import numpy as np
 import shap
 from typing import Optional, Callable, Any, List, Dict
 
 from xai.explainer.abstract_explainer import AbstractExplainer
+from xai.explainer.background import summarize_background, background_error, to_dense_data
+from xai.explainer.batch import DEFAULT_BATCH_SIZE, explain_in_batches
+from xai.explainer.constants import BACKGROUND
 from xai.explainer.explainer_exceptions import ExplainerUninitializedError
-from xai.explainer.utils import parse_shap_values
+from xai.explainer.explanation import FeatureTable
+from xai.explainer.feature_groups import FeatureGroups
+from xai.explainer.prediction_executor import as_executor
+from xai.explainer.serialization import save_state, load_state
+from xai.explainer.utils import shap_values_to_compact
 
 NUM_TOP_FEATURES = 5
 
@@ -22,16 +29,31 @@ class SHAPTabularExplainer(AbstractExplainer):
     def __init__(self):
         super(SHAPTabularExplainer, self).__init__()
         self.feature_names = None
+        self.feature_groups = None
+        self.background_error = None
 
     def build_explainer(self,
                         training_data: Any,
                         predict_fn: Callable,
                         feature_names: List[str] = None,
+                        background_size: Optional[int] = None,
+                        background_method: str = BACKGROUND.KMEANS,
+                        training_labels: Optional[List] = None,
+                        random_state: Optional[int] = None,
+                        feature_groups: Optional[Dict[str, List[int]]] = None,
                         **kwargs):
         """
         Builds the SHAP kernel explainer
         See https://shap.readthedocs.io/en/latest/#shap.KernelExplainer for additional details
 
+        The cost of Kernel SHAP grows linearly with the size of the background dataset, so a large
+        training data should be summarized with `background_size`. The error of the summed attributions
+        caused by the summary is estimated and kept in `background_error`.
+
+        The cost also grows with the number of features, and the columns of a one-hot encoded category or of
+        an embedding can be grouped with `feature_groups`, so that each group is perturbed and attributed
+        as a single feature.
+
         Args:
             training_data (numpy.array or pandas.DataFrame or shap.common.DenseData or
                 any scipy.sparse matrix): The background dataset to use for integrating
@@ -39,7 +61,17 @@ class SHAPTabularExplainer(AbstractExplainer):
             predict_fn (Callable): User supplied function that takes a matrix of samples
                 (# samples x # features) and computes a the output of the model for those samples.
                 The output can be a vector (# samples) or a matrix (# samples x # model outputs).
+                It can be defined with `async def`, and wrapped in a
+                `xai.explainer.prediction_executor.PredictionExecutor` to predict in chunks concurrently
             feature_names (list): List of feature names corresponding to the data
+            background_size (int): Number of rows to summarize the training data into.
+                Default is None and the full training data is used as background
+            background_method (str): Summarization method, 'kmeans', 'stratified' or 'sample'.
+                See `xai.explainer.background.summarize_background`
+            training_labels (list): Training labels, used by the stratified summarization
+            random_state (int): The random seed of the sampling summarization methods
+            feature_groups (dict): Mapping of the name of a group to the list of indices of its columns,
+                see `xai.explainer.helper.parse_feature_groups`. Default is None and each column is a feature
 
         Returns:
             None
@@ -48,9 +80,27 @@ class SHAPTabularExplainer(AbstractExplainer):
         if feature_names is not None:
             feature_names = list(feature_names)
         self.feature_names = feature_names
-        self.predict_fn = predict_fn
+        self.predict_fn = as_executor(predict_fn)
+        self.background_error = None
+        self.feature_groups = None
+        if feature_groups:
+            training_data = np.asarray(training_data)
+            self.feature_groups = FeatureGroups(feature_groups, training_data.shape[1], feature_names)
+
+        if background_size is not None and len(training_data) > background_size:
+            training_data = np.asarray(training_data)
+            background_data, background_weights = summarize_background(
+                training_data, size=background_size, method=background_method,
+                training_labels=training_labels, random_state=random_state)
+            self.background_error = background_error(self.predict_fn, training_data,
+                                                     background_data, background_weights,
+                                                     random_state=random_state)
+            training_data = to_dense_data(background_data, background_weights, self.feature_groups)
+        elif self.feature_groups is not None:
+            training_data = to_dense_data(training_data, np.ones(len(training_data)), self.feature_groups)
+
         self.explainer_object = shap.KernelExplainer(
-            model=predict_fn,
+            model=self.predict_fn,
             data=training_data)
 
     def explain_instance(self,
@@ -78,31 +128,96 @@ class SHAPTabularExplainer(AbstractExplainer):
             warnings.warn(message='SHAP default number of samples[{}]'.format(num_samples))
 
         if self.explainer_object:
-            if len(instance.shape) != 2:
-                instance = instance.reshape([1, -1])
-
-            confidences = list(np.array(self.predict_fn(instance)).ravel())
-
-            explanation = self.explainer_object.shap_values(
-                X=instance,
-                nsamples=num_samples,
-                l1_reg='num_features({})'.format(NUM_TOP_FEATURES)
-            )
-            return parse_shap_values(shap_values=explanation,
-                                     confidences=confidences,
-                                     feature_names=self.feature_names,
-                                     feature_values=list(instance.ravel()))
+            return self._explain_instance(instance, self.predict_fn, num_samples=num_samples,
+                                          feature_table=FeatureTable())
         else:
             raise ExplainerUninitializedError('This explainer is not yet instantiated! '
                                               'Please call build_explainer()'
                                               'first before calling explain_instance.')
 
-    def save_explainer(self, path: str):
+    def explain_instances(self,
+                          instances: List[np.ndarray],
+                          batch_size: int = DEFAULT_BATCH_SIZE,
+                          num_samples: Optional[int] = None,
+                          num_features: int = NUM_TOP_FEATURES, **kwargs) -> List[Dict[int, Dict]]:
+        """
+        Estimate the SHAP values for a batch of samples.
+        The synthetic samples of all instances are predicted together, in calls of at most
+        `batch_size` rows. The global numpy random state is seeded for each instance with a seed drawn
+        in order, so the estimates do not depend on the batching, but differ from those of `explain_instance`.
+
+        Args:
+            instances (list): A list of 1D numpy arrays, each corresponds to a row/single example
+            batch_size (int): Maximum number of rows in a single call of the predict function
+            Other arguments are the same as `explain_instance`
+
+        Returns:
+            (list) A list of mappings of class to explanations, one for each instance
+
+        Raises:
+            ExplainerUninitializedError: Raised if self.explainer_object is None
+        """
+        if num_samples is None:
+            num_samples = 'auto'
+            warnings.warn(message='SHAP default number of samples[{}]'.format(num_samples))
+
+        if self.explainer_object:
+            # the explanations of the batch share a table of their feature names
+            feature_table = FeatureTable()
+            # KernelExplainer predicts the instance before it draws the coalitions from the global numpy random
+            # state, so each instance is seeded
+            return explain_in_batches(
+                explain_fn=lambda instance, predict_fn: self._explain_instance(instance, predict_fn,
+                                                                               num_samples=num_samples,
+                                                                               feature_table=feature_table),
+                instances=instances,
+                predict_fn=self.predict_fn,
+                batch_size=batch_size,
+                random_state=np.random,
+                seed_each=True)
+        else:
+            raise ExplainerUninitializedError('This explainer is not yet instantiated! '
+                                              'Please call build_explainer()'
+                                              'first before calling explain_instances.')
+
+    def _explain_instance(self, instance: np.ndarray, predict_fn: Callable, num_samples,
+                          feature_table: FeatureTable) -> Dict[int, Dict]:
+        """
+        Estimate the SHAP values for a sample with the given predict function
+        """
+        if len(instance.shape) != 2:
+            instance = instance.reshape([1, -1])
+
+        confidences = list(np.array(predict_fn(instance)).ravel())
+
+        # KernelExplainer keeps the state of an explanation, a copy with its own model is used for each call
+        explainer = copy.copy(self.explainer_object)
+        explainer.model = copy.copy(self.explainer_object.model)
+        explainer.model.f = predict_fn
+        explanation = explainer.shap_values(
+            X=instance,
+            nsamples=num_samples,
+            l1_reg='num_features({})'.format(NUM_TOP_FEATURES)
+        )
+        if self.feature_groups is not None:
+            return shap_values_to_compact(shap_values=explanation,
+                                          confidences=confidences,
+                                          feature_names=self.feature_groups.labels(instance),
+                                          feature_table=feature_table)
+        return shap_values_to_compact(shap_values=explanation,
+                                      confidences=confidences,
+                                      feature_names=self.feature_names,
+                                      feature_values=list(instance.ravel()),
+                                      feature_table=feature_table)
+
+    def save_explainer(self, path: str, compact: bool = False):
         """
         Save the explainer.
 
         Args:
             path (str): Path to save the explainer
+            compact (bool): Save in the compact format, a directory of memory-mappable arrays and
+                JSON metadata. Default is False for a single dill pickle
 
         Returns:
             None
@@ -110,22 +225,24 @@ class SHAPTabularExplainer(AbstractExplainer):
         dict_to_save = {
             'explainer_object': self.explainer_object,
             'feature_names': self.feature_names,
+            'feature_groups': self.feature_groups,
+            'background_error': self.background_error
         }
-        with open(path, 'wb') as fp:
-            dill.dump(dict_to_save, fp)
+        save_state(path, dict_to_save, compact=compact, metadata={'explainer': type(self).__name__})
 
     def load_explainer(self, path: str):
         """
         Load the explainer
 
         Args:
-            path (str): Path to load the explainer
+            path (str): Path to load the explainer, in the format detected from the path
 
         Returns:
             None
         """
-        with open(path, 'rb') as fp:
-            dict_loaded = dill.load(fp)
-            self.explainer_object = dict_loaded['explainer_object']
-            self.feature_names = dict_loaded['feature_names']
-            self.predict_fn = self.explainer_object.model.f
+        dict_loaded = load_state(path)
+        self.explainer_object = dict_loaded['explainer_object']
+        self.feature_names = dict_loaded['feature_names']
+        self.feature_groups = dict_loaded.get('feature_groups')
+        self.background_error = dict_loaded.get('background_error')
+        self.predict_fn = self.explainer_object.model.f
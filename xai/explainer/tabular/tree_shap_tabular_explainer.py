@@ -0,0 +1,210 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+# Copyright 2019 SAP SE or an SAP affiliate company. All rights reserved
+# ============================================================================
+
+import numpy as np
+import shap
+from typing import Optional, Callable, Any, List, Dict
+
+from xai.explainer.abstract_explainer import AbstractExplainer
+from xai.explainer.batch import DEFAULT_BATCH_SIZE
+from xai.explainer.constants import MODE
+from xai.explainer.explainer_exceptions import (
+    ExplainerUninitializedError,
+    UnsupportedModeError
+)
+from xai.explainer.explanation import FeatureTable
+from xai.explainer.helper import get_model
+from xai.explainer.serialization import save_state, load_state
+from xai.explainer.utils import attributions_to_compact
+
+NUM_TOP_FEATURES = 5
+
+
+class TreeSHAPTabularExplainer(AbstractExplainer):
+    """
+    Exact SHAP values for tree ensembles (scikit-learn trees and forests, gradient boosting, XGBoost,
+    LightGBM and CatBoost) with shap.TreeExplainer.
+    The SHAP values are computed from the tree structure in polynomial time, without calling the model on
+    perturbed samples, and a whole batch of instances is explained in one call.
+    The scores are in the raw output space of the model, e.g. probabilities for a random forest and
+    log-odds for a gradient boosting classifier.
+    """
+
+    def __init__(self):
+        super(TreeSHAPTabularExplainer, self).__init__()
+        self.available_modes = ['classification', 'regression']
+        self.feature_names = None
+        self.predict_fn = None
+        self.mode = None
+
+    def build_explainer(self,
+                        training_data: Any = None,
+                        predict_fn: Optional[Callable] = None,
+                        feature_names: List[str] = None,
+                        model: Any = None,
+                        mode: Optional[str] = None,
+                        feature_perturbation: str = 'tree_path_dependent',
+                        **kwargs):
+        """
+        Builds the tree SHAP explainer
+        See https://shap.readthedocs.io/en/latest/generated/shap.TreeExplainer.html for additional details
+
+        Args:
+            training_data (numpy.array or pandas.DataFrame): Background dataset, only used when
+                `feature_perturbation` is 'interventional'
+            predict_fn (Callable): Function computes the confidences (classification) or values (regression)
+                reported as predictions. It is also used to find the model if `model` is not given,
+                e.g. `clf.predict_proba`
+            feature_names (list): List of feature names corresponding to the data
+            model: The tree model. Default is None and the model of `predict_fn` is used
+            mode (str): Whether the problem is 'classification' or 'regression'. Default is None and
+                the mode is inferred from the model
+            feature_perturbation (str): 'tree_path_dependent' to use the training data coverage stored in the
+                trees, which is the fastest, or 'interventional' to integrate over `training_data`
+
+        Returns:
+            None
+        """
+        if model is None:
+            model = get_model(predict_fn)
+        if mode is None:
+            mode = MODE.CLASSIFICATION if hasattr(model, 'classes_') else MODE.REGRESSION
+        if mode not in self.available_modes:
+            msg = 'Mode must be one of {}! Failed to build explainer'.format(
+                self.available_modes)
+            raise UnsupportedModeError(msg)
+
+        if feature_names is not None:
+            feature_names = list(feature_names)
+        self.feature_names = feature_names
+        self.mode = mode
+        if predict_fn is None or predict_fn is model:
+            predict_fn = model.predict_proba if mode == MODE.CLASSIFICATION else model.predict
+        self.predict_fn = predict_fn
+        if feature_perturbation == 'interventional':
+            self.explainer_object = shap.TreeExplainer(model=model, data=training_data,
+                                                       feature_perturbation=feature_perturbation)
+        else:
+            self.explainer_object = shap.TreeExplainer(model=model, feature_perturbation=feature_perturbation)
+
+    def explain_instance(self,
+                         instance: np.ndarray,
+                         num_features: int = NUM_TOP_FEATURES,
+                         labels: List = None,
+                         top_labels: Optional[int] = None, **kwargs) -> Dict:
+        """
+        Compute the SHAP values for a sample
+
+        Args:
+            instance (np.ndarray): A 1D numpy array corresponding to a row/single example
+            num_features (int): Number of features to include in an explanation
+            labels (list): The list of class indexes to produce explanations for, default is None and
+                explain all labels.
+            top_labels (int): If not None, this overwrites labels and the explainer instead produces
+                explanations for the top k classes
+
+        Returns:
+            (dict) A mapping of class to explanations
+
+        Raises:
+            ExplainerUninitializedError: Raised if self.explainer_object is None
+        """
+        return self.explain_instances([instance], num_features=num_features, labels=labels,
+                                      top_labels=top_labels)[0]
+
+    def explain_instances(self,
+                          instances: List[np.ndarray],
+                          batch_size: int = DEFAULT_BATCH_SIZE,
+                          num_features: int = NUM_TOP_FEATURES,
+                          labels: List = None,
+                          top_labels: Optional[int] = None, **kwargs) -> List[Dict]:
+        """
+        Compute the SHAP values for a batch of samples, `batch_size` rows at a time
+
+        Args:
+            instances (list): A list of 1D numpy arrays, each corresponds to a row/single example
+            batch_size (int): Maximum number of rows explained in a single call
+            Other arguments are the same as `explain_instance`
+
+        Returns:
+            (list) A list of mappings of class to explanations, one for each instance
+
+        Raises:
+            ExplainerUninitializedError: Raised if self.explainer_object is None
+        """
+        if not self.explainer_object:
+            raise ExplainerUninitializedError('This explainer is not yet instantiated! '
+                                              'Please call build_explainer()'
+                                              'first before calling explain_instance.')
+
+        instances = np.atleast_2d(np.asarray(instances))
+        feature_names = self.feature_names or [str(idx) for idx in range(instances.shape[1])]
+        explanations = []
+        for start in range(0, len(instances), batch_size):
+            batch = instances[start:start + batch_size]
+            # the explanations of a batch share a table of their feature names
+            feature_table = FeatureTable()
+            attributions = self._shap_values(batch)
+            predictions = np.asarray(self.predict_fn(batch)).reshape(len(batch), -1)
+            for idx in range(len(batch)):
+                explanations.append(attributions_to_compact(attributions[idx], predictions[idx],
+                                                            feature_names=feature_names,
+                                                            feature_values=list(batch[idx]),
+                                                            mode=self.mode, num_features=num_features,
+                                                            labels=labels, top_labels=top_labels,
+                                                            feature_table=feature_table))
+        return explanations
+
+    def _shap_values(self, batch: np.ndarray) -> np.ndarray:
+        """
+        Compute the SHAP values of a batch as an array of (samples, outputs, features)
+        """
+        values = self.explainer_object.shap_values(batch, check_additivity=False)
+        if isinstance(values, list):
+            values = np.stack(values, axis=1)
+        elif values.ndim == 3:
+            values = np.moveaxis(values, 2, 1)
+        else:
+            values = values[:, None, :]
+        if self.mode == MODE.CLASSIFICATION and values.shape[1] == 1:
+            # binary classifiers explained on a single margin output, e.g. gradient boosting
+            values = np.concatenate([-values, values], axis=1)
+        return values
+
+    def save_explainer(self, path: str, compact: bool = False):
+        """
+        Save the explainer.
+
+        Args:
+            path (str): Path to save the explainer
+            compact (bool): Save in the compact format, a directory of memory-mappable arrays and
+                JSON metadata. Default is False for a single dill pickle
+
+        Returns:
+            None
+        """
+        dict_to_save = {
+            'explainer_object': self.explainer_object,
+            'feature_names': self.feature_names,
+            'predict_fn': self.predict_fn,
+            'mode': self.mode
+        }
+        save_state(path, dict_to_save, compact=compact, metadata={'explainer': type(self).__name__})
+
+    def load_explainer(self, path: str):
+        """
+        Load the explainer
+
+        Args:
+            path (str): Path to load the explainer, in the format detected from the path
+
+        Returns:
+            None
+        """
+        dict_loaded = load_state(path)
+        self.explainer_object = dict_loaded['explainer_object']
+        self.feature_names = dict_loaded['feature_names']
+        self.predict_fn = dict_loaded['predict_fn']
+        self.mode = dict_loaded['mode']
@@ -3,25 +3,38 @@
 # Copyright 2019 SAP SE or an SAP affiliate company. All rights reserved
 # ============================================================================
 
+import copy
 import warnings
 from typing import List, Optional, Callable, Dict
 
-import dill
 import numpy as np
 from lime.lime_text import LimeTextExplainer as OriginalLimeTextExplainer
 
 from ..abstract_explainer import AbstractExplainer
+from ..batch import DEFAULT_BATCH_SIZE, explain_in_batches
 from ..explainer_exceptions import ExplainerUninitializedError
-from ..utils import explanation_to_json
-from ..constants import MODE
+from ..explanation import FeatureTable
+from ..prediction_executor import as_executor
+from ..serialization import save_state, load_state
+from ..utils import explanation_to_compact
+from ..constants import MODE, OUTPUT
+from .segmentation import split_segments, segment_splitter, word_splitter, SEGMENT_SEPARATOR
 
 NUM_TOP_FEATURES = 5
+MAX_SEGMENTS = 20
+NUM_TOP_SEGMENTS = 3
+NUM_SEGMENT_SAMPLES = 1000
 
 
 class LimeTextExplainer(AbstractExplainer):
 
     def __init__(self):
         super(LimeTextExplainer, self).__init__()
+        self.hierarchical = False
+        self.language = 'english'
+        self.max_segments = MAX_SEGMENTS
+        self.segment_explainer = None
+        self.word_explainer = None
 
     def build_explainer(self,
                         predict_fn: Callable[[np.ndarray], np.ndarray],
@@ -31,6 +44,9 @@ class LimeTextExplainer(AbstractExplainer):
                         feature_selection: str = 'auto',
                         split_expression: str = '\W+',
                         bow: bool = True,
+                        hierarchical: bool = False,
+                        language: str = 'english',
+                        max_segments: int = MAX_SEGMENTS,
                         **kwargs):
         """
         Build the LIME text explainer
@@ -38,9 +54,15 @@ class LimeTextExplainer(AbstractExplainer):
         lime.lime_text.LimeTextExplainer. Original documentation can be found here:
         https://lime-ml.readthedocs.io/en/latest/lime.html#lime.lime_text.LimeTextExplainer
 
+        With `hierarchical`, a long document is explained in two steps with a bounded number of model calls:
+        the sentences, split by the Punkt tokenizer bundled in `xai/data/tokenizers`, are merged into at most
+        `max_segments` segments which are explained first, and the words are then explained only inside the
+        top segments, while the rest of the document is kept.
+
         Args:
             predict_fn (Callable): A function that takes in a 1D numpy array and outputs a vector
-                of probabilities which should sum to 1.
+                of probabilities which should sum to 1. It can be defined with `async def`, and wrapped in a
+                `xai.explainer.prediction_executor.PredictionExecutor` to predict in chunks concurrently
             kernel_width (float): Width of the exponential kernel used in the LIME loss function
             verbose (bool): Control verbosity. If true, local prediction values of the LIME model
                 are printed
@@ -52,11 +74,15 @@ class LimeTextExplainer(AbstractExplainer):
                 will explain in terms of word-positions, so that a word may be important the
                 first time it appears and unimportant the second. Only set to false if the
                 classifier uses word order in some way (bigrams, etc).
+            hierarchical (bool): if True, explain the segments of the document first and the words of the top
+                segments only. Default is False to explain all the words
+            language (str): language of the sentence tokenizer of the hierarchical explanations
+            max_segments (int): maximum number of segments of a document in the hierarchical explanations
 
         Returns:
             None
         """
-        self.predict_fn = predict_fn
+        self.predict_fn = as_executor(predict_fn)
         self.explainer_object = OriginalLimeTextExplainer(
             kernel_width=kernel_width,
             verbose=verbose,
@@ -65,6 +91,29 @@ class LimeTextExplainer(AbstractExplainer):
             split_expression=split_expression,
             bow=bow
         )
+        self.hierarchical = hierarchical
+        self.language = language
+        self.max_segments = max_segments
+        self.segment_explainer = None
+        self.word_explainer = None
+        if hierarchical:
+            # the explainers share the random state, so that the explanations can be replayed in batches
+            self.segment_explainer = OriginalLimeTextExplainer(
+                kernel_width=kernel_width,
+                class_names=class_names,
+                feature_selection=feature_selection,
+                bow=False,
+                mask_string='',
+                random_state=self.explainer_object.random_state
+            )
+            self.word_explainer = OriginalLimeTextExplainer(
+                kernel_width=kernel_width,
+                class_names=class_names,
+                feature_selection=feature_selection,
+                split_expression=word_splitter(split_expression),
+                bow=bow,
+                random_state=self.explainer_object.random_state
+            )
 
         if verbose:
             warnings.warn(message='Explainer built successfully!')
@@ -75,7 +124,9 @@ class LimeTextExplainer(AbstractExplainer):
                          top_labels: Optional[int] = None,
                          num_features: Optional[int] = NUM_TOP_FEATURES,
                          num_samples: int = 5000,
-                         distance_metric: str = 'cosine', **kwargs) -> Dict[int, Dict]:
+                         distance_metric: str = 'cosine',
+                         num_top_segments: int = NUM_TOP_SEGMENTS,
+                         num_segment_samples: int = NUM_SEGMENT_SAMPLES, **kwargs) -> Dict[int, Dict]:
         """
         Explain a prediction instance using the LIME text explainer.
         Like with `build_explainer`, the parameters of `explain_instance` are exactly those of
@@ -91,66 +142,226 @@ class LimeTextExplainer(AbstractExplainer):
             num_features (int): Number of features to include in an explanation
             num_samples (int): The number of perturbed samples to train the LIME model with
             distance_metric (str): The distance metric to use for weighting the loss function
+            num_top_segments (int): Number of top segments whose words are explained, if the explainer
+                is hierarchical
+            num_segment_samples (int): The number of perturbed samples to explain the segments with, if the
+                explainer is hierarchical. The number of model calls is at most
+                `num_segment_samples + num_samples`, whatever the length of the document
+
+        Returns:
+            (dict) A mapping of class to explanations. The hierarchical explanations also list the top
+                segments under OUTPUT.SEGMENTS
+
+        Raises:
+            ExplainerUninitializedError: Raised if self.explainer_object is None
+        """
+        if self.explainer_object:
+            return self._explain_instance(instance, self.predict_fn, labels=labels, top_labels=top_labels,
+                                          num_features=num_features, num_samples=num_samples,
+                                          distance_metric=distance_metric, num_top_segments=num_top_segments,
+                                          num_segment_samples=num_segment_samples, feature_table=FeatureTable())
+        else:
+            raise ExplainerUninitializedError('This explainer is not yet instantiated! '
+                                              'Please call build_explainer()'
+                                              'first before calling explain_instance.')
+
+    def explain_instances(self,
+                          instances: List[str],
+                          batch_size: int = DEFAULT_BATCH_SIZE,
+                          labels: List = (1,),
+                          top_labels: Optional[int] = None,
+                          num_features: Optional[int] = NUM_TOP_FEATURES,
+                          num_samples: int = 5000,
+                          distance_metric: str = 'cosine',
+                          num_top_segments: int = NUM_TOP_SEGMENTS,
+                          num_segment_samples: int = NUM_SEGMENT_SAMPLES, **kwargs) -> List[Dict[int, Dict]]:
+        """
+        Explain a batch of prediction instances using the LIME text explainer.
+        The perturbed texts of all instances are predicted together, in calls of at most
+        `batch_size` texts. The hierarchical explanations draw the perturbations of the words after the
+        segments are predicted, so the random state is seeded for each instance with a seed drawn in order,
+        and they differ from those of `explain_instance`.
+
+        Args:
+            instances (list): A list of text instances
+            batch_size (int): Maximum number of texts in a single call of the predict function
+            Other arguments are the same as `explain_instance`
 
         Returns:
-            (dict) A mapping of class to explanations
+            (list) A list of mappings of class to explanations, one for each instance
 
         Raises:
             ExplainerUninitializedError: Raised if self.explainer_object is None
         """
         if self.explainer_object:
-            explanation = self.explainer_object.explain_instance(
+            # the explanations of the batch share a table of their feature names
+            feature_table = FeatureTable()
+            return explain_in_batches(
+                explain_fn=lambda instance, predict_fn: self._explain_instance(
+                    instance, predict_fn, labels=labels, top_labels=top_labels, num_features=num_features,
+                    num_samples=num_samples, distance_metric=distance_metric, num_top_segments=num_top_segments,
+                    num_segment_samples=num_segment_samples, feature_table=feature_table),
+                instances=instances,
+                predict_fn=self.predict_fn,
+                batch_size=batch_size,
+                random_state=self.explainer_object.random_state,
+                seed_each=self.hierarchical)
+        else:
+            raise ExplainerUninitializedError('This explainer is not yet instantiated! '
+                                              'Please call build_explainer()'
+                                              'first before calling explain_instances.')
+
+    def _explain_instance(self, instance: str, predict_fn: Callable, labels: List, top_labels: Optional[int],
+                          num_features: Optional[int], num_samples: int, distance_metric: str,
+                          num_top_segments: int = NUM_TOP_SEGMENTS,
+                          num_segment_samples: int = NUM_SEGMENT_SAMPLES,
+                          feature_table: Optional[FeatureTable] = None) -> Dict[int, Dict]:
+        """
+        Explain a prediction instance with the given predict function
+        """
+        feature_table = feature_table if feature_table is not None else FeatureTable()
+        if self.hierarchical:
+            return self._explain_hierarchical(instance, predict_fn, labels=labels, top_labels=top_labels,
+                                              num_features=num_features, num_samples=num_samples,
+                                              distance_metric=distance_metric, num_top_segments=num_top_segments,
+                                              num_segment_samples=num_segment_samples, feature_table=feature_table)
+
+        explanation = self.explainer_object.explain_instance(
+            text_instance=instance,
+            classifier_fn=predict_fn,
+            labels=labels,
+            top_labels=top_labels,
+            num_features=num_features,
+            num_samples=num_samples,
+            distance_metric=distance_metric
+        )
+
+        if top_labels:
+            labels_to_extract = list(explanation.as_map().keys())
+        else:
+            labels_to_extract = labels
+
+        confidences = explanation.predict_proba
+
+        return explanation_to_compact(explanation, labels_to_extract, confidences,
+                                      mode=MODE.CLASSIFICATION, feature_table=feature_table)
+
+    def _explain_hierarchical(self, instance: str, predict_fn: Callable, labels: List, top_labels: Optional[int],
+                              num_features: Optional[int], num_samples: int, distance_metric: str,
+                              num_top_segments: int, num_segment_samples: int,
+                              feature_table: FeatureTable) -> Dict[int, Dict]:
+        """
+        Explain the segments of a document, then the words of its top segments
+        """
+        spans = split_segments(instance, self.max_segments, self.language)
+        if len(spans) > num_top_segments:
+            # the split function depends on the document, set it on a copy to keep the explainer thread-safe
+            segment_explainer = copy.copy(self.segment_explainer)
+            segment_explainer.split_expression = segment_splitter(instance, spans)
+            explanation = segment_explainer.explain_instance(
                 text_instance=instance,
-                classifier_fn=self.predict_fn,
+                classifier_fn=predict_fn,
                 labels=labels,
                 top_labels=top_labels,
-                num_features=num_features,
-                num_samples=num_samples,
+                num_features=len(spans),
+                num_samples=num_segment_samples,
                 distance_metric=distance_metric
             )
-
             if top_labels:
-                labels_to_extract = list(explanation.as_map().keys())
-            else:
-                labels_to_extract = labels
+                labels = list(explanation.as_map().keys())
+            top_labels = None
+            # the segments with the largest absolute score for any of the labels
+            scores = np.zeros(len(spans))
+            for label in labels:
+                for segment, score in explanation.as_map()[label]:
+                    scores[segment] = max(scores[segment], abs(score))
+            spans = [spans[idx] for idx in sorted(np.argsort(-scores, kind='stable')[:num_top_segments])]
+
+        def segment_predict_fn(texts: List[str]) -> np.ndarray:
+            # put the perturbed top segments back into the document
+            documents = []
+            for text in texts:
+                parts, end = [], 0
+                for (start, stop), segment in zip(spans, text.split(SEGMENT_SEPARATOR)):
+                    parts.extend([instance[end:start], segment])
+                    end = stop
+                documents.append(''.join(parts) + instance[end:])
+            return predict_fn(documents)
 
-            confidences = explanation.predict_proba
+        explanation = self.word_explainer.explain_instance(
+            text_instance=SEGMENT_SEPARATOR.join(instance[start:end] for start, end in spans),
+            classifier_fn=segment_predict_fn,
+            labels=labels,
+            top_labels=top_labels,
+            num_features=num_features,
+            num_samples=num_samples,
+            distance_metric=distance_metric
+        )
 
-            return explanation_to_json(explanation, labels_to_extract, confidences,
-                                       mode=MODE.CLASSIFICATION)
+        if top_labels:
+            labels_to_extract = list(explanation.as_map().keys())
         else:
-            raise ExplainerUninitializedError('This explainer is not yet instantiated! '
-                                              'Please call build_explainer()'
-                                              'first before calling explain_instance.')
+            labels_to_extract = labels
+
+        compact = explanation_to_compact(explanation, labels_to_extract, explanation.predict_proba,
+                                         mode=MODE.CLASSIFICATION, feature_table=feature_table)
+        compact.add_info({OUTPUT.SEGMENTS: [instance[start:end] for start, end in spans]})
+        return compact
+
+    def set_random_state(self, seed: int):
+        """
+        Seed the random numbers of the next explanations
+
+        Args:
+            seed (int): the random seed
+
+        Returns:
+            None
+        """
+        random_state = np.random.RandomState(seed)
+        for explainer in [self.explainer_object, self.segment_explainer, self.word_explainer]:
+            if explainer is not None:
+                explainer.random_state = random_state
+                explainer.base.random_state = random_state
 
-    def save_explainer(self, path: str):
+    def save_explainer(self, path: str, compact: bool = False):
         """
         Save the explainer.
 
         Args:
             path (str): Path to save the explainer
+            compact (bool): Save in the compact format, a directory of memory-mappable arrays and
+                JSON metadata. Default is False for a single dill pickle
 
         Returns:
             None
         """
         dict_to_save = {
             'explainer_object': self.explainer_object,
-            'predict_fn': self.predict_fn
+            'predict_fn': self.predict_fn,
+            'hierarchical': self.hierarchical,
+            'language': self.language,
+            'max_segments': self.max_segments,
+            'segment_explainer': self.segment_explainer,
+            'word_explainer': self.word_explainer
         }
-        with open(path, 'wb') as fp:
-            dill.dump(dict_to_save, fp)
+        save_state(path, dict_to_save, compact=compact, metadata={'explainer': type(self).__name__})
 
     def load_explainer(self, path: str):
         """
         Load the explainer
 
         Args:
-            path (str): Path to load the explainer
+            path (str): Path to load the explainer, in the format detected from the path
 
         Returns:
             None
         """
-        with open(path, 'rb') as fp:
-            dict_loaded = dill.load(fp)
-            self.explainer_object = dict_loaded['explainer_object']
-            self.predict_fn = dict_loaded['predict_fn']
+        dict_loaded = load_state(path)
+        self.explainer_object = dict_loaded['explainer_object']
+        self.predict_fn = dict_loaded['predict_fn']
+        self.hierarchical = dict_loaded.get('hierarchical', False)
+        self.language = dict_loaded.get('language', 'english')
+        self.max_segments = dict_loaded.get('max_segments', MAX_SEGMENTS)
+        self.segment_explainer = dict_loaded.get('segment_explainer')
+        self.word_explainer = dict_loaded.get('word_explainer')
@@ -0,0 +1,90 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+# Copyright 2019 SAP SE or an SAP affiliate company. All rights reserved
+# ============================================================================
+
+import os
+import pickle
+import re
+from functools import lru_cache
+from typing import List, Tuple, Callable
+
+PUNKT_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))),
+                          'data', 'tokenizers', 'punkt', 'PY3')
+
+# separates the segments of the text refined at word level, it is not a word for any split expression
+SEGMENT_SEPARATOR = '\x00'
+
+
+@lru_cache(maxsize=None)
+def load_sentence_tokenizer(language: str = 'english'):
+    """
+    Load the Punkt sentence tokenizer bundled in `xai/data/tokenizers`
+
+    Args:
+        language (str): language of the tokenizer, e.g. 'english', 'german', 'french', 'spanish' or 'russian'
+
+    Returns:
+        (nltk.tokenize.punkt.PunktSentenceTokenizer) The tokenizer
+    """
+    path = os.path.join(PUNKT_PATH, '%s.pickle' % language)
+    if not os.path.isfile(path):
+        raise ValueError('No bundled sentence tokenizer for language %s' % language)
+    with open(path, 'rb') as fp:
+        return pickle.load(fp)
+
+
+def split_segments(text: str, max_segments: int, language: str = 'english') -> List[Tuple[int, int]]:
+    """
+    Split a text into sentences, and merge consecutive sentences into at most `max_segments` segments
+    of about the same number of sentences
+
+    Args:
+        text (str): the text
+        max_segments (int): maximum number of segments
+        language (str): language of the sentence tokenizer
+
+    Returns:
+        (list) The character spans (start, end) of the segments, in the order of the text
+    """
+    sentences = list(load_sentence_tokenizer(language).span_tokenize(text))
+    if len(sentences) <= max_segments:
+        return sentences
+    bounds = [round(idx * len(sentences) / max_segments) for idx in range(max_segments + 1)]
+    return [(sentences[start][0], sentences[end - 1][1]) for start, end in zip(bounds[:-1], bounds[1:])]
+
+
+def segment_splitter(text: str, spans: List[Tuple[int, int]]) -> Callable[[str], List[str]]:
+    """
+    Create a split function of LIME which makes each segment of the text a single token
+
+    Args:
+        text (str): the text
+        spans (list): the character spans of the segments
+
+    Returns:
+        (Callable) Function which returns the segments of the text
+    """
+    segments = [text[start:end] for start, end in spans]
+    return lambda _: segments
+
+
+def word_splitter(split_expression: str) -> Callable[[str], List[str]]:
+    """
+    Create a split function of LIME which returns the words of the segments joined by `SEGMENT_SEPARATOR`
+
+    Args:
+        split_expression (str): regex expression for splitting the words of a segment
+
+    Returns:
+        (Callable) Function which returns the words of a text
+    """
+    splitter = re.compile(r'(%s)|$' % split_expression)
+
+    def split(text: str) -> List[str]:
+        words = []
+        for segment in text.split(SEGMENT_SEPARATOR):
+            words.extend(token for token in splitter.split(segment) if token and not splitter.match(token))
+        return words
+
+    return split
@@ -8,7 +8,37 @@ from typing import List, Dict, Optional, Any
 import numpy as np
 from lime.explanation import Explanation
 
-from xai.explainer.constants import MODE, OUTPUT
+from xai.explainer.constants import MODE
+from xai.explainer.explanation import CompactExplanation, FeatureTable
+
+
+def explanation_to_compact(explanation: Explanation,
+                           labels: List[int],
+                           predictions: np.ndarray,
+                           mode: str,
+                           feature_table: Optional[FeatureTable] = None) -> CompactExplanation:
+    """
+    Parses LIME explanation to a compact explanation, see `explanation_to_json` for its schema.
+
+    Args:
+        explanation (lime.explanation.Explanation): The explanation output from LIME
+        labels (list): List of labels for which to get explanations
+        predictions (np.ndarray): Model output for a particular instance, which should be a list
+        of confidences that sum to one (if classification)
+        mode (str): Regression or classification
+        feature_table (FeatureTable): The table of the feature names shared by the explanations,
+            default is a new table
+
+    Returns:
+        (CompactExplanation) Explanations with the features sorted by descending score
+    """
+    feature_table = feature_table if feature_table is not None else FeatureTable()
+    if mode == MODE.CLASSIFICATION:
+        label_explanations = {label: (predictions[label], [(str(name), score) for name, score in explanation.as_list(label)])
+                              for label in labels}
+    else:
+        label_explanations = {None: (predictions, [(str(name), score) for name, score in explanation.as_list()])}
+    return CompactExplanation.from_lists(feature_table, label_explanations, mode=mode)
 
 
 def explanation_to_json(explanation: Explanation,
@@ -53,29 +83,49 @@ def explanation_to_json(explanation: Explanation,
     Returns:
         (dict) Explanations in JSON format
     """
-    dict_explanation = {}
+    return explanation_to_compact(explanation, labels, predictions, mode).to_json()
 
-    if mode == MODE.CLASSIFICATION:
-        for label in labels:
-            list_explanations = explanation.as_list(label)
-            tmp = []
-            for exp in list_explanations:
-                tmp.append({OUTPUT.FEATURE: str(exp[0]), OUTPUT.SCORE: float(exp[1])})
-            dict_explanation[label] = {
-                OUTPUT.PREDICTION: predictions[label],
-                OUTPUT.EXPLANATION: sorted(tmp, key=lambda x: x[OUTPUT.SCORE], reverse=True)
-            }
+
+def shap_values_to_compact(shap_values: List[np.ndarray], confidences: List[float],
+                           feature_names: Optional[List[str]] = None,
+                           feature_values: Optional[List[Any]] = None,
+                           feature_table: Optional[FeatureTable] = None) -> CompactExplanation:
+    """
+    Parse SHAP values to a compact explanation, see `parse_shap_values`
+
+    Args:
+        shap_values (list): A list of shap values, a set for each class
+        confidences (list): Confidences for each class
+        feature_names (list): List of feature names
+        feature_values (list): List of values corresponding to feature_names. If None, the feature names are
+            used as they are
+        feature_table (FeatureTable): The table of the feature names shared by the explanations,
+            default is a new table
+
+    Returns:
+        (CompactExplanation) A mapping of class to explanations
+    """
+    assert len(shap_values) == len(confidences), 'Number of SHAP values should be equal to ' \
+                                                 'number of classes!'
+
+    feature_table = feature_table if feature_table is not None else FeatureTable()
+    if feature_names and feature_values:
+        names = ['{} = {}'.format(name, value) for name, value in zip(feature_names, feature_values)]
+    elif feature_names and feature_values is None:
+        names = list(feature_names)
     else:
-        list_explanations = explanation.as_list()
-        tmp = []
-        for exp in list_explanations:
-            tmp.append({OUTPUT.FEATURE: str(exp[0]), OUTPUT.SCORE: float(exp[1])})
-        dict_explanation = {
-            OUTPUT.PREDICTION: predictions,
-            OUTPUT.EXPLANATION: sorted(tmp, key=lambda x: x[OUTPUT.SCORE], reverse=True)
-        }
+        names = None
 
-    return dict_explanation
+    indices, scores = [], []
+    for label in range(len(confidences)):
+        shap_value_class = np.asarray(shap_values[label][0], dtype=np.float64)
+        # We ignore features which SHAP values are 0, which indicate that they had no
+        # impact on the model's decision
+        feature_idx = np.flatnonzero(shap_value_class)
+        indices.append(feature_table.indices([names[idx] for idx in feature_idx] if names else feature_idx.tolist()))
+        scores.append(shap_value_class[feature_idx])
+
+    return CompactExplanation(feature_table, list(range(len(confidences))), confidences, indices, scores)
 
 
 def parse_shap_values(shap_values: List[np.ndarray], confidences: List[float],
@@ -94,29 +144,84 @@ def parse_shap_values(shap_values: List[np.ndarray], confidences: List[float],
         (dict) A mapping of class to explanations
 
     """
-    assert len(shap_values) == len(confidences), 'Number of SHAP values should be equal to ' \
-                                                 'number of classes!'
+    return shap_values_to_compact(shap_values, confidences, feature_names=feature_names,
+                                  feature_values=feature_values).to_json()
+
+
+def attributions_to_compact(attributions: np.ndarray,
+                            predictions: np.ndarray,
+                            feature_names: List[str],
+                            feature_values: List[Any],
+                            mode: str,
+                            num_features: Optional[int] = None,
+                            labels: Optional[List[int]] = None,
+                            top_labels: Optional[int] = None,
+                            feature_table: Optional[FeatureTable] = None) -> CompactExplanation:
+    """
+    Parse additive feature attributions of an instance to a compact explanation, see `attributions_to_json`
+
+    Args:
+        attributions (np.ndarray): Attribution scores, one row for each model output and one column for each feature
+        predictions (np.ndarray): Model output for the instance, confidences of the classes if classification
+        feature_names (list): List of feature names
+        feature_values (list): List of values corresponding to feature_names
+        mode (str): Regression or classification
+        num_features (int): Number of features with the highest absolute scores to keep, default is all features
+        labels (list): List of labels for which to get explanations, default is all labels
+        top_labels (int): If not None, this overwrites labels and explains the top k classes
+        feature_table (FeatureTable): The table of the feature names shared by the explanations,
+            default is a new table
 
-    dict_explanation = {}
-
-    for label, confidence in enumerate(confidences):
-        tmp = []
-
-        shap_value_class = shap_values[label][0]
-        for feature_idx, shap_value in enumerate(shap_value_class):
-            # We ignore features which SHAP values are 0, which indicate that they had no
-            # impact on the model's decision
-            if shap_value != 0:
-                if feature_names and feature_values:
-                    feature = '{} = {}'.format(
-                        feature_names[feature_idx], feature_values[feature_idx])
-                    tmp.append({OUTPUT.FEATURE: feature, OUTPUT.SCORE: shap_value})
-                else:
-                    tmp.append({OUTPUT.FEATURE: feature_idx, OUTPUT.SCORE: shap_value})
-
-        dict_explanation[label] = {
-            OUTPUT.PREDICTION: confidence,
-            OUTPUT.EXPLANATION: tmp
-        }
-
-    return dict_explanation
+    Returns:
+        (CompactExplanation) Explanations with the features sorted by descending score
+    """
+    feature_table = feature_table if feature_table is not None else FeatureTable()
+    names = feature_table.indices(['{} = {}'.format(name, value) for name, value in zip(feature_names, feature_values)])
+    attributions = np.asarray(attributions, dtype=np.float64)
+
+    def select(scores):
+        selected = np.argsort(-np.abs(scores), kind='stable')[:num_features]
+        selected = selected[np.argsort(-scores[selected], kind='stable')]
+        return names[selected], scores[selected]
+
+    if mode != MODE.CLASSIFICATION:
+        indices, scores = select(attributions[0])
+        return CompactExplanation(feature_table, None, [float(np.ravel(predictions)[0])], [indices], [scores],
+                                  mode=mode)
+
+    if top_labels:
+        labels = list(np.argsort(predictions)[::-1][:top_labels])
+    elif labels is None:
+        labels = list(range(len(predictions)))
+    selections = [select(attributions[label]) for label in labels]
+    return CompactExplanation(feature_table, [int(label) for label in labels],
+                              [predictions[label] for label in labels],
+                              [indices for indices, _ in selections], [scores for _, scores in selections])
+
+
+def attributions_to_json(attributions: np.ndarray,
+                         predictions: np.ndarray,
+                         feature_names: List[str],
+                         feature_values: List[Any],
+                         mode: str,
+                         num_features: Optional[int] = None,
+                         labels: Optional[List[int]] = None,
+                         top_labels: Optional[int] = None) -> Dict:
+    """
+    Parse additive feature attributions of an instance to the format of `explanation_to_json`
+
+    Args:
+        attributions (np.ndarray): Attribution scores, one row for each model output and one column for each feature
+        predictions (np.ndarray): Model output for the instance, confidences of the classes if classification
+        feature_names (list): List of feature names
+        feature_values (list): List of values corresponding to feature_names
+        mode (str): Regression or classification
+        num_features (int): Number of features with the highest absolute scores to keep, default is all features
+        labels (list): List of labels for which to get explanations, default is all labels
+        top_labels (int): If not None, this overwrites labels and explains the top k classes
+
+    Returns:
+        (dict) Explanations in JSON format
+    """
+    return attributions_to_compact(attributions, predictions, feature_names, feature_values, mode,
+                                   num_features=num_features, labels=labels, top_labels=top_labels).to_json()
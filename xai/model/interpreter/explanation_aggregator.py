@@ -4,29 +4,168 @@
 # Copyright 2019 SAP SE or an SAP affiliate company. All rights reserved
 # ============================================================================
 
-import operator
-from collections import defaultdict, Counter
-from typing import Dict, Tuple, List, Set
+import math
+import weakref
+from collections import defaultdict
+from typing import Dict, Tuple, List, Set, Optional
+
+import numpy
+from scipy.stats import norm
 
 from xai.explainer.constants import OUTPUT
+from xai.explainer.explanation import CompactExplanation, FeatureTable
 from xai.model.interpreter.exceptions import InvalidExplanationFormat, \
     MutipleScoresFoundForSameFeature, UnsupportedMethodType, \
     InvalidArgumentError
 
 
+STATS_TYPES = ['top_k', 'average_score', 'average_ranking']
+
+
+class _LabelAccumulator:
+    """
+    Running sums of the explanations of a label, indexed by the interned feature index
+    """
+
+    def __init__(self):
+        self.seen = numpy.zeros(0, dtype=numpy.int64)
+        self.score_sum = numpy.zeros(0)
+        self.score_square_sum = numpy.zeros(0)
+        # rank_counts[feature, rank] is how often the feature is at the rank, for the ranks up to `max_k`
+        self.rank_counts = numpy.zeros((0, 0), dtype=numpy.int64)
+
+    def grow(self, num_features: int, num_ranks: int):
+        """
+        Extend the arrays to at least `num_features` features and `num_ranks` ranks
+        """
+        old_features, old_ranks = self.rank_counts.shape
+        if num_features <= old_features and num_ranks <= old_ranks:
+            return
+        new_features = max(num_features, 2 * old_features) if num_features > old_features else old_features
+        new_ranks = max(num_ranks, old_ranks)
+        for name in ['seen', 'score_sum', 'score_square_sum']:
+            array = getattr(self, name)
+            grown = numpy.zeros(new_features, dtype=array.dtype)
+            grown[:old_features] = array
+            setattr(self, name, grown)
+        rank_counts = numpy.zeros((new_features, new_ranks), dtype=numpy.int64)
+        rank_counts[:old_features, :old_ranks] = self.rank_counts
+        self.rank_counts = rank_counts
+
+    def sums(self, stats_type: str, k: int, num_features: int) -> Tuple[numpy.ndarray, numpy.ndarray, numpy.ndarray]:
+        """
+        The sum and the sum of squares of the per-explanation values of each feature for the statistics type,
+        and the mask of the features in the statistics
+        """
+        if stats_type == 'average_score':
+            seen = self.seen[:num_features]
+            return self.score_sum[:num_features], self.score_square_sum[:num_features], seen > 0
+        counts = self.rank_counts[:num_features, :k]
+        if stats_type == 'top_k':
+            values = counts.sum(axis=1).astype(numpy.float64)
+            return values, values, values > 0
+        weights = numpy.arange(k, k - counts.shape[1], -1, dtype=numpy.float64)
+        values = counts.dot(weights)
+        return values, counts.dot(weights ** 2), values > 0
+
+
 ################################################################################
 ### Explanation Aggregator
 ################################################################################
 class ExplanationAggregator:
     """
     Class for explanation aggregator. It aggregates the explanations based on classes, feature and scores.
+
+    The explanations are not retained: the feature names are interned to indices, and each label keeps
+    running sums of the scores and counts of the feature ranks, so the memory does not grow with the number
+    of explanations, and the statistics of any type cost O(features x ranks).
     """
 
-    def __init__(self, confidence_threshold=0.8):
-        self._explanation_list = defaultdict(list)
+    def __init__(self, confidence_threshold=0.8, max_k: Optional[int] = None):
+        """
+        Args:
+            confidence_threshold: float, an explanation of a label is aggregated if its prediction is
+                                  above the threshold
+            max_k: int, the number of ranks counted for `top_k` and `average_ranking`, which bounds the memory
+                   for explanations of many features, a larger k is then not supported.
+                   Default is None to count all ranks of the explanations.
+        """
         self._total_count = 0
         self._class_counter = defaultdict(int)
         self._confidence_threshold = confidence_threshold
+        self._max_k = max_k
+        self._num_ranks = 0
+        self._truncated = False
+        self._feature_index = dict()
+        self._feature_names = list()
+        # maps the indices of the feature table of compact explanations to the interned indices
+        self._table_indices = weakref.WeakKeyDictionary()
+        self._accumulators = dict()
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        # the feature tables of compact explanations are not pickled with the aggregator
+        state['_table_indices'] = None
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._table_indices = weakref.WeakKeyDictionary()
+
+    def _intern(self, name: str) -> int:
+        index = self._feature_index.get(name)
+        if index is None:
+            index = self._feature_index[name] = len(self._feature_names)
+            self._feature_names.append(name)
+        return index
+
+    def _parse(self, list_explanations: List[Dict]) -> Tuple[numpy.ndarray, numpy.ndarray]:
+        """
+        Validate the explanation of a label, and intern its feature names
+
+        Returns:
+            The feature indices and the scores
+        """
+        if type(list_explanations) != list:
+            raise InvalidExplanationFormat(list_explanations)
+        indices = numpy.empty(len(list_explanations), dtype=numpy.int64)
+        scores = numpy.empty(len(list_explanations))
+        feature_names = set()
+        for position, item in enumerate(list_explanations):
+            if type(item) != dict or OUTPUT.FEATURE not in item or OUTPUT.SCORE not in item:
+                raise InvalidExplanationFormat(item)
+            name, score = item[OUTPUT.FEATURE], item[OUTPUT.SCORE]
+            if type(name) != str or type(score) != float:
+                raise InvalidExplanationFormat(item)
+            if name in feature_names:
+                raise MutipleScoresFoundForSameFeature(name, list_explanations)
+            feature_names.add(name)
+            indices[position] = self._intern(name)
+            scores[position] = score
+        return indices, scores
+
+    def _parse_compact(self, feature_table: FeatureTable, table_indices: numpy.ndarray) -> numpy.ndarray:
+        """
+        Validate the feature indices of a label of a compact explanation, and intern its feature names
+
+        Returns:
+            The feature indices
+        """
+        mapping = self._table_indices.get(feature_table, numpy.zeros(0, dtype=numpy.int64))
+        if len(mapping) < len(feature_table):
+            mapping = numpy.concatenate([mapping, numpy.full(len(feature_table) - len(mapping), -1)])
+            self._table_indices[feature_table] = mapping
+        for table_index in table_indices[mapping[table_indices] < 0].tolist():
+            name = feature_table[table_index]
+            if type(name) != str:
+                raise InvalidExplanationFormat({OUTPUT.FEATURE: name})
+            mapping[table_index] = self._intern(name)
+        indices = mapping[table_indices]
+        if len(numpy.unique(indices)) < len(indices):
+            values, counts = numpy.unique(indices, return_counts=True)
+            raise MutipleScoresFoundForSameFeature(self._feature_names[values[counts > 1][0]],
+                                                   [feature_table[index] for index in table_indices.tolist()])
+        return indices
 
     def get_feature_names(self, list_explanations: List[Dict]) -> Set:
         """
@@ -37,64 +176,73 @@ class ExplanationAggregator:
         Returns:
             (set) feature names
         """
-        feature_names = set()
-        for item in list_explanations:
-            if type(item) != dict:
-                raise InvalidExplanationFormat(item)
-            if OUTPUT.FEATURE not in item.keys():
-                raise InvalidExplanationFormat(item)
-            if type(item[OUTPUT.FEATURE]) != str:
-                raise InvalidExplanationFormat(item)
-            if item[OUTPUT.FEATURE] in feature_names:
-                raise MutipleScoresFoundForSameFeature(item[OUTPUT.FEATURE], list_explanations)
-            else:
-                feature_names.add(item[OUTPUT.FEATURE])
-            if OUTPUT.SCORE not in item.keys():
-                raise InvalidExplanationFormat(item)
-            if type(item[OUTPUT.SCORE]) != float:
-                raise InvalidExplanationFormat(item)
-
-        return feature_names
+        indices, _ = self._parse(list_explanations)
+        return {self._feature_names[index] for index in indices}
 
-    def feed(self, explanation: Dict):
+    def feed(self, explanation: Dict, weight: int = 1):
         """
         Feed explanation into the aggregator for further analysis
 
         Args:
-            explanation: dict, the pre-defined format as the output in `xai.explainer.utils.explanation_to_json`
+            explanation: dict, the pre-defined format as the output in `xai.explainer.utils.explanation_to_json`,
+                         or a `CompactExplanation`, which is read without converting it
+            weight: int, the number of samples the explanation stands for, e.g. the size of the cluster
+                    of a representative sample. Default is 1.
         """
-        if OUTPUT.EXPLANATION in explanation:
+        if isinstance(explanation, CompactExplanation):
+            # To follow downstream schema, we set the "label" of regression prediction to 'NA'
+            parsed = [('NA' if _label is None else _label, _prediction,
+                       (self._parse_compact(explanation.feature_table, indices), scores))
+                      for _label, _prediction, indices, scores in explanation.arrays()]
+        elif OUTPUT.EXPLANATION in explanation:
             # Regression schema
-            _ = self.get_feature_names(explanation[OUTPUT.EXPLANATION])
+            # To follow downstream schema, we set the "label" of regression prediction to 'NA'
+            parsed = [('NA', explanation[OUTPUT.PREDICTION], self._parse(explanation[OUTPUT.EXPLANATION]))]
         else:
             # Classification schema
+            parsed = []
             for _label, _exp in explanation.items():
-                if type(_exp) != dict:
+                if type(_exp) != dict or OUTPUT.EXPLANATION not in _exp.keys():
                     raise InvalidExplanationFormat(_exp)
-                if OUTPUT.EXPLANATION not in _exp.keys():
-                    raise InvalidExplanationFormat(_exp)
-                if type(_exp[OUTPUT.EXPLANATION]) != list:
-                    raise InvalidExplanationFormat(_exp)
-                _ = self.get_feature_names(_exp[OUTPUT.EXPLANATION])
+                parsed.append((_label, _exp[OUTPUT.PREDICTION], self._parse(_exp[OUTPUT.EXPLANATION])))
 
-        if OUTPUT.EXPLANATION in explanation:
-            # Regression schema
-            # To follow downstream schema, we set the "label" of regression prediction to 'NA'
-            _label = 'NA'
-            if explanation[OUTPUT.PREDICTION] > self._confidence_threshold:
-                self._explanation_list[_label].append(
-                    {item[OUTPUT.FEATURE]: item[OUTPUT.SCORE] for item in
-                     explanation[OUTPUT.EXPLANATION]})
-                self._class_counter[_label] += 1
+        for _label, _prediction, (indices, scores) in parsed:
+            if _prediction > self._confidence_threshold:
+                self._accumulate(_label, indices, scores, weight)
+                self._class_counter[_label] += weight
+        self._total_count += weight
+
+    def _accumulate(self, label, indices: numpy.ndarray, scores: numpy.ndarray, weight: int = 1):
+        """
+        Add the explanation of a label to the running sums
+        """
+        num_top = len(scores) if self._max_k is None else min(len(scores), self._max_k)
+        self._truncated = self._truncated or num_top < len(scores)
+        self._num_ranks = max(self._num_ranks, num_top)
+        accumulator = self._accumulators.get(label)
+        if accumulator is None:
+            accumulator = self._accumulators[label] = _LabelAccumulator()
+        accumulator.grow(len(self._feature_names), self._num_ranks)
+
+        accumulator.seen[indices] += weight
+        accumulator.score_sum[indices] += weight * scores
+        accumulator.score_square_sum[indices] += weight * scores ** 2
+        if num_top == 0:
+            return
+        if num_top < len(scores):
+            top = numpy.argpartition(-scores, num_top - 1)[:num_top]
+            top = top[numpy.argsort(-scores[top], kind='stable')]
         else:
-            # Classification schema
-            for _label, _exp in explanation.items():
-                if _exp[OUTPUT.PREDICTION] > self._confidence_threshold:
-                    self._explanation_list[_label].append(
-                        {item[OUTPUT.FEATURE]: item[OUTPUT.SCORE] for item in
-                         _exp[OUTPUT.EXPLANATION]})
-                    self._class_counter[_label] += 1
-        self._total_count += 1
+            top = numpy.argsort(-scores, kind='stable')
+        accumulator.rank_counts[indices[top], numpy.arange(num_top)] += weight
+
+    def _check_arguments(self, stats_type: str, k: int):
+        if stats_type not in STATS_TYPES:
+            raise UnsupportedMethodType(stats_type)
+        if type(k) != int:
+            raise InvalidArgumentError('k', '<int>')
+        if stats_type != 'average_score' and self._truncated and k > self._max_k:
+            raise InvalidArgumentError('k', '<int> not larger than max_k {}'.format(self._max_k))
 
     def get_statistics(self, stats_type: str = 'top_k', k: int = 5) -> Tuple[Dict[int, Dict], int]:
         """
@@ -116,34 +264,58 @@ class ExplanationAggregator:
             An integer to indicate the total number of explanations to generate the statistics.
 
         """
-        if stats_type not in ['top_k', 'average_score', 'average_ranking']:
-            raise UnsupportedMethodType(stats_type)
-        if type(k) != int:
-            raise InvalidArgumentError('k', '<int>')
-
+        self._check_arguments(stats_type, k)
         if self._total_count == 0:
             return dict(), 0
 
-        label_counter = defaultdict(Counter)
-        for _label, _exp_list in self._explanation_list.items():
-            for _exp in _exp_list:
+        num_features = len(self._feature_names)
+        stats = dict()
+        for _label, accumulator in self._accumulators.items():
+            values, _, present = accumulator.sums(stats_type, k, num_features)
+            stats[_label] = self._sorted_features(values / self._class_counter[_label], present)
 
-                if stats_type == 'top_k':
-                    top_k_list = sorted(_exp.items(), key=operator.itemgetter(1), reverse=True)[:k]
-                    _exp_counter = Counter({feature_name: 1 for feature_name, _ in top_k_list})
-                elif stats_type == 'average_score':
-                    _exp_counter = Counter(_exp)
-                elif stats_type == 'average_ranking':
-                    top_k_list = sorted(_exp.items(), key=operator.itemgetter(1), reverse=True)[:k]
-                    _exp_counter = Counter(
-                        {feature_name: k - idx for idx, (feature_name, _) in enumerate(top_k_list)})
+        return stats, self._total_count
 
-                label_counter[_label].update(_exp_counter)
+    def _sorted_features(self, values: numpy.ndarray, present: numpy.ndarray) -> Dict[str, float]:
+        """
+        Map the names of the present features to their values, in descending order of the values
+        """
+        indices = numpy.flatnonzero(present)
+        indices = indices[numpy.argsort(-values[indices], kind='stable')]
+        return {self._feature_names[index]: float(values[index]) for index in indices}
 
-        stats = dict()
-        for _label, _counter in label_counter.items():
-            stats[_label] = {name: (score / self._class_counter[_label]) for name, score in
-                             list(sorted(_counter.items(), key=operator.itemgetter(1),
-                                         reverse=True))}
+    def get_confidence_intervals(self, stats_type: str = 'top_k', k: int = 5, confidence: float = 0.95,
+                                 population_size: Optional[int] = None) -> Dict[int, Dict]:
+        """
+        return the half-widths of the confidence intervals of the statistics in `get_statistics`,
+        based on the normal approximation of the mean over the explanations of each label
 
-        return stats, self._total_count
+        Args:
+            stats_type: str, not None. The pre-defined types of statistics, see `get_statistics`.
+            k:  int, not None. the k value for `top_k` method and `average_ranking`.
+            confidence: float, the confidence level of the intervals. Default is 0.95.
+            population_size: int, the number of samples the explained samples are drawn from, for the finite
+                             population correction. Default is None for no correction.
+
+        Returns:
+            A dictionary maps the label to the half-width of the confidence interval of each feature statistic,
+            i.e. the statistic is within `value ± half-width` with the given confidence.
+        """
+        self._check_arguments(stats_type, k)
+
+        z_value = norm.ppf(0.5 + confidence / 2)
+        correction = 1.0
+        if population_size is not None and population_size > 1:
+            correction = math.sqrt(max(0.0, (population_size - self._total_count) / (population_size - 1)))
+
+        num_features = len(self._feature_names)
+        intervals = dict()
+        for _label, accumulator in self._accumulators.items():
+            count = self._class_counter[_label]
+            sums, square_sums, present = accumulator.sums(stats_type, k, num_features)
+            mean = sums / count
+            variance = numpy.maximum(square_sums / count - mean ** 2, 0.0) * count / max(count - 1, 1)
+            half_widths = z_value * numpy.sqrt(variance / count) * correction
+            intervals[_label] = {self._feature_names[index]: float(half_widths[index])
+                                 for index in numpy.flatnonzero(present)}
+        return intervals
@@ -10,12 +10,13 @@ import warnings
 import numpy
 import pandas as pd
 from scipy import stats
-from typing import List, Dict, Tuple
+from typing import List, Dict, Tuple, Optional
 
 import shap
 from xai import ALG, MODE
 from xai.data.constants import DATATYPE
 from xai.data.explorer.data_analyzer_suite import DataAnalyzerSuite
+from xai.explainer.prediction_executor import PredictionExecutor
 from xai.model.interpreter.exceptions import (
     InconsistentSize,
     TrainingDataNotProvided
@@ -38,14 +39,19 @@ class FeatureInterpreter:
     """
     SUPPORTED_FEATURE_IMPORTANCE_TYPES = [ALG.SHAP]
 
-    def __init__(self, feature_names: List[str]):
+    def __init__(self, feature_names: List[str], chunk_size: Optional[int] = None, max_workers: int = 1):
         """
         Initialize feature interpreter with feature names
 
         Args:
             feature_names: list, the list of feature names
+            chunk_size: int, maximum number of rows in a single model call of the kernel SHAP ranking,
+                        default is None to predict all rows in one call
+            max_workers: int, number of threads calling the model of the kernel SHAP ranking, default 1
         """
         self._feature_names = feature_names
+        self._chunk_size = chunk_size
+        self._max_workers = max_workers
 
     def get_feature_distribution(self, feature_types: List[str], train_x: numpy.ndarray, labels: List = None) -> Dict:
         """
@@ -299,9 +305,10 @@ class FeatureInterpreter:
                 if not callable(getattr(trained_model, 'predict', None)):
                     raise Exception(
                         'Fail to initialize explainer as model does not have the function call <predict_proba> and <predict>')
-                explainer = shap.KernelExplainer(model=trained_model.predict, data=train_x)
-            else:
-                explainer = shap.KernelExplainer(model=trained_model.predict_proba, data=train_x)
+                predict_call = trained_model.predict
+            explainer = shap.KernelExplainer(model=PredictionExecutor(predict_call, chunk_size=self._chunk_size,
+                                                                      max_workers=self._max_workers),
+                                             data=train_x)
 
         shap_values = explainer.shap_values(train_x)
         feature_values = list(zip(self._feature_names, numpy.array(shap_values).transpose().tolist()))
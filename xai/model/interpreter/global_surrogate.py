@@ -0,0 +1,170 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+# Copyright 2019 SAP SE or an SAP affiliate company. All rights reserved
+# ============================================================================
+
+from typing import List, Dict, Optional, Callable
+
+import numpy
+from lime.discretize import QuartileDiscretizer
+from scipy.sparse import csr_matrix
+from sklearn.linear_model import Ridge
+from sklearn.metrics import r2_score
+
+from xai.explainer.batch import predict_in_batches, DEFAULT_BATCH_SIZE
+from xai.explainer.constants import MODE
+from xai.explainer.explanation import CompactExplanation, FeatureTable
+from xai.model.interpreter.exceptions import InterpreterUninitializedError
+
+DEFAULT_NUM_PERTURBATIONS = 10
+
+
+################################################################################
+### Global Surrogate
+################################################################################
+class GlobalSurrogate:
+    """
+    Class for a global interpretable surrogate of a model.
+
+    The continuous features are discretized into quartiles like LIME tabular, and a single ridge regression on the
+    one-hot encoded bins is fit to the model outputs of the samples and their perturbations, one output for each
+    class. The coefficients of the bins, relative to the average of their feature, explain each sample with the
+    bins it falls into, so the statistics of `ExplanationAggregator` are computed from one model fit instead of one
+    surrogate fit per sample.
+    """
+
+    def __init__(self, training_data: numpy.ndarray, feature_names: Optional[List[str]] = None,
+                 categorical_features: Optional[List[int]] = None, alpha: float = 1.0,
+                 random_state: Optional[int] = None):
+        """
+        Args:
+            training_data: numpy.ndarray, the training data, which defines the bins of the features and
+                           the values of the perturbations
+            feature_names: list of str, the names of the features. Default is the column indices.
+            categorical_features: list of int, the indices of the categorical features, which are not discretized
+            alpha: float, the regularization strength of the ridge regression
+            random_state: int, the random seed of the perturbations
+        """
+        self.training_data = numpy.asarray(training_data)
+        num_features = self.training_data.shape[1]
+        if feature_names is None:
+            feature_names = range(num_features)
+        self.feature_names = [str(name) for name in feature_names]
+        self.categorical_features = list(categorical_features) if categorical_features is not None else []
+        self.alpha = alpha
+        self.random_state = random_state
+        self.mode = None
+        self.fidelity = None
+
+        self._discretizer = QuartileDiscretizer(self.training_data, self.categorical_features, self.feature_names,
+                                                random_state=random_state)
+        discrete = self._discretizer.discretize(self.training_data)
+        self._values = [numpy.unique(discrete[:, feature]) for feature in range(num_features)]
+        self._offsets = numpy.cumsum([0] + [len(values) for values in self._values])
+        self.feature_table = FeatureTable()
+        self._columns = numpy.concatenate([self.feature_table.indices(self._bin_names(feature))
+                                           for feature in range(num_features)])
+        self._model = None
+        self._coefs = None
+        self._sample_columns = None
+        self._sample_predictions = None
+
+    def _bin_names(self, feature: int) -> List[str]:
+        if feature in self._discretizer.names:
+            return [self._discretizer.names[feature][int(value)] for value in self._values[feature]]
+        return ['%s=%s' % (self.feature_names[feature], value) for value in self._values[feature]]
+
+    def _encode(self, data: numpy.ndarray) -> numpy.ndarray:
+        """
+        Map each value to the column of its bin in the one-hot encoding, -1 for a category not in the training data
+        """
+        discrete = self._discretizer.discretize(numpy.asarray(data, dtype=self.training_data.dtype))
+        columns = numpy.empty(discrete.shape, dtype=numpy.int32)
+        for feature, values in enumerate(self._values):
+            position = numpy.minimum(numpy.searchsorted(values, discrete[:, feature]), len(values) - 1)
+            columns[:, feature] = numpy.where(values[position] == discrete[:, feature],
+                                              self._offsets[feature] + position, -1)
+        return columns
+
+    def _one_hot(self, columns: numpy.ndarray) -> csr_matrix:
+        """
+        Sparse one-hot encoding, a row has one non-zero entry for each feature
+        """
+        valid = columns >= 0
+        indptr = numpy.concatenate([[0], numpy.cumsum(valid.sum(axis=1))])
+        return csr_matrix((numpy.ones(int(indptr[-1])), columns[valid], indptr),
+                          shape=(len(columns), self._offsets[-1]))
+
+    def fit(self, predict_fn: Callable, samples: numpy.ndarray, num_perturbations: int = DEFAULT_NUM_PERTURBATIONS,
+            batch_size: int = DEFAULT_BATCH_SIZE):
+        """
+        Fit the surrogate on the samples and their perturbations, with a single batched query of the model
+
+        Args:
+            predict_fn: Callable, the model prediction function
+            samples: numpy.ndarray, the samples to explain, e.g. the training data
+            num_perturbations: int, the number of perturbations of each sample. Each feature of a perturbation
+                               takes the value of a random training sample with probability 0.5.
+            batch_size: int, maximum number of rows in a single call of the predict function
+
+        Returns:
+            The fitted GlobalSurrogate
+        """
+        samples = numpy.asarray(samples)
+        rng = numpy.random.RandomState(self.random_state)
+        perturbed = numpy.repeat(samples, num_perturbations, axis=0)
+        donors = rng.randint(len(self.training_data), size=perturbed.shape)
+        replaced = rng.rand(*perturbed.shape) < 0.5
+        perturbed[replaced] = self.training_data[donors, numpy.arange(perturbed.shape[1])][replaced]
+        rows = numpy.concatenate([samples, perturbed])
+
+        predictions = predict_in_batches(predict_fn, [rows], batch_size=batch_size)[0]
+        predictions = numpy.asarray(predictions, dtype=numpy.float64).reshape(len(rows), -1)
+        self.mode = MODE.CLASSIFICATION if predictions.shape[1] > 1 else MODE.REGRESSION
+
+        columns = self._encode(rows)
+        design = self._one_hot(columns)
+        self._model = Ridge(alpha=self.alpha, solver='sparse_cg').fit(design, predictions)
+        surrogate_predictions = self._model.predict(design).reshape(predictions.shape)
+
+        # the effect of a bin relative to the average of its feature, weighted by the frequency of the bins
+        coefs = self._model.coef_.reshape(predictions.shape[1], -1).copy()
+        frequencies = numpy.asarray(design.sum(axis=0)).ravel()
+        for start, end in zip(self._offsets[:-1], self._offsets[1:]):
+            weights = frequencies[start:end] / max(frequencies[start:end].sum(), 1)
+            coefs[:, start:end] -= coefs[:, start:end].dot(weights)[:, None]
+        self._coefs = coefs
+
+        self.fidelity = {'r2': float(r2_score(predictions, surrogate_predictions, multioutput='variance_weighted'))}
+        if self.mode == MODE.CLASSIFICATION:
+            self.fidelity['accuracy'] = float(numpy.mean(numpy.argmax(predictions, axis=1) ==
+                                                         numpy.argmax(surrogate_predictions, axis=1)))
+        self._sample_columns = columns[:len(samples)]
+        self._sample_predictions = predictions[:len(samples)]
+        return self
+
+    def explain_samples(self, num_features: int = 5) -> List[CompactExplanation]:
+        """
+        Explain the fitted samples with the surrogate, in the format of the explainers with `top_labels=1`
+
+        Args:
+            num_features: int, the number of features with the highest absolute scores in each explanation
+
+        Returns:
+            A list of explanations, one for each sample
+        """
+        if self._coefs is None:
+            raise InterpreterUninitializedError('This surrogate is not yet fitted! Please call fit() first.')
+
+        explanations = []
+        for columns, predictions in zip(self._sample_columns, self._sample_predictions):
+            columns = columns[columns >= 0]
+            label = int(numpy.argmax(predictions)) if self.mode == MODE.CLASSIFICATION else 0
+            scores = self._coefs[label, columns]
+            selected = numpy.argsort(-numpy.abs(scores), kind='stable')[:num_features]
+            selected = selected[numpy.argsort(-scores[selected], kind='stable')]
+            explanations.append(CompactExplanation(
+                self.feature_table, [label] if self.mode == MODE.CLASSIFICATION else None,
+                [predictions[label]], [self._columns[columns[selected]]], [scores[selected]], mode=self.mode))
+        return explanations
@@ -9,16 +9,28 @@ from __future__ import absolute_import
 from __future__ import division
 from __future__ import print_function
 
-import operator
+import os
 import warnings
 
 import numpy
-from typing import List, Union, Dict, Tuple
+from typing import List, Union, Dict, Tuple, Optional, Iterable, Callable, Any
 
-from xai.explainer.explainer_factory import ExplainerFactory
+from xai.explainer.batch import predict_in_batches
 from xai.explainer.constants import OUTPUT
+from xai.explainer.explainer_factory import ExplainerFactory
+from xai.explainer.explanation_cache import ExplanationCache, DEFAULT_MAX_BYTES, fingerprint, model_fingerprint
+from xai.explainer.explanation_store import ExplanationStore
+from xai.explainer.helper import get_model_specific_algorithm
+from xai.explainer.parallel import explain_in_parallel
+from xai.explainer.serialization import build_explainer_cached
 from xai.model.interpreter.exceptions import InterpreterUninitializedError
 from xai.model.interpreter.explanation_aggregator import ExplanationAggregator
+from xai.model.interpreter.global_surrogate import GlobalSurrogate, DEFAULT_NUM_PERTURBATIONS
+from xai.model.interpreter.sample_planner import SamplePlan, plan_samples, stratified_selection, \
+    predicted_strata, cluster_samples, MAX_SAMPLES_PER_INSTANCE
+
+EXPLAINER_CACHE_DIR = 'explainers'
+DEFAULT_NUM_VALIDATION = 20
 
 
 ################################################################################
@@ -31,29 +43,219 @@ class ModelInterpreter:
     This class is to help to interpret the model with a model-agnostic explainer.
 
     """
-    def __init__(self, domain: str, algorithm: str = None):
+    def __init__(self, domain: str, algorithm: str = None, cache_dir: str = None,
+                 cache_max_bytes: Optional[int] = DEFAULT_MAX_BYTES):
         """
         Define the domain and algorithm for interpreter
 
         Args:
             domain (str): User-provided domain
-            algorithm (str): User-provided unique identifier of the algorithm
+            algorithm (str): User-provided unique identifier of the algorithm. Default is None, and an exact
+                             model-specific algorithm is selected for a supported model, else the default
+                             algorithm of the domain is used.
+            cache_dir (str): Directory of a persistent explanation cache. Default is None for no cache.
+                             The explanations are keyed by the algorithm and parameters, the model and the sample,
+                             so a rerun with the same model and data only explains the new samples.
+                             The built explainers are cached in the `explainers` subdirectory.
+            cache_max_bytes (int): Maximum size of the explanation cache in bytes. Default is 256MB.
         """
         self.domain = domain
         self.algorithm = algorithm
         self._explainer = None
+        self._cache_dir = cache_dir
+        self._cache = ExplanationCache(cache_dir, max_bytes=cache_max_bytes) if cache_dir else None
+        self._cache_context = None
+        self._sample_plan = None
+        self._last_statistics = None
+        self._build_kwargs = dict()
+        self._surrogate = None
+        self._reuse_quality = None
 
     def build_interpreter(self, **kwargs):
         """
         Build and initialize model interpreter
 
         Args:
-            **kwargs: build interpreter based on the domain and algorithm
+            **kwargs: build interpreter based on the domain and algorithm.
+                      If the algorithm is not given, the `model` or the model of `predict_fn`
+                      (e.g. `clf.predict_proba`) is used to select a model-specific algorithm.
+        """
+        algorithm = self.algorithm
+        if algorithm is None:
+            algorithm = get_model_specific_algorithm(self.domain, kwargs.get('model', kwargs.get('predict_fn')))
+        self._explainer = ExplainerFactory.get_explainer(domain=self.domain, algorithm=algorithm)
+        self._build_kwargs = kwargs
+        if self._cache is None:
+            self._explainer.build_explainer(**kwargs)
+        else:
+            build_explainer_cached(self._explainer, os.path.join(self._cache_dir, EXPLAINER_CACHE_DIR), **kwargs)
+            params = {key: value for key, value in kwargs.items() if key not in ['model', 'predict_fn']}
+            self._cache_context = ExplanationCache.context(algorithm, kwargs.get('model', kwargs.get('predict_fn')),
+                                                           domain=self.domain, **params)
+
+    def get_cache_stats(self) -> Optional[Dict]:
+        """
+        Get the statistics of the explanation cache
+
+        Returns:
+            A dict with the number of hits and misses, the number of cached explanations and the cache size in bytes,
+            None if the interpreter has no cache
+        """
+        return self._cache.stats() if self._cache is not None else None
+
+    def get_sample_plan(self) -> Optional[SamplePlan]:
+        """
+        Get the plan of the last budgeted `interpret_model`
+
+        Returns:
+            The SamplePlan with the explained samples and the number of perturbed samples,
+            None if the last interpretation has no budget
+        """
+        return self._sample_plan
+
+    def get_confidence_intervals(self, confidence: float = 0.95) -> Dict:
+        """
+        Get the confidence intervals of the statistics of the last `interpret_model`
+
+        Args:
+            confidence: float, the confidence level of the intervals. Default is 0.95.
+
+        Returns:
+            A dictionary maps the label to the half-width of the confidence interval of each feature statistic,
+            see `ExplanationAggregator.get_confidence_intervals`
+        """
+        if self._last_statistics is None:
+            raise InterpreterUninitializedError('No statistics yet! Please call interpret_model() first.')
+        aggregator, stats_type, k, population_size = self._last_statistics
+        return aggregator.get_confidence_intervals(stats_type=stats_type, k=k, confidence=confidence,
+                                                   population_size=population_size)
+
+    def get_surrogate_fidelity(self) -> Optional[Dict]:
+        """
+        Get the fidelity of the global surrogate of the last `interpret_model_global`
+
+        Returns:
+            A dict with the R2 score of the surrogate on the model outputs of the samples and their perturbations,
+            and the agreement of the predicted classes for classification, None if there is no surrogate
+        """
+        return self._surrogate.fidelity if self._surrogate is not None else None
+
+    def get_reuse_quality(self) -> Optional[Dict]:
+        """
+        Get the quality of the explanation reuse of the last clustered `interpret_model`
+
+        Returns:
+            A dict with the number of clusters, the number of held-out samples, the mean overlap (Jaccard index)
+            of the features of their own explanations and of the explanations of their representatives, and the
+            fraction of held-out samples with the same explained class as their representative.
+            None if the last interpretation is not clustered.
+        """
+        return self._reuse_quality
+
+    def _explain(self, samples: List[numpy.ndarray], message: str, every: int, n_jobs: int = 1,
+                 random_state: Optional[int] = None, **kwargs) -> Iterable[Dict]:
+        """
+        Explain the samples with the explainer, or load their explanations from the cache
+
+        Args:
+            samples: list[numpy.ndarray], the samples to explain
+            message: str, progress message, formatted with the number of explained samples and the total
+            every: int, the progress message is shown every `every` explained samples
+            n_jobs: int, number of worker processes, see `xai.explainer.parallel.explain_in_parallel`
+            random_state: int, the base seed of the per-sample seeds, None to not seed the samples
+                          if `n_jobs` is 1, else 0
+            **kwargs: parameters of `explain_instance`
+
+        Returns:
+            The explanations in the order of the samples, streamed as they are explained if there is no cache
+        """
+        def explain_fn(instances):
+            if n_jobs == 1 and random_state is None:
+                # the model calls of the samples between two progress messages are batched together
+                for start in range(0, len(instances), every):
+                    chunk = self._select(instances, list(range(start, min(start + every, len(instances)))))
+                    yield from self._explainer.explain_instances(chunk, **kwargs)
+                    if start + every <= len(instances):
+                        warnings.warn(message=message % (start + every, len(instances)))
+                return
+            explanations = explain_in_parallel(self._explainer, instances, n_jobs=n_jobs,
+                                               random_state=random_state or 0, **kwargs)
+            for idx, explanation in enumerate(explanations):
+                yield explanation
+                if (idx + 1) % every == 0:
+                    warnings.warn(message=message % (idx + 1, len(instances)))
+
+        if self._cache is None:
+            return explain_fn(samples)
+        context = fingerprint({'build': self._cache_context, 'explain': kwargs, 'random_state': random_state})
+        return self._cache.explain(context, samples, lambda instances: list(explain_fn(instances)))
+
+    @staticmethod
+    def _select(samples: List[numpy.ndarray], indices: List[int]) -> List[numpy.ndarray]:
+        if isinstance(samples, numpy.ndarray):
+            return samples[indices]
+        return [samples[idx] for idx in indices]
+
+    def _open_store(self, checkpoint_dir: Optional[str], name: str, samples: List[numpy.ndarray],
+                    weights: Optional[List[int]], explain_kwargs: Dict) -> Optional[ExplanationStore]:
+        """
+        Open the store of the explanations of a run in the checkpoint directory, keyed by the explainer,
+        the model, the samples and the parameters
+        """
+        if checkpoint_dir is None:
+            return None
+        run_key = fingerprint({'explainer': type(self._explainer).__name__,
+                               'model': model_fingerprint(self._explainer.predict_fn),
+                               'samples': samples, 'weights': weights, 'explain': explain_kwargs})
+        return ExplanationStore(os.path.join(checkpoint_dir, name), run_key=run_key.hex())
+
+    def _explain_checkpointed(self, samples: List[numpy.ndarray], new_state: Callable[[], Any],
+                              consume: Callable[[Any, int, Dict], None], store: Optional[ExplanationStore] = None,
+                              weights: Optional[List[int]] = None, **kwargs) -> Any:
+        """
+        Explain the samples and pass each explanation with its position to `consume`, which updates a state,
+        e.g. an aggregator. With a store, each explanation is also appended to the store, with the state as
+        checkpoint, and the run resumes after the last shard of the store: the state is loaded from the
+        checkpoint, or rebuilt from the stored explanations if the checkpoint is missing.
+
+        Args:
+            samples: list[numpy.ndarray], the samples to explain
+            new_state: Callable, creates the initial state
+            consume: Callable, updates the state with the position and the explanation of a sample
+            store: ExplanationStore, the store of the run. Default is None for no store.
+            weights: list of int, the weights of the samples stored with the explanations
+            **kwargs: parameters of `_explain`
+
+        Returns:
+            The state after all samples
         """
-        self._explainer = ExplainerFactory.get_explainer(domain=self.domain, algorithm=self.algorithm)
-        self._explainer.build_explainer(**kwargs)
+        done = 0
+        state = None
+        if store is not None:
+            done = store.num_stored
+            state = store.load_checkpoint()
+            if state is None:
+                state = new_state()
+                for position, (explanation, _) in enumerate(store.iter_explanations()):
+                    consume(state, position, explanation)
+        if state is None:
+            state = new_state()
+
+        explanations = self._explain(samples[done:], **kwargs) if done < len(samples) else []
+        for position, explanation in enumerate(explanations, start=done):
+            consume(state, position, explanation)
+            if store is not None:
+                store.append(explanation, weight=weights[position] if weights is not None else 1, state=state)
+        if store is not None:
+            store.flush(state)
+        return state
 
-    def interpret_model(self, samples: List[numpy.ndarray], stats_type: str = 'top_k', k: int = 5):
+    def interpret_model(self, samples: List[numpy.ndarray], stats_type: str = 'top_k', k: int = 5,
+                        num_samples: Optional[int] = None, adaptive: bool = False,
+                        n_jobs: int = 1, random_state: Optional[int] = None,
+                        budget: Optional[int] = None, time_limit: Optional[float] = None,
+                        num_clusters: Optional[int] = None, num_validation: int = DEFAULT_NUM_VALIDATION,
+                        checkpoint_dir: Optional[str] = None):
         """
         Get statistics of explanations generated by the pre-defined explainer from given samples
 
@@ -65,34 +267,164 @@ class ModelInterpreter:
             k:  int, not None. the k value for `top_k` method and `average_ranking`.
                 It will be ignored if the stats type are not `top_k` or `average_ranking`.
                 Default value of k is 5.
+            num_samples: int, the number of perturbed samples for each explanation, which is the maximum
+                         if `adaptive` is True. Default is None and a tenth of the number of samples is used,
+                         with a minimum of 100.
+            adaptive: bool, draw the perturbed samples in rounds and stop once the explanation is stable,
+                      for the explainers which support it (e.g. `native_lime`). Default is False.
+            n_jobs: int, number of worker processes to explain the samples in parallel, -1 for the number of CPUs.
+                    Default is 1 to explain the samples in the current process.
+            random_state: int, the base seed of the per-sample seeds. Each sample is explained with a seed
+                          derived from its content, so the result does not depend on `n_jobs`.
+                          Default is None for no per-sample seeds if `n_jobs` is 1, else 0.
+            budget: int, maximum number of model evaluations. If it is set, a subset of the samples stratified by
+                    the predicted class is explained, and the budget is split between the number of explained
+                    samples and the number of perturbed samples per explanation, see `get_sample_plan`.
+                    `num_samples` is the maximum number of perturbed samples. The samples are also predicted once
+                    to stratify them, which is not counted in the budget. Default is None for no budget.
+            time_limit: float, wall-clock limit of the explanations in seconds, planned like `budget` from the
+                        measured cost of a few explanations. Default is None for no limit.
+            num_clusters: int, approximate the interpretation by clustering the samples within each predicted class
+                          and explaining one representative per cluster, weighted by the size of the cluster,
+                          see `xai.model.interpreter.sample_planner.cluster_samples`. It cannot be combined with
+                          `budget` or `time_limit`. Default is None to explain every sample.
+            num_validation: int, the number of held-out samples which are also explained to check the reuse of the
+                            explanations of their representatives, see `get_reuse_quality`. Default is 20.
+            checkpoint_dir: str, directory to stream the explanations to, in shards with a checkpoint of the
+                            aggregator, see `xai.explainer.explanation_store.ExplanationStore`. A rerun with the
+                            same directory, samples and parameters resumes after the last shard.
+                            Default is None to keep the explanations in memory only.
 
         Returns:
             A dictionary maps class label to the aggregated feature importance score.
 
         """
         if self._explainer:
-            _explainer_aggregator = ExplanationAggregator(confidence_threshold=0.8)
-
-            for idx, sample in enumerate(samples):
-                exp = self._explainer.explain_instance(instance=sample, top_labels=1,
-                                                       num_samples=max(len(samples) // 10, 100),
-                                                       num_features=k)
-                _explainer_aggregator.feed(explanation=exp)
-                if (idx + 1) % 100 == 0:
-                    warnings.warn(message='Interpret %s/%s samples' % (
-                        idx + 1, len(samples)))
+            self._sample_plan = None
+            self._reuse_quality = None
+            if num_clusters is not None and (budget is not None or time_limit is not None):
+                raise ValueError('num_clusters cannot be combined with a budget or a time limit')
+            weights = None
+            if num_clusters is not None:
+                strata = predicted_strata(self._explainer.predict_fn, samples,
+                                          mode=getattr(self._explainer, 'mode', None))
+                indices, representatives = cluster_samples(samples, num_clusters, strata=strata,
+                                                           random_state=random_state)
+                weights = numpy.bincount(representatives, minlength=len(samples))[indices].tolist()
+                validation = [idx for idx in range(len(samples)) if representatives[idx] != idx]
+                validation = sorted(numpy.random.RandomState(random_state).choice(
+                    validation, min(num_validation, len(validation)), replace=False).tolist())
+                all_samples = samples
+                samples = self._select(samples, indices)
+                population_size = None
+            elif budget is not None or time_limit is not None:
+                self._sample_plan = plan_samples(
+                    self._explainer.predict_fn, samples, budget=budget, time_limit=time_limit,
+                    explain_fn=lambda instance, size: self._explainer.explain_instance(
+                        instance=instance, top_labels=1, num_samples=size, num_features=k),
+                    mode=getattr(self._explainer, 'mode', None),
+                    max_samples=num_samples or MAX_SAMPLES_PER_INSTANCE, random_state=random_state)
+                population_size = len(samples)
+                samples = self._select(samples, self._sample_plan.indices)
+                num_samples = self._sample_plan.num_samples
+            else:
+                population_size = None
+            if num_samples is None:
+                num_samples = max(len(samples) // 10, 100)
+
+            validated = {representatives[idx] for idx in validation} if weights is not None else set()
+
+            def consume(state, position, exp):
+                state['aggregator'].feed(explanation=exp, weight=weights[position] if weights is not None else 1)
+                if weights is not None and indices[position] in validated:
+                    state['representatives'][indices[position]] = exp
+
+            explain_kwargs = dict(top_labels=1, num_samples=num_samples, num_features=k, adaptive=adaptive)
+            store = self._open_store(checkpoint_dir, 'interpret_model', samples, weights, explain_kwargs)
+            state = self._explain_checkpointed(
+                samples, lambda: {'aggregator': ExplanationAggregator(confidence_threshold=0.8),
+                                  'representatives': dict()},
+                consume, store=store, weights=weights, message='Interpret %s/%s samples', every=100,
+                n_jobs=n_jobs, random_state=random_state, **explain_kwargs)
+            _explainer_aggregator = state['aggregator']
+            if weights is not None:
+                representative_explanations = state['representatives']
+                own_explanations = self._explain(self._select(all_samples, validation),
+                                                 message='Validate %s/%s samples', every=100,
+                                                 n_jobs=n_jobs, random_state=random_state,
+                                                 top_labels=1, num_samples=num_samples,
+                                                 num_features=k, adaptive=adaptive)
+                overlaps, agreements = [], []
+                for idx, own in zip(validation, own_explanations):
+                    overlap, agreement = _explanation_similarity(own, representative_explanations[representatives[idx]])
+                    overlaps.append(overlap)
+                    agreements.append(agreement)
+                self._reuse_quality = {'num_clusters': len(indices),
+                                       'num_validation': len(validation),
+                                       'feature_overlap': float(numpy.mean(overlaps)) if overlaps else None,
+                                       'label_agreement': float(numpy.mean(agreements)) if agreements else None}
+            self._last_statistics = (_explainer_aggregator, stats_type, k, population_size)
             return _explainer_aggregator.get_statistics(stats_type=stats_type, k=k)
         else:
             raise InterpreterUninitializedError('This interpreter is not yet instantiated! '
                                                 'Please call build_interpreter()'
                                                 'first before interpreting models.')
 
+    def interpret_model_global(self, samples: numpy.ndarray, stats_type: str = 'top_k', k: int = 5,
+                               num_perturbations: int = DEFAULT_NUM_PERTURBATIONS, alpha: float = 1.0,
+                               random_state: Optional[int] = None):
+        """
+        Get statistics of the explanations of a global surrogate of the model, a cheap alternative to
+        `interpret_model` for tabular data.
+
+        The model is queried once, in batches, on the samples and their perturbations, and a single interpretable
+        surrogate is fit on the outputs, see `xai.model.interpreter.global_surrogate.GlobalSurrogate`.
+        Each sample is explained by the surrogate for its predicted class, and the explanations are aggregated
+        like the local explanations of `interpret_model`. See `get_surrogate_fidelity` for how well
+        the surrogate fits the model.
+
+        Args:
+            samples: numpy.ndarray, not None. The samples, one row for each sample
+            stats_type: str, not None. The pre-defined stats_type for statistical analysis.
+                        For details see `xai.model_interpreter.explanation_aggregator.get_statistics()`
+            k:  int, not None. the k value for `top_k` method and `average_ranking`.
+                It is also the number of features in each explanation. Default value of k is 5.
+            num_perturbations: int, the number of perturbations of each sample. Default is 10.
+            alpha: float, the regularization strength of the surrogate. Default is 1.0.
+            random_state: int, the random seed of the perturbations
+
+        Returns:
+            A dictionary maps class label to the aggregated feature importance score.
+        """
+        if not self._explainer:
+            raise InterpreterUninitializedError('This interpreter is not yet instantiated! '
+                                                'Please call build_interpreter()'
+                                                'first before interpreting models.')
+        training_data = self._build_kwargs.get('training_data')
+        self._surrogate = GlobalSurrogate(training_data if training_data is not None else samples,
+                                          feature_names=self._build_kwargs.get('feature_names'),
+                                          categorical_features=self._build_kwargs.get('categorical_features'),
+                                          alpha=alpha, random_state=random_state)
+        self._surrogate.fit(self._explainer.predict_fn, samples, num_perturbations=num_perturbations)
+        self._sample_plan = None
+
+        _explainer_aggregator = ExplanationAggregator(confidence_threshold=0.8)
+        for exp in self._surrogate.explain_samples(num_features=k):
+            _explainer_aggregator.feed(explanation=exp)
+        self._last_statistics = (_explainer_aggregator, stats_type, k, None)
+        return _explainer_aggregator.get_statistics(stats_type=stats_type, k=k)
+
     def error_analysis(self, class_num: int, valid_x: List[numpy.ndarray], valid_y: Union[List[int], List[str]],
-                       stats_type: str = 'top_k', k: int = 5) -> Dict[Union[Tuple[int, int], Tuple[str, str]], Dict]:
+                       stats_type: str = 'top_k', k: int = 5, n_jobs: int = 1,
+                       random_state: Optional[int] = None, max_samples_per_cell: Optional[int] = None,
+                       max_samples: Optional[int] = None,
+                       checkpoint_dir: Optional[str] = None) -> Dict[Union[Tuple[int, int], Tuple[str, str]], Dict]:
         """
         Aggregated the explaination based on confusion matrix cell, i.e. aggregated explanations for samples from
         class X and be predicted as class Y
 
+        The validation data is predicted first, in batches, and only the misclassified samples are explained.
+
         Args:
             class_num: int, number of classes (zero 0 for regression)
             valid_x: A list of 1D ndarray. Validation data.
@@ -106,29 +438,75 @@ class ModelInterpreter:
             k:  int, not None. the k value for `top_k` method and `average_ranking`.
                 It will be ignored if the stats type are not `top_k` or `average_ranking`.
                 Default value of k is 5.
+            n_jobs: int, number of worker processes, see `interpret_model`
+            random_state: int, the base seed of the per-sample seeds, see `interpret_model`.
+                          It also seeds the selection of the samples when the samples are capped.
+            max_samples_per_cell: int, maximum number of misclassified samples explained for each confusion
+                                  matrix cell, drawn at random. Default is None for no limit.
+            max_samples: int, maximum number of misclassified samples explained in total. The samples are drawn
+                         at random from each cell in proportion to the size of the cell, the cells too small for
+                         a sample are left out. Default is None for no limit.
+            checkpoint_dir: str, directory to stream the explanations to, see `interpret_model`. A capped selection
+                            of samples is only resumed with the same `random_state`.
 
         Returns:
             A dictionary maps a tuple (ground_truth_label, predicted_label) to a dict of important features
             for each class
 
         """
-        error_analysis_dict = dict()
-        for idx, (sample, gt_label) in enumerate(zip(valid_x, valid_y)):
-            exp = self._explainer.explain_instance(instance=sample, top_labels=class_num,
-                                                   num_samples=100,
-                                                   num_features=k)
-            prob = {_class: _class_exp[OUTPUT.PREDICTION] for _class, _class_exp in exp.items()}
-            predict_label = sorted(prob.items(), key=operator.itemgetter(1), reverse=1)[0][0]
+        if not self._explainer:
+            raise InterpreterUninitializedError('This interpreter is not yet instantiated! '
+                                                'Please call build_interpreter()'
+                                                'first before interpreting models.')
+        predictions = predict_in_batches(self._explainer.predict_fn, [valid_x])[0]
+        predicted_labels = numpy.argmax(predictions.reshape(len(predictions), -1), axis=1)
+
+        error_cells = dict()
+        for idx, (gt_label, predict_label) in enumerate(zip(valid_y, predicted_labels)):
             if predict_label != gt_label:
-                if (gt_label, predict_label) not in error_analysis_dict.keys():
-                    error_analysis_dict[(gt_label, predict_label)] = ExplanationAggregator(confidence_threshold=0)
-                error_analysis_dict[(gt_label, predict_label)].feed(explanation=exp)
-            if (idx + 1) % 10 == 0:
-                warnings.warn(message='Analyze %s/%s samples' % (
-                    idx + 1, len(valid_x)))
+                error_cells.setdefault((gt_label, int(predict_label)), []).append(idx)
+        error_cells = stratified_selection(error_cells, max_per_stratum=max_samples_per_cell,
+                                           max_samples=max_samples, random_state=random_state)
+
+        indices = [idx for cell_indices in error_cells.values() for idx in cell_indices]
+        error_x = self._select(valid_x, indices)
+        cells = [cm_cell for cm_cell, cell_indices in error_cells.items() for _ in cell_indices]
+
+        def consume(state, position, exp):
+            if cells[position] not in state.keys():
+                state[cells[position]] = ExplanationAggregator(confidence_threshold=0)
+            state[cells[position]].feed(explanation=exp)
+
+        explain_kwargs = dict(top_labels=class_num, num_samples=100, num_features=k)
+        store = self._open_store(checkpoint_dir, 'error_analysis', error_x, None, explain_kwargs)
+        error_analysis_dict = self._explain_checkpointed(error_x, dict, consume, store=store,
+                                                         message='Analyze %s/%s samples', every=10,
+                                                         n_jobs=n_jobs, random_state=random_state,
+                                                         **explain_kwargs)
 
         error_analysis_stats = dict()
         for cm_cell, aggregator in error_analysis_dict.items():
             error_analysis_stats[cm_cell] = aggregator.get_statistics(stats_type=stats_type, k=k)
 
         return error_analysis_stats
+
+
+def _explanation_similarity(explanation: Dict, other: Dict) -> Tuple[float, bool]:
+    """
+    Compare two explanations of the explained class
+
+    Returns:
+        The Jaccard index of the features of the first explained class, and whether the explained classes are the same
+    """
+    def first_label(exp):
+        if OUTPUT.EXPLANATION in exp:
+            return 'NA', exp
+        label = next(iter(exp))
+        return label, exp[label]
+
+    label, values = first_label(explanation)
+    other_label, other_values = first_label(other)
+    features = {item[OUTPUT.FEATURE] for item in values[OUTPUT.EXPLANATION]}
+    other_features = {item[OUTPUT.FEATURE] for item in other_values[OUTPUT.EXPLANATION]}
+    union = features | other_features
+    return len(features & other_features) / len(union) if union else 1.0, label == other_label
@@ -0,0 +1,268 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+# Copyright 2019 SAP SE or an SAP affiliate company. All rights reserved
+# ============================================================================
+
+import time
+from typing import Dict, List, Tuple, Optional, Callable, Any
+
+import numpy
+from sklearn.cluster import MiniBatchKMeans
+
+from xai.explainer.batch import predict_in_batches
+
+MIN_SAMPLES_PER_INSTANCE = 100
+MAX_SAMPLES_PER_INSTANCE = 5000
+NUM_REGRESSION_STRATA = 10
+NUM_PILOT_INSTANCES = 2
+
+
+################################################################################
+### Sample Plan
+################################################################################
+class SamplePlan:
+    """
+    Class for the plan of a budgeted model interpretation, i.e. which samples are explained and with how many
+    perturbed samples each
+    """
+
+    def __init__(self, indices: List[int], num_samples: int, total_count: int, strata: Dict[Any, int],
+                 budget: Optional[int] = None, time_limit: Optional[float] = None):
+        """
+        Args:
+            indices: list of int, the indices of the selected samples
+            num_samples: int, the number of perturbed samples for each explanation
+            total_count: int, the number of samples the selection is drawn from
+            strata: dict, maps each predicted class (or prediction range for regression) to the number of
+                    selected samples
+            budget: int, the maximum number of model evaluations of the plan
+            time_limit: float, the wall-clock limit of the plan in seconds
+        """
+        self.indices = indices
+        self.num_samples = num_samples
+        self.total_count = total_count
+        self.strata = strata
+        self.budget = budget
+        self.time_limit = time_limit
+
+    @property
+    def num_evaluations(self) -> int:
+        """Returns the number of model evaluations of the explanations, besides the prediction of all samples"""
+        return len(self.indices) * self.num_samples
+
+    def __repr__(self):
+        return 'SamplePlan(%s of %s samples, %s perturbed samples each)' % (
+            len(self.indices), self.total_count, self.num_samples)
+
+
+def stratified_selection(strata: Dict[Any, List[int]], max_per_stratum: Optional[int] = None,
+                         max_samples: Optional[int] = None,
+                         random_state: Optional[int] = None) -> Dict[Any, List[int]]:
+    """
+    Draw a stratified random selection of samples
+
+    Args:
+        strata: dict, maps a stratum (e.g. a predicted class or a confusion matrix cell) to the indices of its samples
+        max_per_stratum: int, maximum number of samples for each stratum
+        max_samples: int, maximum number of samples in total, allocated to the strata in proportion to their size
+                     by the largest remainder method. The strata too small for a sample are left out.
+        random_state: int, the random seed of the selection
+
+    Returns:
+        A dictionary maps a stratum to the sorted indices of the selected samples
+    """
+    allocation = {stratum: len(indices) for stratum, indices in strata.items()}
+    if max_per_stratum is not None:
+        allocation = {stratum: min(size, max_per_stratum) for stratum, size in allocation.items()}
+    total = sum(allocation.values())
+    if max_samples is not None and total > max_samples:
+        shares = {stratum: max_samples * size / total for stratum, size in allocation.items()}
+        allocation = {stratum: int(share) for stratum, share in shares.items()}
+        # hand out the samples left by rounding down to the largest remainders, the shares sum up to max_samples
+        remainders = sorted(shares, key=lambda stratum: shares[stratum] - int(shares[stratum]), reverse=True)
+        for stratum in remainders[:max(0, max_samples - sum(allocation.values()))]:
+            allocation[stratum] += 1
+
+    rng = numpy.random.RandomState(random_state)
+    selected = dict()
+    for stratum, indices in strata.items():
+        if allocation[stratum] == 0:
+            continue
+        if allocation[stratum] < len(indices):
+            indices = sorted(rng.choice(indices, allocation[stratum], replace=False).tolist())
+        selected[stratum] = list(indices)
+    return selected
+
+
+def split_budget(budget: float, total_count: int,
+                 min_samples: int = MIN_SAMPLES_PER_INSTANCE,
+                 max_samples: int = MAX_SAMPLES_PER_INSTANCE,
+                 fixed_cost: float = 0.0, sample_cost: float = 1.0) -> Tuple[int, int]:
+    """
+    Split a budget between the number of explained instances and the number of perturbed samples per instance.
+
+    The statistics are averages over the instances, and their error is dominated by the variation between
+    the instances, so the budget favours more instances: the number of perturbed samples grows with the
+    square root of the budget in model evaluations, within `min_samples` and `max_samples`, and the rest of
+    the budget goes to the instances. If the budget covers all instances, the remainder increases the number
+    of perturbed samples. If the budget does not cover a single instance with `min_samples` perturbed samples,
+    a single instance is explained with the perturbed samples the budget covers, at least one.
+
+    Args:
+        budget: float, the total budget, in model evaluations by default
+        total_count: int, the number of instances available
+        min_samples: int, minimum number of perturbed samples per instance
+        max_samples: int, maximum number of perturbed samples per instance
+        fixed_cost: float, the cost of an explanation besides the model evaluations, in the unit of the budget
+        sample_cost: float, the cost of a perturbed sample, in the unit of the budget
+
+    Returns:
+        The number of instances, and the number of perturbed samples per instance
+    """
+    def cost(size):
+        return max(fixed_cost + sample_cost * size, 1e-12)
+
+    evaluations = budget / sample_cost if sample_cost > 0 else numpy.inf
+    num_samples = int(numpy.clip(numpy.sqrt(evaluations), min_samples, max_samples))
+    num_instances = int(budget // cost(num_samples))
+    if num_instances == 0:
+        num_samples = int(numpy.clip((budget - fixed_cost) / sample_cost if sample_cost > 0 else max_samples,
+                                     1, num_samples))
+        return 1, num_samples
+    if num_instances >= total_count:
+        num_instances = total_count
+        # spend the rest of the budget on more samples per instance
+        num_samples = int(numpy.clip((budget / total_count - fixed_cost) / sample_cost if sample_cost > 0
+                                     else max_samples, num_samples, max_samples))
+    return num_instances, num_samples
+
+
+def plan_samples(predict_fn: Callable, samples: Any, budget: Optional[int] = None,
+                 time_limit: Optional[float] = None, explain_fn: Optional[Callable[[Any, int], Any]] = None,
+                 mode: Optional[str] = None, min_samples: int = MIN_SAMPLES_PER_INSTANCE,
+                 max_samples: int = MAX_SAMPLES_PER_INSTANCE, random_state: Optional[int] = None) -> SamplePlan:
+    """
+    Plan a budgeted model interpretation: choose a subset of the samples stratified by predicted class,
+    and the number of perturbed samples per explanation
+
+    Args:
+        predict_fn: Callable, the model prediction function
+        samples: the samples to choose from, a 2D array or a list of instances
+        budget: int, maximum number of model evaluations of the explanations. The samples are also predicted once
+                to stratify them, which is not counted in the budget.
+        time_limit: float, wall-clock limit of the explanations in seconds. The cost of an explanation is
+                    measured on a few samples with `explain_fn`, as a fixed cost plus a cost per perturbed sample.
+        explain_fn: Callable, explains an instance with a given number of perturbed samples, needed for `time_limit`
+        mode: str, 'classification' to stratify by the predicted class, 'regression' to stratify by
+              prediction deciles. Default is None to infer it from the shape of the predictions.
+        min_samples: int, minimum number of perturbed samples per explanation
+        max_samples: int, maximum number of perturbed samples per explanation
+        random_state: int, the random seed of the selection
+
+    Returns:
+        The SamplePlan of the interpretation
+    """
+    if budget is None and time_limit is None:
+        raise ValueError('Either a budget or a time limit is required to plan the samples')
+    total_count = len(samples)
+    strata = predicted_strata(predict_fn, samples, mode=mode)
+
+    num_instances, num_samples = total_count, max_samples
+    if budget is not None:
+        num_instances, num_samples = split_budget(budget, total_count, min_samples=min_samples,
+                                                  max_samples=max_samples)
+    if time_limit is not None:
+        fixed_cost, sample_cost = _measure_cost(explain_fn, samples, min_samples)
+        time_instances, time_samples = split_budget(time_limit, total_count, min_samples=min_samples,
+                                                    max_samples=max_samples, fixed_cost=fixed_cost,
+                                                    sample_cost=sample_cost)
+        if time_instances * time_samples < num_instances * num_samples:
+            num_instances, num_samples = time_instances, time_samples
+
+    selected = stratified_selection(strata, max_samples=num_instances, random_state=random_state)
+    indices = sorted(idx for stratum_indices in selected.values() for idx in stratum_indices)
+    return SamplePlan(indices=indices, num_samples=num_samples, total_count=total_count,
+                      strata={stratum: len(stratum_indices) for stratum, stratum_indices in selected.items()},
+                      budget=budget, time_limit=time_limit)
+
+
+def predicted_strata(predict_fn: Callable, samples: Any, mode: Optional[str] = None) -> Dict[Any, List[int]]:
+    """
+    Group the samples by predicted class, or by prediction deciles for regression
+
+    Args:
+        predict_fn: Callable, the model prediction function
+        samples: the samples, a 2D array or a list of instances
+        mode: str, 'classification' or 'regression'. Default is None to infer it from the shape of the predictions.
+
+    Returns:
+        A dictionary maps a predicted class (or prediction range) to the indices of its samples
+    """
+    predictions = predict_in_batches(predict_fn, [samples])[0]
+    predictions = predictions.reshape(len(samples), -1)
+    if mode is None:
+        mode = 'classification' if predictions.shape[1] > 1 else 'regression'
+    if mode == 'classification':
+        labels = numpy.argmax(predictions, axis=1)
+    else:
+        edges = numpy.unique(numpy.percentile(predictions[:, 0], numpy.linspace(0, 100, NUM_REGRESSION_STRATA + 1)))
+        labels = numpy.digitize(predictions[:, 0], edges[1:-1])
+    strata = dict()
+    for idx, label in enumerate(labels.tolist()):
+        strata.setdefault(label, []).append(idx)
+    return strata
+
+
+def cluster_samples(samples: numpy.ndarray, num_clusters: int, strata: Optional[Dict[Any, List[int]]] = None,
+                    random_state: Optional[int] = None) -> Tuple[List[int], numpy.ndarray]:
+    """
+    Cluster the samples with mini-batch k-means on the standardized features, and choose the sample closest
+    to the centre of each cluster as its representative. The clusters do not cross the strata, e.g. the predicted
+    classes, and the number of clusters is allocated to the strata in proportion to their size.
+
+    Args:
+        samples: numpy.ndarray, the samples, one row for each sample
+        num_clusters: int, the total number of clusters
+        strata: dict, maps a stratum to the indices of its samples. Default is None for a single stratum.
+        random_state: int, the random seed of the clustering
+
+    Returns:
+        The sorted indices of the representatives, and the index of the representative of each sample
+    """
+    samples = numpy.asarray(samples, dtype=numpy.float64)
+    if strata is None:
+        strata = {None: list(range(len(samples)))}
+    scale = samples.std(axis=0)
+    scale[scale == 0] = 1.0
+    scaled = (samples - samples.mean(axis=0)) / scale
+
+    representatives = numpy.arange(len(samples))
+    for indices in strata.values():
+        indices = numpy.asarray(indices)
+        size = max(1, min(len(indices), int(round(num_clusters * len(indices) / len(samples)))))
+        if size == len(indices):
+            continue
+        kmeans = MiniBatchKMeans(n_clusters=size, random_state=random_state, n_init=3).fit(scaled[indices])
+        distances = ((scaled[indices] - kmeans.cluster_centers_[kmeans.labels_]) ** 2).sum(axis=1)
+        for cluster in numpy.unique(kmeans.labels_):
+            members = numpy.flatnonzero(kmeans.labels_ == cluster)
+            representatives[indices[members]] = indices[members[numpy.argmin(distances[members])]]
+    return sorted(numpy.unique(representatives).tolist()), representatives
+
+
+def _measure_cost(explain_fn: Callable[[Any, int], Any], samples: Any, min_samples: int) -> Tuple[float, float]:
+    """
+    Measure the fixed cost and the cost per perturbed sample of an explanation in seconds
+    """
+    if explain_fn is None:
+        raise ValueError('An explain function is required to plan the samples with a time limit')
+    timings = []
+    for size in [min_samples, 4 * min_samples]:
+        start = time.time()
+        for idx in range(min(NUM_PILOT_INSTANCES, len(samples))):
+            explain_fn(samples[idx], size)
+        timings.append((time.time() - start) / min(NUM_PILOT_INSTANCES, len(samples)))
+    sample_cost = max((timings[1] - timings[0]) / (3 * min_samples), 0.0)
+    fixed_cost = max(timings[0] - sample_cost * min_samples, 0.0)
+    return fixed_cost, sample_cost